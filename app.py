@@ -1,11 +1,51 @@
+import time
+
+# Taken before anything else is imported, so a cold start's timing includes the imports
+SCRIPT_START = time.perf_counter()
+
 import streamlit as st
-from openai import OpenAI
-import fitz  # PyMuPDF
-import base64
-import tempfile
-import os
-from PIL import Image
-import io
+import uuid
+
+from cache import MemoryCache, ResultCache
+from candidates import DEFAULT_SEARCH_LIMIT, CandidateStore
+from ranking import DEFAULT_SHORTLIST_SIZE
+from dedupe import DuplicateIndex
+from jobs import ACTIVE_STATES, FAILED, JobQueue, JobRunner
+from metrics import (
+    DEFAULT_METRICS_JSONL,
+    DEFAULT_METRICS_PROM,
+    budget_notes,
+    get_registry,
+    latency_summary,
+    percentile,
+    record_screening,
+    stage_rows
+)
+from screener import (
+    CACHE_MAX_AGE_DAYS,
+    CACHE_MAX_BYTES,
+    DEFAULT_BATCH_CONCURRENCY,
+    DEFAULT_CACHE_PATH,
+    DEFAULT_CANDIDATES_PATH,
+    DEFAULT_DEDUPE_PATH,
+    DEFAULT_JOBS_PATH,
+    FUSED_REVIEW_AND_EXTRACTION,
+    MAX_RENDER_PAGES,
+    PREPARED_CACHE_ENTRIES,
+    PROVISIONAL_REPORT_NOTE,
+    ROLES,
+    compare_fused_and_split,
+    compare_image_profiles,
+    extract_text_layer,
+    measure_extraction_accuracy,
+    new_outcome,
+    parse_final_score,
+    parse_verdict,
+    run_job,
+    shortlist_stored_candidates,
+    triage_batch,
+    triage_resume
+)
 
 # Page config
 st.set_page_config(
@@ -14,701 +54,405 @@ st.set_page_config(
     layout="wide"
 )
 
-# Model configuration
-OPENAI_MODEL = "gpt-5.2"
-
-# Role configurations
-ROLES = {
-    "GenAI Delivery Lead": {
-        "title": "GenAI Productization & Delivery Lead (Life Sciences)",
-        "subtitle": "GenAI Productization & Delivery Lead (Life Sciences)"
-    },
-    "Lead Business Analyst": {
-        "title": "Lead Business Analyst - DT Consulting (Life Sciences)",
-        "subtitle": "Lead Business Analyst - DT Consulting (Life Sciences)"
-    },
-    "Agentforce Engineer": {
-        "title": "Agentforce Engineer - Salesforce AI Solutions",
-        "subtitle": "Agentforce Engineer - Salesforce AI Solutions"
-    }
-}
-
-# Resume Quality Review Prompt (GPT-5.2)
-QUALITY_REVIEW_PROMPT = """You are a professional resume quality reviewer. Analyze the provided resume image(s) and evaluate the document quality.
-
-## IMPORTANT CONTEXT
-- Current date: February 2026. Dates up to 2026 are valid and acceptable.
-- First, check if this is an AGENCY CV (look for agency name/logo at the top like "ABC Staffing", "XYZ Recruiters", etc.) or a DIRECT CANDIDATE CV.
-
-## CV Source Detection
-- **Agency CV**: Has agency branding/name at top, often missing candidate contact details (this is intentional - agencies remove contact info to prevent direct outreach)
-- **Direct CV**: No agency branding, should have candidate's own contact information
-
-## Evaluation Criteria
-
-### 1. **Spelling & Grammar** (0 or 1)
-- Check for spelling mistakes, typos, grammatical errors
-- Minor capitalization inconsistencies (e.g., "Zero-shot" vs "zero-shot") should NOT fail this criterion
-- Focus on actual language errors, not stylistic choices
-
-### 2. **Factual/Technical Consistency** (0 or 1)
-- Check if dates are logical (no overlapping employment, dates should be <= 2026)
-- Unexplained employment gaps > 1 year should be noted
-- **IMPORTANT**: Check for technical inaccuracies in claims, e.g.:
-  - Claiming PostgreSQL as a vector database (it's not, unless using pgvector extension)
-  - Misrepresenting technologies or their capabilities
-  - Inconsistent tech stack claims (e.g., using a framework that didn't exist at the claimed time)
-- Verify education timeline makes sense relative to experience
-
-### 3. **Layout & Structure** (0 or 1)
-- Is the resume well-organized with clear sections?
-- Professional appearance, not cluttered or chaotic
-- **DO NOT penalize** for:
-  - Minor bullet point style variations (solid vs hollow)
-  - Slight spacing inconsistencies
-  - These may be artifacts from agency reformatting, not candidate's fault
-
-### 4. **Attention to Detail** (0 or 1)
-- **For Agency CVs**:
-  - Missing contact info is EXPECTED and should NOT be penalized
-  - Focus on content quality, not formatting issues that agency may have introduced
-- **For Direct Candidate CVs**:
-  - Missing contact information IS a valid concern
-  - Consistent date formats expected
-- For both: Focus on quality of work descriptions, clarity of achievements, and professional presentation of experience
-
-## Output Format
-
-Provide your analysis in EXACTLY this JSON format (no other text):
-```json
-{
-  "cv_source": "AGENCY" or "DIRECT",
-  "agency_name": "Name if agency CV, otherwise null",
-  "spelling_grammar": {"score": 0 or 1, "issues": ["list of significant issues only"]},
-  "factual_consistency": {"score": 0 or 1, "issues": ["list of factual/technical errors"]},
-  "layout_structure": {"score": 0 or 1, "issues": ["list of major structural issues only"]},
-  "attention_to_detail": {"score": 0 or 1, "issues": ["list of significant issues based on CV source"]},
-  "total_score": X,
-  "verdict": "PASS" or "FAIL",
-  "summary": "Brief 1-2 sentence summary"
-}
-```
-
-**SCORING RULES**:
-- Total score = sum of all four criteria (max 4)
-- PASS if total_score >= 3, otherwise FAIL
-- Be lenient on formatting/style issues - focus on SUBSTANCE
-- Technical inaccuracies and factual errors are more important than formatting
-- Agency CVs should be judged primarily on content quality, not presentation
-"""
-
-# Role Screening Prompt (GPT-5.2)
-SCREENING_PROMPT = """# Task
-
-Review the provided resume against the Guidance provided and basis that recommend if we should proceed with the first round of interview or not
-
-# Guidance
-
-The core problem to solve
-We are not hiring for an LLM engineer or ML researcher.
-We are hiring for a GenAI Product/Program Lead (Life Sciences) who can translate pharma use-cases into build-ready requirements, run delivery with engineering, and drive quality + adoption in regulated workflows.
-Think: "AI Transformation PM / AI Product Ops / GenAI Delivery Lead" — not "Software Engineer" or "Data Scientist".
-________________________________________
-Role archetype
-•    Senior Associate – GenAI Productization & Delivery (Life Sciences)
-•    GenAI Implementation Lead – Life Sciences Platforms
-•    AI Transformation Program Manager – Pharma
-Avoid: "GenAI Engineer", "ML Engineer", "Data Scientist" (these attract the wrong pipeline).
-________________________________________
-What success looks like:
-This person should be able to:
-1.    Take a client problem statement → convert it into workflow + prompt/eval requirements
-2.    Coordinate with Engineering to ship it → without writing core code themselves
-3.    Define "good" → quality rubric, evaluation plan, traceability, feedback loop
-4.    Drive adoption → training, governance, metrics, iterations
-________________________________________
-Must-have skills (non-negotiable)
-1) GenAI implementation literacy (not research)
-•    Prompting patterns, RAG basics, citations/traceability
-•    Eval concepts (LLM-as-judge basics, rubrics, test cases, regression mindset)
-•    Ability to reason about hallucinations, grounding, failure modes
-2) Program/product execution
-•    Can run cross-functional delivery with Eng + SMEs + stakeholders
-•    Writes crisp PRDs / user stories / acceptance criteria
-•    Strong on dependency management, risks, timelines, stakeholder updates
-3) Regulated-domain comfort (life sciences preferred)
-•    Has worked in pharma / healthcare / medtech OR adjacent regulated enterprise workflows
-•    Understands why "accuracy, traceability, and reviewability" matter
-4) Communication and structuring
-•    Can synthesize messy inputs into structured specs and decisions
-•    Can demo/communicate to business stakeholders confidently
-________________________________________
-Good-to-have skills (strong signals)
-•    Experience shipping workflow tools (authoring, review, compliance, PV, med info, regulatory)
-•    Exposure to document-heavy systems (PDF/Word extraction, templates, knowledge bases)
-•    Basic SQL / analytics for adoption metrics
-•    UX collaboration experience (wireframes, feedback loops)
-________________________________________
-What we do not need
-•    Not looking for LLM researchers, model trainers, or deep ML (PyTorch, Transformers training).
-•    Not looking for pure backend/frontend engineers as the primary fit.
-•    Not looking for Kaggle/academic ML profiles without enterprise delivery experience.
-(We already have engineering; we need the "glue" leader who makes GenAI real in production.)
-________________________________________
-Ideal background (what TAG can screen for)
-Education
-•    MBA + STEM, B.Pharm/Bio/Healthcare + MBA, Engineering + product/program experience — many combinations work.
-•    Degrees are less important than proof of shipping + stakeholder leadership.
-Experience
-•    4–8 years overall (for someone reporting to you; adjust as needed)
-•    Worked as one of:
-o    Product Manager (enterprise / workflow products)
-o    Program Manager (platform delivery)
-o    Solutions Consultant / Implementation Lead
-o    Digital transformation lead (healthcare/pharma)
-o    Analytics-to-product transition profiles who shipped tools
-Industries to source from:
-•    Life sciences services (Indegene-like)
-•    Health-tech (B2B)
-•    Enterprise SaaS implementation (especially regulated clients)
-•    Consulting (healthcare/tech transformation)
-________________________________________
-Sample JD snippet (TAG-ready, copy-paste)
-Role: GenAI Productization & Delivery Lead (Life Sciences)
-We're hiring someone to lead the translation of life sciences GenAI use-cases into production-ready workflows. This role partners with Engineering and domain SMEs to define requirements, run delivery, establish quality/evaluation standards, and drive adoption for GenAI capabilities in regulated, document-heavy environments.
-Must have: GenAI implementation literacy (prompting/RAG/evals), strong program/product execution, stakeholder management, and experience in healthcare/pharma or another regulated enterprise domain.
-Not required: Model training, deep ML research, advanced coding.
-________________________________________
-Screening keywords for TAG (send this list)
-Target keywords:
-GenAI implementation, AI transformation, productization, prompt engineering (applied), RAG, evaluation, LLM QA, workflow automation, enterprise SaaS, program management, product ops, solutions/implementation, regulated domain, life sciences, medtech, pharmacovigilance, medical writing, compliance, traceability.
-Reject / deprioritize keywords (unless paired with delivery experience):
-Pytorch, model training, fine-tuning LLMs, research publications, Kaggle grandmaster, computer vision research, "built transformer from scratch".
-________________________________________
-Quick scorecard TAG can use (simple)
-•    GenAI literacy (Applied) – 0/1
-•    Enterprise delivery (PRD / execution) – 0/1
-•    Stakeholder mgmt + communication – 0/1
-•    Regulated / healthcare familiarity – 0/1
-
-Hire pipeline: only shortlist candidates with 3/4+.
-
-# Quality Review Result
-
-{quality_review}
-
-# Resume
-
-{resume}
-
-# Output Format
-
-Provide your analysis in the following format:
-
-## Resume Quality Review
-{quality_summary}
-
-## Role Fit Scorecard
-| Criteria | Score | Evidence |
-|----------|-------|----------|
-| GenAI literacy (Applied) | 0 or 1 | Brief evidence from resume |
-| Enterprise delivery (PRD / execution) | 0 or 1 | Brief evidence from resume |
-| Stakeholder mgmt + communication | 0 or 1 | Brief evidence from resume |
-| Regulated / healthcare familiarity | 0 or 1 | Brief evidence from resume |
-
-**Role Fit Score: X/4**
-**Quality Penalty: {penalty}**
-**Final Score: X/4**
-
-## Verdict
-**PROCEED TO INTERVIEW** or **DO NOT PROCEED**
-
-(Note: Candidates need final score of 3/4+ to proceed. Quality review FAIL results in -1 penalty.)
-
-## Key Strengths
-- Bullet points of relevant strengths
-
-## Concerns / Gaps
-- Bullet points of concerns or missing qualifications
-
-## Summary
-2-3 sentence summary of your recommendation.
-"""
-
-# Business Analyst Screening Prompt (GPT-5.2)
-BA_SCREENING_PROMPT = """# Task
-
-Review the provided resume against the Guidance provided and basis that recommend if we should proceed with the first round of interview or not
-
-# Guidance
-
-The core problem to solve
-We are hiring for a Lead Business Analyst who can lead teams of analysts, drive client engagement, deliver data-driven consulting solutions, and bridge client business challenges with DT Consulting's solution suite in life sciences.
-Think: "Consulting BA Lead / Analytics Delivery Manager / Client Solutions Lead" — not "Data Engineer" or "Software Developer".
-________________________________________
-Role archetype
-•    Lead Business Analyst – DT Consulting
-•    Senior Consulting Analyst – Life Sciences
-•    Analytics & Insights Delivery Lead
-Avoid: "Data Engineer", "Software Developer", "ML Engineer" (these attract the wrong pipeline).
-________________________________________
-What success looks like:
-This person should be able to:
-1.    Lead and mentor teams of 5-10 analysts → define scopes, manage workflows, enforce quality
-2.    Lead client discussions → present insights, offer data-backed recommendations, strengthen relationships
-3.    Oversee complex data analysis → quantitative/qualitative research, dashboards, reporting frameworks
-4.    Drive strategic direction → digital transformation, CX initiatives, solution innovation
-________________________________________
-Must-have skills (non-negotiable)
-1) Team & Project Leadership
-•    Proven track record of leading analyst teams (5+ people)
-•    Experience defining project scopes, objectives, deliverables
-•    Workflow management, resource allocation, quality oversight
-•    Mentoring and developing junior analysts
-2) Client & Stakeholder Engagement
-•    Has led client-facing discussions and presentations
-•    Experience as liaison between offshore and onshore teams
-•    Can translate business problems into analytical approaches
-•    Strong executive communication skills
-3) Data Analysis & Analytics Expertise
-•    Advanced Excel modeling, SQL, and at least one BI tool (Power BI, Tableau)
-•    Experience with quantitative research and qualitative analysis
-•    Can design dashboards, reporting frameworks, and analytics solutions
-•    Python or equivalent scripting is a plus
-4) Consulting / Life Sciences Domain
-•    Experience in consulting, digital transformation, or professional services
-•    Life sciences / pharma / healthcare industry exposure preferred
-•    Understands regulated environments and compliance considerations
-________________________________________
-Good-to-have skills (strong signals)
-•    CX/UX strategy experience
-•    Process optimization and operational excellence
-•    Risk management frameworks
-•    Cross-border / global team collaboration
-•    Master's degree in Business, Data Science, or Analytics
-________________________________________
-What we do not need
-•    Not looking for pure software developers or data engineers as the primary fit.
-•    Not looking for junior analysts with no leadership experience.
-•    Not looking for academic researchers without client-facing delivery experience.
-•    Not looking for profiles with only operational/support roles and no analytical depth.
-(We already have engineering; we need analytical leaders who can drive consulting delivery.)
-________________________________________
-Ideal background
-Education
-•    MBA, M.S. in Analytics/Data Science, or Bachelor's in Business/STEM with strong consulting experience
-•    Degrees matter less than proof of leading teams + delivering client solutions
-Experience
-•    7+ years overall in business analysis, consulting, data analytics, or digital transformation
-•    Worked as one of:
-o    Lead/Senior Business Analyst
-o    Consulting Manager / Engagement Manager
-o    Analytics Lead / Insights Manager
-o    Digital transformation lead
-o    Solutions Consultant with analytics depth
-Industries to source from:
-•    Life sciences services (Indegene-like)
-•    Management consulting (Big 4, boutique)
-•    Health-tech / Pharma services
-•    Enterprise analytics / BI consulting
-________________________________________
-Screening keywords for TAG
-Target keywords:
-Business analysis, consulting, team leadership, client engagement, data analytics, Power BI, Tableau, SQL, Python, Excel modeling, digital transformation, CX/UX, life sciences, pharma, healthcare, project management, stakeholder management, dashboards, reporting, insights, quantitative research, qualitative analysis, offshore-onshore coordination.
-Reject / deprioritize keywords (unless paired with consulting/leadership experience):
-Pure coding, ML model training, DevOps, infrastructure, "built microservices", frontend development, Kaggle, academic research only.
-________________________________________
-Quick scorecard TAG can use (simple)
-•    Team & Project Leadership – 0/1
-•    Client/Stakeholder Engagement – 0/1
-•    Data Analysis & Analytics Expertise – 0/1
-•    Consulting / Life Sciences Domain – 0/1
-
-Hire pipeline: only shortlist candidates with 3/4+.
-
-# Quality Review Result
-
-{quality_review}
-
-# Resume
-
-{resume}
-
-# Output Format
-
-Provide your analysis in the following format:
-
-## Resume Quality Review
-{quality_summary}
-
-## Role Fit Scorecard
-| Criteria | Score | Evidence |
-|----------|-------|----------|
-| Team & Project Leadership | 0 or 1 | Brief evidence from resume |
-| Client/Stakeholder Engagement | 0 or 1 | Brief evidence from resume |
-| Data Analysis & Analytics Expertise | 0 or 1 | Brief evidence from resume |
-| Consulting / Life Sciences Domain | 0 or 1 | Brief evidence from resume |
-
-**Role Fit Score: X/4**
-**Quality Penalty: {penalty}**
-**Final Score: X/4**
-
-## Verdict
-**PROCEED TO INTERVIEW** or **DO NOT PROCEED**
-
-(Note: Candidates need final score of 3/4+ to proceed. Quality review FAIL results in -1 penalty.)
-
-## Key Strengths
-- Bullet points of relevant strengths
-
-## Concerns / Gaps
-- Bullet points of concerns or missing qualifications
-
-## Summary
-2-3 sentence summary of your recommendation.
-"""
-
-
-# Agentforce Engineer Screening Prompt (GPT-5.2)
-AGENTFORCE_SCREENING_PROMPT = """# Task
-
-Review the provided resume against the Guidance provided and basis that recommend if we should proceed with the first round of interview or not
-
-# Guidance
-
-The core problem to solve
-We are hiring for an Agentforce Engineer who can lead the technical delivery of Salesforce Agentforce AI solutions, design and build agentic implementations, integrate Data Cloud with diverse technologies, and manage technical teams across onshore and offshore.
-Think: "Salesforce AI Solutions Architect / Agentforce Technical Lead / Data Cloud Integration Engineer" — not "Generic Developer" or "Junior Salesforce Admin".
-________________________________________
-Role archetype
-•    Agentforce Engineer – Salesforce AI Solutions
-•    Salesforce AI & Data Cloud Technical Lead
-•    Agentforce Implementation Architect
-Avoid: "Junior Salesforce Admin", "Generic Full-Stack Developer", "Marketing Operations Analyst" (these attract the wrong pipeline).
-________________________________________
-What success looks like:
-This person should be able to:
-1.    Design and build AI agents in Agentforce → leveraging the full Salesforce technology stack
-2.    Lead Data Cloud integrations → data modeling, architecture, cross-product data mapping, connectors
-3.    Drive technical delivery → manage onshore/offshore teams, run PoCs, facilitate client workshops
-4.    Architect scalable solutions → across multiple Salesforce Clouds with security and performance best practices
-________________________________________
-Must-have skills (non-negotiable)
-1) Salesforce Ecosystem Expertise (3+ years)
-•    Deep hands-on experience with Salesforce Marketing Cloud (SFMC), Data Cloud (CDP), Agentforce, Experience Cloud
-•    Strong MarTech architecture knowledge: data modeling, profile unification, segmentation, audience management
-•    Automation & orchestration across SFMC and Data Cloud
-•    Configuring inbound and outbound data connectors
-2) Agentforce / AI Agent Development
-•    Hands-on experience developing AI agents in Agentforce or other agentic/AI platforms
-•    Understanding of agentic design patterns, prompt engineering, and AI solution architecture
-•    Ability to lead Agentic Proof of Concept (PoC) projects
-3) Salesforce Development & Integration
-•    Strong APEX and Lightning Web Components (LWC) development
-•    Integration patterns: REST/SOAP APIs, MuleSoft or equivalent middleware
-•    Salesforce security, identity, and access control best practices
-•    Designing scalable, high-performance solutions across multiple Salesforce Clouds
-4) Technical Leadership & Client Engagement
-•    Experience managing technical project teams (onshore and offshore)
-•    Facilitating workshops and engaging with clients on configuration vs. coding trade-offs
-•    Data profiling, data governance frameworks, and standardization protocols
-•    Proven ability to identify data gaps and propose implementation strategies
-________________________________________
-Good-to-have skills (strong signals)
-•    Prior experience in Pharma/Life Sciences sectors
-•    Custom API development for integrations between CDP and source systems
-•    Strong SQL and Python knowledge
-•    Exposure to cloud platforms (Snowflake, AWS) in marketing or data use cases
-•    Salesforce certifications (Administrator, Data Cloud Consultant, Agentforce Specialist)
-•    Experience integrating with AWS Pinpoint, Oracle Cloud, or similar platforms
-________________________________________
-What we do not need
-•    Not looking for junior Salesforce administrators with only point-and-click configuration experience.
-•    Not looking for generic full-stack developers with no Salesforce ecosystem expertise.
-•    Not looking for marketing operations analysts without technical depth.
-•    Not looking for pure data scientists or ML researchers without platform implementation experience.
-(We need someone who can architect and build Agentforce solutions end-to-end with deep Salesforce platform knowledge.)
-________________________________________
-Ideal background
-Education
-•    B.Tech/B.E. in Computer Science or related field, MCA, or equivalent technical degree
-•    Salesforce certifications are a strong signal (Administrator, Data Cloud Consultant, Agentforce Specialist)
-•    Degrees matter less than proof of building + delivering Salesforce AI solutions
-Experience
-•    6–8 years overall, with minimum 3+ years in the Salesforce ecosystem
-•    Worked as one of:
-o    Salesforce Technical Lead / Architect
-o    Agentforce / Data Cloud Implementation Lead
-o    Salesforce Solutions Engineer
-o    MarTech Platform Engineer (Salesforce-focused)
-o    CRM Technical Consultant with AI/Data Cloud focus
-Industries to source from:
-•    Salesforce consulting partners (Deloitte Digital, Accenture, Cognizant, etc.)
-•    Life sciences / pharma services with Salesforce implementations
-•    MarTech / CRM platform companies
-•    Enterprise SaaS with Salesforce integration depth
-________________________________________
-Screening keywords for TAG
-Target keywords:
-Agentforce, Data Cloud, CDP, Salesforce Marketing Cloud, SFMC, Experience Cloud, APEX, LWC, Lightning Web Components, MuleSoft, REST API, SOAP API, data modeling, profile unification, segmentation, audience management, AI agents, agentic, PoC, data connectors, data governance, Salesforce architecture, multi-cloud, integration patterns, onshore-offshore, technical delivery.
-Reject / deprioritize keywords (unless paired with Salesforce delivery experience):
-Junior admin, only Trailhead badges, no hands-on APEX, pure marketing ops, "configured reports only", no coding experience, academic AI research only.
-________________________________________
-Quick scorecard TAG can use (simple)
-•    Salesforce Ecosystem Expertise (SFMC/Data Cloud/Agentforce) – 0/1
-•    Agentforce / AI Agent Development – 0/1
-•    Salesforce Development & Integration (APEX/LWC/APIs) – 0/1
-•    Technical Leadership & Client Engagement – 0/1
-
-Hire pipeline: only shortlist candidates with 3/4+.
-
-# Quality Review Result
-
-{quality_review}
-
-# Resume
-
-{resume}
-
-# Output Format
-
-Provide your analysis in the following format:
-
-## Resume Quality Review
-{quality_summary}
-
-## Role Fit Scorecard
-| Criteria | Score | Evidence |
-|----------|-------|----------|
-| Salesforce Ecosystem Expertise (SFMC/Data Cloud/Agentforce) | 0 or 1 | Brief evidence from resume |
-| Agentforce / AI Agent Development | 0 or 1 | Brief evidence from resume |
-| Salesforce Development & Integration (APEX/LWC/APIs) | 0 or 1 | Brief evidence from resume |
-| Technical Leadership & Client Engagement | 0 or 1 | Brief evidence from resume |
-
-**Role Fit Score: X/4**
-**Quality Penalty: {penalty}**
-**Final Score: X/4**
-
-## Verdict
-**PROCEED TO INTERVIEW** or **DO NOT PROCEED**
-
-(Note: Candidates need final score of 3/4+ to proceed. Quality review FAIL results in -1 penalty.)
-
-## Key Strengths
-- Bullet points of relevant strengths
-
-## Concerns / Gaps
-- Bullet points of concerns or missing qualifications
-
-## Summary
-2-3 sentence summary of your recommendation.
-"""
+# Seconds between reruns while a job this session is watching is still queued or running
+JOB_STATUS_POLL_INTERVAL = 1.0
 
+# Jobs listed in the background jobs panel
+RECENT_JOBS_SHOWN = 20
 
-def get_api_key():
-    """Get OpenAI API key from secrets or session state."""
-    api_key = None
+# Upper bound for the batch concurrency slider
+MAX_BATCH_CONCURRENCY = 16
 
-    # Try to get from Streamlit secrets first (for deployment)
-    try:
-        if "OPENAI_API_KEY" in st.secrets:
-            api_key = st.secrets["OPENAI_API_KEY"]
-    except Exception:
-        pass
+# Script run times kept for the rerun latency shown in the footer
+RUN_TIMES_KEPT = 200
 
-    # Fall back to session state (for manual entry)
-    if not api_key and "openai_api_key" in st.session_state:
-        api_key = st.session_state.openai_api_key
-
-    return api_key
 
+@st.cache_resource
+def get_result_cache():
+    """Process-wide result cache shared by every session and rerun."""
+    return ResultCache(DEFAULT_CACHE_PATH, max_bytes=CACHE_MAX_BYTES, max_age_seconds=CACHE_MAX_AGE_DAYS * 24 * 3600)
 
-def convert_pdf_to_images(pdf_bytes):
-    """Convert PDF bytes to list of images with base64 encoding."""
-    images_data = []
 
-    # Open PDF from bytes
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+@st.cache_resource
+def get_duplicate_index():
+    """Process-wide near-duplicate index of screened resumes."""
+    return DuplicateIndex(DEFAULT_DEDUPE_PATH)
 
-    for page_num, page in enumerate(doc):
-        # Render page to image at 150 DPI for good quality
-        pix = page.get_pixmap(dpi=150)
 
-        # Convert to PIL Image
-        img_data = pix.tobytes("png")
+@st.cache_resource
+def get_candidate_store():
+    """Process-wide searchable store of finished screenings."""
+    return CandidateStore(DEFAULT_CANDIDATES_PATH)
 
-        # Encode to base64
-        base64_data = base64.b64encode(img_data).decode('utf-8')
 
-        images_data.append({
-            'data': base64_data,
-            'mime_type': 'image/png',
-            'page_num': page_num + 1
-        })
+@st.cache_resource
+def get_prepared_cache():
+    """Process-wide in-memory cache of prepared resumes, so a re-screen skips rendering."""
+    return MemoryCache(PREPARED_CACHE_ENTRIES)
 
-    doc.close()
-    return images_data
 
+@st.cache_resource
+def get_run_times():
+    """Process-wide script run times: the first (cold start, imports included) and recent reruns."""
+    return {"cold_start": None, "reruns": []}
 
-def call_openai_with_images(images_data, prompt, api_key):
-    """Call OpenAI GPT-5.2 with images for text extraction or quality review."""
-    client = OpenAI(api_key=api_key)
 
-    content = [{"type": "text", "text": prompt}]
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_text_layer(pdf_bytes):
+    """``extract_text_layer`` once per upload, not on every click."""
+    return extract_text_layer(pdf_bytes)
 
-    for img in images_data:
-        content.append({
-            "type": "image_url",
-            "image_url": {
-                "url": f"data:{img['mime_type']};base64,{img['data']}"
-            }
-        })
-
-    max_retries = 3
-    retry_delay = 5
-
-    for attempt in range(max_retries):
-        try:
-            response = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[{"role": "user", "content": content}],
-                temperature=0.1,
-                max_completion_tokens=32000
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            if "rate_limit" in str(e).lower() or "429" in str(e):
-                import time
-                time.sleep(retry_delay * 2)
-                retry_delay *= 2
-            else:
-                st.error(f"API Exception: {str(e)}")
-                if attempt < max_retries - 1:
-                    import time
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
-                else:
-                    return None
 
-    return None
+@st.cache_data(max_entries=8, show_spinner=False)
+def cached_image_profiles(pdf_bytes):
+    """``compare_image_profiles`` once per upload."""
+    return compare_image_profiles(pdf_bytes)
 
 
-def extract_resume_text(images_data, api_key):
-    """Extract text from resume images using GPT-5.2."""
-    extraction_prompt = """Extract ALL text content from this resume image(s).
+@st.cache_resource
+def get_job_runner():
+    """Process-wide background workers for the job queue; they outlive every script run."""
+    cache = get_result_cache()
+    dedupe = get_duplicate_index()
+    prepared = get_prepared_cache()
+    store = get_candidate_store()
 
-IMPORTANT:
-- Extract text EXACTLY as written - preserve all details
-- Maintain the structure (sections, bullet points, etc.)
-- Include all dates, company names, job titles, skills, education details
-- Do not summarize or paraphrase - extract verbatim
-- If there are multiple pages, process them in order
+    def handle_job(job, api_key, checkpoints, on_stage, on_partial):
+        outcome = run_job(
+            job, api_key, checkpoints, on_stage, on_partial, cache=cache, dedupe=dedupe, prepared=prepared
+        )
+        store.add_outcome(job["name"], outcome, job["role"])
+        if outcome.get("metrics"):
+            record_screening(outcome["metrics"])
+        return outcome
 
-Output the complete resume text in a clean, readable format."""
+    # Enough workers for the largest batch cap; each batch is capped by its own slider setting
+    return JobRunner(JobQueue(DEFAULT_JOBS_PATH), handle_job, MAX_BATCH_CONCURRENCY)
 
-    return call_openai_with_images(images_data, extraction_prompt, api_key)
 
+def get_api_key():
+    """Get OpenAI API key from secrets or session state."""
+    api_key = None
 
-def perform_quality_review(images_data, api_key):
-    """Perform quality review on resume images using GPT-5.2."""
-    return call_openai_with_images(images_data, QUALITY_REVIEW_PROMPT, api_key)
+    # Try to get from Streamlit secrets first (for deployment)
+    try:
+        if "OPENAI_API_KEY" in st.secrets:
+            api_key = st.secrets["OPENAI_API_KEY"]
+    except Exception:
+        pass
 
+    # Fall back to session state (for manual entry)
+    if not api_key and "openai_api_key" in st.session_state:
+        api_key = st.session_state.openai_api_key
 
-def parse_quality_review(quality_response):
-    """Parse the quality review JSON response."""
-    import json
-    import re
+    return api_key
 
-    try:
-        # Extract JSON from response (it might be wrapped in markdown code blocks)
-        json_match = re.search(r'```json\s*(.*?)\s*```', quality_response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # Try to find JSON directly
-            json_str = quality_response
-
-        # Clean up the string
-        json_str = json_str.strip()
-
-        # Parse JSON
-        quality_data = json.loads(json_str)
-        return quality_data
-    except Exception as e:
-        st.warning(f"Could not parse quality review response: {e}")
-        # Return default PASS if parsing fails
-        return {
-            "cv_source": "UNKNOWN",
-            "agency_name": None,
-            "total_score": 4,
-            "verdict": "PASS",
-            "summary": "Quality review parsing failed - defaulting to PASS",
-            "spelling_grammar": {"score": 1, "issues": []},
-            "factual_consistency": {"score": 1, "issues": []},
-            "layout_structure": {"score": 1, "issues": []},
-            "attention_to_detail": {"score": 1, "issues": []}
-        }
 
+def show_verdict_banner(placeholder, final_verdict, final_score):
+    """Render the PROCEED / DO NOT PROCEED banner into ``placeholder``."""
+    if final_verdict == "PROCEED TO INTERVIEW":
+        placeholder.success(f"""
+        ## ✅ PROCEED TO INTERVIEW
+        **Final Score: {final_score}/4** (minimum 3/4 required)
+        """)
+    elif final_verdict == "DO NOT PROCEED":
+        placeholder.error(f"""
+        ## ❌ DO NOT PROCEED
+        **Final Score: {final_score}/4** (minimum 3/4 required)
+        """)
+    else:
+        placeholder.warning("⚠️ Could not determine verdict - please review analysis below")
+
+
+def batch_result_row(name, stage, outcome=None):
+    """Build one row of the batch results table."""
+    row = {
+        "Candidate": name,
+        "Status": stage,
+        "Verdict": None,
+        "Final Score": None,
+        "Quality": None,
+        "CV Source": None,
+        "Pages": None,
+        "Unread Pages": None,
+        "Keyword Score": None,
+        "Duplicate Of": None
+    }
+    if outcome:
+        quality_data = outcome.get("quality_data") or {}
+        row["Verdict"] = outcome.get("verdict") or (
+            "Error" if outcome.get("error") else "Deferred" if outcome.get("deferred") else "Undetermined"
+        )
+        row["Keyword Score"] = (outcome.get("triage") or {}).get("score")
+        row["Final Score"] = int(outcome["final_score"]) if outcome.get("final_score") is not None else None
+        if quality_data:
+            row["Quality"] = f"{quality_data.get('verdict', 'PASS')} ({quality_data.get('total_score', 'N/A')}/4)"
+            row["CV Source"] = quality_data.get("cv_source", "UNKNOWN")
+        row["Pages"] = outcome.get("pages")
+        row["Unread Pages"] = outcome.get("truncated_pages") or None
+        duplicate_of = outcome.get("duplicate_of")
+        if duplicate_of:
+            row["Duplicate Of"] = f"{duplicate_of['name']} ({duplicate_of['similarity']:.0%})" + (
+                " - reused" if outcome.get("reused_duplicate") else ""
+            )
+    return row
+
+
+def models_text(models, analysis_models):
+    """One-line summary of the models behind a screening, e.g. for a caption."""
+    parts = [f"{stage.replace('_', ' ')} {model}" for stage, model in (models or {}).items()]
+    if analysis_models:
+        parts.append("analysis " + " → ".join(analysis_models)
+                     + (" (borderline, escalated)" if len(analysis_models) > 1 else ""))
+    return " · ".join(parts)
+
+
+def show_stage_metrics(metrics_record):
+    """Expander with where one screening's time and money went."""
+    totals = metrics_record["totals"]
+    with st.expander(f"⏱️ Stage metrics: {totals['seconds']:.1f}s, est. ${totals['cost_usd']:.4f}"):
+        st.dataframe(stage_rows(metrics_record), use_container_width=True, hide_index=True)
+        for note in budget_notes(metrics_record):
+            st.caption(f"Token budget - {note}")
+
+
+def show_job_progress(job):
+    """Status line for a queued or running job."""
+    st.info(f"⏳ **{job['name']}** - {job['stage']}... The screening runs in the background, so changing "
+            "options or closing the browser won't stop it.")
+
+
+def show_retry_button(runner, jobs, label):
+    """Button that requeues the failed ``jobs`` on this session's key; they resume from their last checkpoint."""
+    failed = [job for job in jobs if job["status"] == FAILED]
+    if failed and st.button(label, key=f"retry-{failed[0]['id']}"):
+        api_key = get_api_key()
+        if not api_key:
+            st.error("Please enter your access key first.")
+            return
+        for job in failed:
+            runner.retry(job["id"], api_key)
+        runner.notify()
+        st.rerun()
 
-def analyze_resume(resume_text: str, quality_data: dict, api_key: str, selected_role: str) -> str:
-    """Send resume to GPT-5.2 for analysis with quality review context."""
-    client = OpenAI(api_key=api_key)
 
-    # Determine penalty
-    quality_verdict = quality_data.get('verdict', 'PASS')
-    penalty = "-1" if quality_verdict == "FAIL" else "0"
+def show_quality_review(quality_data):
+    """Render the quality review step of a single-resume screening."""
+    st.markdown("### Step 1: Resume Quality Review")
 
-    # Get CV source info
+    # Show CV source
     cv_source = quality_data.get('cv_source', 'UNKNOWN')
     agency_name = quality_data.get('agency_name')
-    cv_source_text = f"Agency CV ({agency_name})" if cv_source == "AGENCY" and agency_name else cv_source
-
-    # Build quality summary
-    quality_summary = f"""
-**CV Source: {cv_source_text}**
-**Quality Verdict: {quality_verdict}**
-- Spelling & Grammar: {quality_data.get('spelling_grammar', {}).get('score', 'N/A')}/1
-- Factual/Technical Consistency: {quality_data.get('factual_consistency', {}).get('score', 'N/A')}/1
-- Layout & Structure: {quality_data.get('layout_structure', {}).get('score', 'N/A')}/1
-- Attention to Detail: {quality_data.get('attention_to_detail', {}).get('score', 'N/A')}/1
-- Quality Score: {quality_data.get('total_score', 'N/A')}/4
-- Summary: {quality_data.get('summary', 'N/A')}
-"""
-
-    # Build quality review context for GPT
-    quality_review_context = f"""
-The resume has undergone a quality review with the following results:
-- CV Source: {cv_source_text}
-- Verdict: {quality_verdict}
-- Quality Score: {quality_data.get('total_score', 'N/A')}/4
-- Issues Found: {quality_data.get('summary', 'None noted')}
-
-{'IMPORTANT: Since quality review FAILED, apply a -1 penalty to the final score.' if quality_verdict == 'FAIL' else 'Quality review passed - no penalty applied.'}
-"""
-
-    # Select the appropriate screening prompt based on role
-    if selected_role == "Lead Business Analyst":
-        screening_prompt = BA_SCREENING_PROMPT
-    elif selected_role == "Agentforce Engineer":
-        screening_prompt = AGENTFORCE_SCREENING_PROMPT
+
+    if cv_source == "AGENCY":
+        source_text = f"Agency CV"
+        if agency_name:
+            source_text += f" ({agency_name})"
+        st.info(f"📋 **CV Source:** {source_text} - Formatting leniency applied")
     else:
-        screening_prompt = SCREENING_PROMPT
+        st.info(f"📋 **CV Source:** Direct Candidate CV")
 
-    prompt = screening_prompt.format(
-        resume=resume_text,
-        quality_review=quality_review_context,
-        quality_summary=quality_summary,
-        penalty=penalty
-    )
+    quality_verdict = quality_data.get('verdict', 'PASS')
+    if quality_verdict == "PASS":
+        st.success(f"Quality Review: **PASS** ({quality_data.get('total_score', 'N/A')}/4)")
+    else:
+        st.error(f"Quality Review: **FAIL** ({quality_data.get('total_score', 'N/A')}/4) - This will result in a -1 penalty to the final score")
+
+    with st.expander("View Quality Review Details"):
+        st.markdown(f"**Summary:** {quality_data.get('summary', 'N/A')}")
+
+        for criterion in ['spelling_grammar', 'factual_consistency', 'layout_structure', 'attention_to_detail']:
+            criterion_data = quality_data.get(criterion, {})
+            score = criterion_data.get('score', 'N/A')
+            issues = criterion_data.get('issues', [])
+
+            criterion_name = criterion.replace('_', ' ').title()
+            score_icon = "✅" if score == 1 else "❌"
+
+            st.markdown(f"**{criterion_name}:** {score_icon} ({score}/1)")
+            if issues and len(issues) > 0:
+                for issue in issues:
+                    st.markdown(f"  - {issue}")
+
+    # Clear indicator that this is not the final verdict
+    st.warning("⚠️ **This is NOT the final verdict.** Quality review only affects scoring. The final PROCEED/DO NOT PROCEED decision is based on Role Fit Analysis below.")
+
+
+def show_single_job(job, runner):
+    """Render a single-resume job: its progress (with the report streamed so far) or its result."""
+    st.markdown("---")
+    if job["status"] in ACTIVE_STATES:
+        show_job_progress(job)
+        if job["partial"]:
+            # The worker stores the report as it streams in, so the recruiter can read along
+            provisional = job["partial"].startswith(PROVISIONAL_REPORT_NOTE)
+            st.markdown("## Provisional Decision" if provisional else "## Final Decision")
+            verdict_placeholder = st.empty()
+            final_verdict = parse_verdict(job["partial"])
+            if final_verdict and provisional:
+                verdict_placeholder.info(f"⏳ First pass: {final_verdict} ({parse_final_score(job['partial'])}/4) - "
+                                         "a borderline result is re-checked before the final decision")
+            elif final_verdict:
+                show_verdict_banner(verdict_placeholder, final_verdict, parse_final_score(job["partial"]))
+            else:
+                verdict_placeholder.info("⏳ Analyzing resume against role criteria...")
+            with st.expander("📋 View Detailed Analysis", expanded=True):
+                st.markdown(job["partial"] + " ▌")
+        return
+
+    outcome = job["result"] or new_outcome(error=job["error"])
+    st.markdown(f"### {job['name']} - {job['role']}")
+    if outcome.get("pages"):
+        text_layer_count = outcome.get("text_layer_pages", 0)
+        st.info(f"Processed {outcome['pages']} page(s) - {text_layer_count} with a usable text layer, "
+                f"{outcome['pages'] - text_layer_count} need OCR")
+    if outcome.get("truncated_pages"):
+        st.warning(f"Only the first {MAX_RENDER_PAGES} pages were reviewed - "
+                   f"{outcome['truncated_pages']} later page(s) were not read")
+    keyword_triage = outcome.get("triage")
+    if keyword_triage and keyword_triage["score"] is not None:
+        st.caption(
+            f"Keyword pre-screen score: {keyword_triage['score']} · "
+            f"target: {', '.join(keyword_triage['target_hits']) or 'none'} · "
+            f"reject: {', '.join(keyword_triage['reject_hits']) or 'none'}"
+        )
+    if outcome.get("quality_warning"):
+        st.warning(outcome["quality_warning"])
+
+    payload_log = outcome.get("payload")
+    if payload_log:
+        total_kb = sum(entry["bytes"] for entry in payload_log) / 1024
+        with st.expander(f"Image payload: {total_kb:.0f} KB across {len(payload_log)} page image(s)"):
+            st.dataframe([
+                {"Stage": entry["stage"], "Page": entry["page_num"], "KB": round(entry["bytes"] / 1024, 1)}
+                for entry in payload_log
+            ], use_container_width=True, hide_index=True)
+
+    if outcome.get("quality_data"):
+        st.markdown("---")
+        show_quality_review(outcome["quality_data"])
 
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "user", "content": prompt}
-        ]
-    )
+    if outcome.get("error"):
+        st.error(f"Error screening resume: {outcome['error']}")
+        show_retry_button(runner, [job], "Retry")
+    else:
+        duplicate_of = outcome.get("duplicate_of")
+        if duplicate_of:
+            st.warning(
+                f"🔁 **Possible duplicate:** {duplicate_of['similarity']:.0%} similar to "
+                f"{duplicate_of['name'] or 'an earlier submission'} (screened {duplicate_of['screened_at']})"
+                + (" - showing the earlier result" if outcome.get("reused_duplicate") else "")
+            )
+
+        st.markdown("---")
+
+        # Prominent verdict display
+        st.markdown("## Final Decision")
+        show_verdict_banner(st.empty(), outcome["verdict"], outcome["final_score"])
+        if outcome.get("models") or outcome.get("analysis_models"):
+            st.caption("Models: " + models_text(outcome.get("models"), outcome.get("analysis_models")))
+
+        with st.expander("📋 View Detailed Analysis", expanded=True):
+            st.markdown(outcome["analysis"])
+
+    if outcome.get("metrics"):
+        show_stage_metrics(outcome["metrics"])
 
-    return response.choices[0].message.content
+
+def show_role_fit_job(job, runner):
+    """Render an all-roles job: its progress or the role fit matrix and per-role reports."""
+    st.markdown("---")
+    if job["status"] in ACTIVE_STATES:
+        show_job_progress(job)
+        return
+
+    outcome = job["result"] or {"error": job["error"], "roles": {}}
+    st.markdown(f"### Role Fit - {job['name']}")
+
+    if outcome.get("quality_warning"):
+        st.warning(outcome["quality_warning"])
+    if outcome.get("error"):
+        st.error(f"Error screening resume: {outcome['error']}")
+        show_retry_button(runner, [job], "Retry")
+    else:
+        quality_data = outcome["quality_data"] or {}
+        st.info(
+            f"📋 **CV Source:** {quality_data.get('cv_source', 'UNKNOWN')} · "
+            f"**Quality Review:** {quality_data.get('verdict', 'PASS')} ({quality_data.get('total_score', 'N/A')}/4)"
+        )
+        st.dataframe([
+            {
+                "Role": role,
+                "Verdict": result["verdict"] or ("Error" if result["error"] else "Undetermined"),
+                "Role Fit": int(result["role_fit_score"]) if result["role_fit_score"] is not None else None,
+                "Final Score": int(result["final_score"]) if result["final_score"] is not None else None
+            }
+            for role, result in outcome["roles"].items()
+        ], use_container_width=True, hide_index=True)
+
+        for role, result in outcome["roles"].items():
+            with st.expander(f"📋 {role}"):
+                if result["error"]:
+                    st.error(f"Error analyzing resume: {result['error']}")
+                else:
+                    st.markdown(result["analysis"])
+
+    if outcome.get("metrics"):
+        show_stage_metrics(outcome["metrics"])
+
+
+def show_batch_jobs(jobs, runner):
+    """Render a batch: a live progress table while any job is in flight, then the results."""
+    active = [job for job in jobs if job["status"] in ACTIVE_STATES]
+    if active:
+        finished = len(jobs) - len(active)
+        st.progress(finished / len(jobs), text=f"Screened {finished} of {len(jobs)} resume(s)")
+        st.dataframe([batch_result_row(job["name"], job["stage"], job["result"]) for job in jobs],
+                     use_container_width=True, hide_index=True)
+        return
+
+    names = [job["name"] for job in jobs]
+    outcomes = [job["result"] or new_outcome(error=job["error"]) for job in jobs]
+    st.markdown("---")
+    st.markdown(f"### Batch Results - {jobs[0]['role']}")
+
+    rows = [
+        batch_result_row(name, "Failed" if outcome.get("error") else "Done", outcome)
+        for name, outcome in zip(names, outcomes)
+    ]
+    proceed_count = sum(1 for row in rows if row["Verdict"] == "PROCEED TO INTERVIEW")
+    st.info(f"{proceed_count} of {len(rows)} candidate(s) recommended for interview")
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    show_retry_button(runner, jobs, "Retry failed resumes")
+
+    metrics_records = [outcome["metrics"] for outcome in outcomes if outcome.get("metrics")]
+    if metrics_records:
+        total_cost = sum(record["totals"]["cost_usd"] for record in metrics_records)
+        with st.expander(f"⏱️ Batch stage latency (est. ${total_cost:.4f})"):
+            st.dataframe([
+                {
+                    "Stage": stage,
+                    "Resumes": summary["count"],
+                    "p50 s": round(summary["p50"], 2),
+                    "p95 s": round(summary["p95"], 2)
+                }
+                for stage, summary in latency_summary(metrics_records).items()
+            ], use_container_width=True, hide_index=True)
+
+    for name, outcome in zip(names, outcomes):
+        with st.expander(f"📋 {name}"):
+            if outcome.get("error"):
+                st.error(f"Error screening resume: {outcome['error']}")
+            elif outcome.get("deferred"):
+                triage = outcome["triage"]
+                st.info(f"Deferred by keyword pre-triage (score {triage['score']}). "
+                        f"Target: {', '.join(triage['target_hits']) or 'none'} · "
+                        f"reject: {', '.join(triage['reject_hits']) or 'none'}")
+            else:
+                st.markdown(outcome["analysis"])
+            if outcome.get("metrics"):
+                st.caption("Stage metrics")
+                st.dataframe(stage_rows(outcome["metrics"]), use_container_width=True, hide_index=True)
 
 
 # Main UI
@@ -743,146 +487,408 @@ else:
 
 st.markdown("---")
 
-# Resume upload
-st.markdown("### Upload Resume (PDF only)")
-uploaded_file = st.file_uploader(
-    "Choose a PDF file",
-    type=["pdf"],
-    help="Upload the candidate's resume in PDF format"
+# Shared result cache
+cache = get_result_cache()
+
+# Background workers; each job runs on its submitter's key, which is never written to the queue
+runner = get_job_runner()
+queue = runner.queue
+
+# Jobs shown on this run - the script reruns itself while any is unfinished
+watched_jobs = []
+
+# Screening mode
+mode = st.radio(
+    "Mode",
+    options=["Single resume", "All roles", "Batch"],
+    horizontal=True,
+    help="All roles screens one resume against every open role; batch mode screens many resumes "
+         "concurrently against the selected role"
 )
 
-if uploaded_file:
-    st.success(f"Uploaded: {uploaded_file.name}")
-
-# Analyze button
-col1, col2, col3 = st.columns([1, 1, 1])
-with col2:
-    analyze_btn = st.button("Analyze Resume", type="primary", use_container_width=True)
-
-# Process
-if analyze_btn:
-    api_key = get_api_key()
-    if not uploaded_file:
-        st.error("Please upload a PDF resume before analyzing.")
-    elif not api_key:
-        st.error("Please enter your access key first.")
-    else:
-        # Read PDF bytes
-        pdf_bytes = uploaded_file.read()
+use_fused = st.checkbox(
+    "Fused review + extraction",
+    value=FUSED_REVIEW_AND_EXTRACTION,
+    help="For scanned pages, send the page images once for a combined quality review and transcription call"
+)
 
-        # Step 1: Convert PDF to images
-        with st.spinner("Converting PDF to images..."):
+check_duplicates = st.checkbox(
+    "Flag near-duplicate candidates",
+    value=True,
+    help="Compare the extracted text with earlier submissions (e.g. the same CV from another agency)"
+)
+reuse_duplicates = st.checkbox(
+    "Reuse the earlier result for duplicates",
+    value=False,
+    disabled=not check_duplicates,
+    help="Skip the role-fit analysis when a near-duplicate was already screened for this role"
+)
+if mode == "Single resume":
+    # Resume upload
+    st.markdown("### Upload Resume (PDF only)")
+    uploaded_file = st.file_uploader(
+        "Choose a PDF file",
+        type=["pdf"],
+        help="Upload the candidate's resume in PDF format"
+    )
+
+    if uploaded_file:
+        st.success(f"Uploaded: {uploaded_file.name}")
+
+        with st.expander("Compare image encodings"):
+            st.caption("Upload size of this resume under each page image profile. "
+                       "Accuracy scores transcription of born-digital pages against the PDF text layer.")
+            measure_accuracy = st.checkbox("Also measure extraction accuracy (one API call per profile)")
+            if st.button("Run comparison"):
+                with st.spinner("Rendering pages under each profile..."):
+                    pdf_bytes = uploaded_file.getvalue()
+                    size_report = cached_image_profiles(pdf_bytes)
+                    accuracy_report = {}
+                    if measure_accuracy and get_api_key():
+                        accuracy_report = measure_extraction_accuracy(pdf_bytes, get_api_key())
+                baseline_bytes = size_report["original"]["bytes"] or 1
+                st.dataframe([
+                    {
+                        "Profile": name,
+                        "Pages sent": report["pages"],
+                        "KB": round(report["bytes"] / 1024, 1),
+                        "vs original": f"{report['bytes'] / baseline_bytes:.0%}",
+                        "KB per page": ", ".join(f"{b / 1024:.0f}" for b in report["bytes_per_page"]),
+                        "Accuracy": (f"{accuracy_report[name]['similarity']:.1%}" if name in accuracy_report else None)
+                    }
+                    for name, report in size_report.items()
+                ], use_container_width=True, hide_index=True)
+
+        with st.expander("Compare fused vs two-call pipeline"):
+            st.caption("Runs the quality review and extraction both ways on this resume (bypassing the cache) "
+                       "and compares latency, upload size and agreement. Uses API calls.")
+            if st.button("Run pipeline comparison") and get_api_key():
+                with st.spinner("Running both pipelines..."):
+                    comparison = compare_fused_and_split(uploaded_file.getvalue(), get_api_key())
+                agreement = comparison["agreement"]
+                if not agreement["ocr_pages"]:
+                    st.info("Every page has a usable text layer, so both paths make the same single review call.")
+                st.dataframe([
+                    {
+                        "Pipeline": name,
+                        "Seconds": round(comparison[name]["seconds"], 2),
+                        "Vision calls": comparison[name]["model_calls"],
+                        "Images sent": comparison[name]["images"],
+                        "KB": round(comparison[name]["bytes"] / 1024, 1),
+                        "Quality": f"{comparison[name]['quality_verdict']} ({comparison[name]['quality_score']}/4)",
+                        "Text chars": comparison[name]["text_chars"],
+                        "Problem": comparison[name]["problem"]
+                    }
+                    for name in ("split", "fused")
+                ], use_container_width=True, hide_index=True)
+                st.markdown(
+                    f"**Same quality verdict:** {'Yes' if agreement['same_verdict'] else 'No'} · "
+                    f"**Criteria matching:** {agreement['criteria_matching']}/4 · "
+                    f"**Transcript similarity:** {agreement['text_similarity']:.1%}"
+                )
+
+    # Analyze button
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col2:
+        analyze_btn = st.button("Analyze Resume", type="primary", use_container_width=True)
+
+    # Submit to the background queue - the screening carries on whatever this script run does next
+    if analyze_btn:
+        api_key = get_api_key()
+        if not uploaded_file:
+            st.error("Please upload a PDF resume before analyzing.")
+        elif not api_key:
+            st.error("Please enter your access key first.")
+        else:
+            pdf_bytes = uploaded_file.getvalue()
             try:
-                images_data = convert_pdf_to_images(pdf_bytes)
-                st.info(f"Processed {len(images_data)} page(s)")
+                keyword_triage = triage_resume(cached_text_layer(pdf_bytes), selected_role)
             except Exception as e:
                 st.error(f"Error converting PDF: {str(e)}")
                 st.stop()
+            st.session_state.single_job_id = runner.submit(
+                api_key, "single", uploaded_file.name, pdf_bytes, selected_role, {
+                    "fused": use_fused,
+                    "dedupe": check_duplicates,
+                    "reuse_duplicates": reuse_duplicates,
+                    "triage": keyword_triage
+                }
+            )
+            runner.notify()
+
+    # Only the job id lives in the session; the job itself survives reruns and restarts
+    single_job = queue.get(st.session_state["single_job_id"]) if st.session_state.get("single_job_id") else None
+    if single_job:
+        show_single_job(single_job, runner)
+        watched_jobs.append(single_job)
+
+elif mode == "All roles":
+    st.markdown("### Upload Resume (PDF only)")
+    uploaded_file = st.file_uploader(
+        "Choose a PDF file",
+        type=["pdf"],
+        help="The resume is rendered, reviewed and extracted once, then screened against every role"
+    )
 
-        # Step 2: Quality Review
-        with st.spinner("Performing resume quality review..."):
-            try:
-                quality_response = perform_quality_review(images_data, api_key)
-                if quality_response:
-                    quality_data = parse_quality_review(quality_response)
-                else:
-                    st.warning("Quality review failed - proceeding with default PASS")
-                    quality_data = {"verdict": "PASS", "total_score": 4, "summary": "Review unavailable"}
-            except Exception as e:
-                st.warning(f"Quality review error: {str(e)} - proceeding with default PASS")
-                quality_data = {"verdict": "PASS", "total_score": 4, "summary": "Review unavailable"}
-
-        # Display quality review result
-        st.markdown("---")
-        st.markdown("### Step 1: Resume Quality Review")
-
-        # Show CV source
-        cv_source = quality_data.get('cv_source', 'UNKNOWN')
-        agency_name = quality_data.get('agency_name')
-
-        if cv_source == "AGENCY":
-            source_text = f"Agency CV"
-            if agency_name:
-                source_text += f" ({agency_name})"
-            st.info(f"📋 **CV Source:** {source_text} - Formatting leniency applied")
-        else:
-            st.info(f"📋 **CV Source:** Direct Candidate CV")
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col2:
+        fit_btn = st.button("Screen Against All Roles", type="primary", use_container_width=True)
 
-        quality_verdict = quality_data.get('verdict', 'PASS')
-        if quality_verdict == "PASS":
-            st.success(f"Quality Review: **PASS** ({quality_data.get('total_score', 'N/A')}/4)")
+    if fit_btn:
+        api_key = get_api_key()
+        if not uploaded_file:
+            st.error("Please upload a PDF resume before analyzing.")
+        elif not api_key:
+            st.error("Please enter your access key first.")
         else:
-            st.error(f"Quality Review: **FAIL** ({quality_data.get('total_score', 'N/A')}/4) - This will result in a -1 penalty to the final score")
-
-        with st.expander("View Quality Review Details"):
-            st.markdown(f"**Summary:** {quality_data.get('summary', 'N/A')}")
-
-            for criterion in ['spelling_grammar', 'factual_consistency', 'layout_structure', 'attention_to_detail']:
-                criterion_data = quality_data.get(criterion, {})
-                score = criterion_data.get('score', 'N/A')
-                issues = criterion_data.get('issues', [])
-
-                criterion_name = criterion.replace('_', ' ').title()
-                score_icon = "✅" if score == 1 else "❌"
-
-                st.markdown(f"**{criterion_name}:** {score_icon} ({score}/1)")
-                if issues and len(issues) > 0:
-                    for issue in issues:
-                        st.markdown(f"  - {issue}")
+            st.session_state.role_fit_job_id = runner.submit(
+                api_key, "all_roles", uploaded_file.name, uploaded_file.getvalue(), options={"fused": use_fused}
+            )
+            runner.notify()
 
-        # Clear indicator that this is not the final verdict
-        st.warning("⚠️ **This is NOT the final verdict.** Quality review only affects scoring. The final PROCEED/DO NOT PROCEED decision is based on Role Fit Analysis below.")
+    # Kept across reruns so opening a role's report doesn't lose the matrix
+    role_fit_job = queue.get(st.session_state["role_fit_job_id"]) if st.session_state.get("role_fit_job_id") else None
+    if role_fit_job:
+        show_role_fit_job(role_fit_job, runner)
+        watched_jobs.append(role_fit_job)
 
-        # Step 3: Extract text from resume
-        with st.spinner("Extracting resume content..."):
-            try:
-                resume_text = extract_resume_text(images_data, api_key)
-                if not resume_text:
-                    st.error("Failed to extract text from resume")
-                    st.stop()
-            except Exception as e:
-                st.error(f"Error extracting text: {str(e)}")
-                st.stop()
+else:
+    # Batch upload
+    st.markdown("### Upload Resumes (PDF only)")
+    uploaded_files = st.file_uploader(
+        "Choose PDF files",
+        type=["pdf"],
+        accept_multiple_files=True,
+        help="Upload all candidate resumes for this role"
+    )
 
-        # Step 4: Analyze with GPT-5.2
-        with st.spinner("Analyzing resume against role criteria..."):
-            try:
-                result = analyze_resume(resume_text, quality_data, api_key, selected_role)
-
-                # Extract verdict from result
-                import re
-                verdict_match = re.search(r'\*\*(PROCEED TO INTERVIEW|DO NOT PROCEED)\*\*', result)
-                final_verdict = verdict_match.group(1) if verdict_match else None
-
-                # Extract final score if present
-                score_match = re.search(r'\*\*Final Score:\s*(\d+)/4\*\*', result)
-                final_score = score_match.group(1) if score_match else None
-
-                st.markdown("---")
-
-                # Prominent verdict display
-                st.markdown("## Final Decision")
-
-                if final_verdict == "PROCEED TO INTERVIEW":
-                    st.success(f"""
-                    ## ✅ PROCEED TO INTERVIEW
-                    **Final Score: {final_score}/4** (minimum 3/4 required)
-                    """)
-                elif final_verdict == "DO NOT PROCEED":
-                    st.error(f"""
-                    ## ❌ DO NOT PROCEED
-                    **Final Score: {final_score}/4** (minimum 3/4 required)
-                    """)
-                else:
-                    st.warning("⚠️ Could not determine verdict - please review analysis below")
+    if uploaded_files:
+        st.success(f"Uploaded: {len(uploaded_files)} file(s)")
 
-                # Detailed analysis in expander
-                with st.expander("📋 View Detailed Analysis", expanded=False):
-                    st.markdown(result)
+    max_concurrency = st.slider(
+        "Max concurrent resumes",
+        min_value=1,
+        max_value=MAX_BATCH_CONCURRENCY,
+        value=DEFAULT_BATCH_CONCURRENCY,
+        help="Resumes of this batch screened at once - lower this if you hit rate limits"
+    )
 
-            except Exception as e:
-                st.error(f"Error analyzing resume: {str(e)}")
+    triage_option = st.selectbox(
+        "Keyword pre-triage",
+        options=["Off", "Screen best matches first", "Defer weak matches"],
+        help="Score each resume's text layer against the role's target/reject keywords before any model call. "
+             f"Weak matches score below {ROLES[selected_role]['triage_min_score']} for this role; "
+             "scanned resumes are never deferred."
+    )
+    triage_mode = {"Off": None, "Screen best matches first": "order", "Defer weak matches": "defer"}[triage_option]
+
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col2:
+        batch_btn = st.button("Screen All Resumes", type="primary", use_container_width=True)
+
+    if batch_btn:
+        api_key = get_api_key()
+        if not uploaded_files:
+            st.error("Please upload at least one PDF resume before screening.")
+        elif not api_key:
+            st.error("Please enter your access key first.")
+        else:
+            files = [(f.name, f.getvalue()) for f in uploaded_files]
+            order, triage_results, deferred = triage_batch(files, selected_role, triage_mode)
+            batch_id = uuid.uuid4().hex
+            # Workers take a batch's jobs in submission order, so the best keyword matches go first
+            for i in order:
+                name, pdf_bytes = files[i]
+                runner.submit(
+                    api_key, "single", name, pdf_bytes, selected_role, {
+                        "fused": use_fused,
+                        "dedupe": check_duplicates,
+                        "reuse_duplicates": reuse_duplicates,
+                        "triage": triage_results.get(i)
+                    }, batch_id, i,
+                    result=new_outcome(triage=triage_results[i], deferred=True) if i in deferred else None,
+                    max_running=max_concurrency
+                )
+            runner.notify()
+            st.session_state.batch_id = batch_id
+
+    # Results persist across reruns so expanding a candidate doesn't lose the batch
+    batch_jobs = queue.list_jobs(batch_id=st.session_state["batch_id"]) if st.session_state.get("batch_id") else []
+    if batch_jobs:
+        show_batch_jobs(batch_jobs, runner)
+        watched_jobs.extend(batch_jobs)
 
 # Footer
 st.markdown("---")
-st.caption("Resume screening powered by AI")
+store = get_candidate_store()
+store_stats = store.stats()
+with st.expander(f"🔎 Search screened candidates: {store_stats['resumes']} resume(s), "
+                 f"{store_stats['screenings']} screening(s)"):
+    search_text = st.text_input(
+        "Resume mentions",
+        placeholder="e.g. MuleSoft Data Cloud",
+        help="Every word must appear in the extracted resume text; end a word with * to match it as a prefix"
+    )
+    col1, col2, col3 = st.columns(3)
+    search_role = col1.selectbox("Role", ["Any"] + list(ROLES), index=1 + list(ROLES).index(selected_role))
+    search_verdict = col2.selectbox("Verdict", ["Any", "PROCEED TO INTERVIEW", "DO NOT PROCEED"])
+    search_min_score = col3.slider("Final score at least", min_value=0, max_value=4, value=0)
+    col1, col2, col3 = st.columns(3)
+    search_source = col1.selectbox("CV source", ["Any", "DIRECT", "AGENCY"])
+    search_agency = col2.selectbox("Agency", ["Any"] + store.agencies())
+    search_since = col3.date_input("Screened since", value=None)
+
+    search_start = time.perf_counter()
+    matches = store.search(
+        search_text,
+        role=None if search_role == "Any" else search_role,
+        verdict=None if search_verdict == "Any" else search_verdict,
+        min_score=search_min_score or None,
+        cv_source=None if search_source == "Any" else search_source,
+        agency=None if search_agency == "Any" else search_agency,
+        since=time.mktime(search_since.timetuple()) if search_since else None
+    )
+    st.caption(f"{len(matches)} match(es) in {(time.perf_counter() - search_start) * 1000:.0f} ms"
+               + (f" - showing the best {DEFAULT_SEARCH_LIMIT}" if len(matches) == DEFAULT_SEARCH_LIMIT else ""))
+    if matches:
+        st.dataframe([
+            {
+                "Candidate": match["name"],
+                "Role": match["role"],
+                "Verdict": match["verdict"],
+                "Final Score": match["final_score"],
+                "Quality": f"{match['quality_verdict']} ({match['quality_score']}/4)",
+                "Source": match["agency_name"] or match["cv_source"],
+                "Screened": time.strftime("%Y-%m-%d %H:%M", time.localtime(match["screened_at"]))
+            }
+            for match in matches
+        ], use_container_width=True, hide_index=True)
+        labels = {match["screening_id"]: f"{match['name']} - {match['role']}" for match in matches}
+        stored_id = st.selectbox("Open report", options=[None] + list(labels),
+                                 format_func=lambda screening_id: labels.get(screening_id, "-"))
+        if stored_id is not None:
+            stored = store.get_screening(stored_id)
+            show_verdict_banner(st.empty(), stored["verdict"], stored["final_score"])
+            st.markdown(stored["analysis"])
+
+with st.expander(f"🎯 Shortlist stored candidates for {selected_role}"):
+    st.caption("Ranks every stored resume against this role's guidance and target keywords (BM25, no API calls), "
+               "so only the best matches need screening.")
+    col1, col2 = st.columns(2)
+    shortlist_size = col1.slider("Shortlist size", min_value=5, max_value=200, value=DEFAULT_SHORTLIST_SIZE, step=5)
+    unscreened_only = col2.checkbox("Skip candidates already screened for this role", value=True)
+    if st.button("Rank stored candidates"):
+        rank_start = time.perf_counter()
+        st.session_state.shortlist = {
+            "role": selected_role,
+            "candidates": shortlist_stored_candidates(store, selected_role, shortlist_size, unscreened_only),
+            "seconds": time.perf_counter() - rank_start
+        }
+
+    # Ranked on request only - it scans the whole store, too slow to redo on every rerun
+    shortlist = st.session_state.get("shortlist")
+    if shortlist and shortlist["role"] == selected_role:
+        st.caption(f"Ranked in {shortlist['seconds'] * 1000:.0f} ms")
+        st.dataframe([
+            {
+                "Candidate": candidate["name"],
+                "BM25 score": round(candidate["score"], 2),
+                "Screened verdict": candidate["verdict"],
+                "Final Score": candidate["final_score"]
+            }
+            for candidate in shortlist["candidates"]
+        ], use_container_width=True, hide_index=True)
+        if shortlist["candidates"] and st.button(f"Screen these {len(shortlist['candidates'])} candidate(s)"):
+            if not api_key:
+                st.error("Please enter your access key first.")
+            else:
+                batch_id = uuid.uuid4().hex
+                for position, candidate in enumerate(shortlist["candidates"]):
+                    stored = store.get_resume(candidate["resume_id"])
+                    runner.submit(api_key, "stored", stored["name"], b"", selected_role, {
+                        "resume_text": stored["resume_text"],
+                        "quality_data": stored["quality_data"]
+                    }, batch_id, position, max_running=DEFAULT_BATCH_CONCURRENCY)
+                runner.notify()
+                st.session_state.shortlist_batch_id = batch_id
+
+    shortlist_jobs = (queue.list_jobs(batch_id=st.session_state["shortlist_batch_id"])
+                      if st.session_state.get("shortlist_batch_id") else [])
+    if shortlist_jobs:
+        show_batch_jobs(shortlist_jobs, runner)
+        watched_jobs.extend(shortlist_jobs)
+
+job_counts = queue.counts()
+with st.expander(f"🗂️ Background jobs: {job_counts.get('queued', 0)} queued, {job_counts.get('running', 0)} running"):
+    waiting = runner.waiting_for_key()
+    if waiting:
+        st.caption(f"{len(waiting)} queued job(s) were submitted before a restart and wait for an access key.")
+        if api_key and st.button("Resume them with my key"):
+            runner.resume(waiting, api_key)
+            st.rerun()
+    recent_jobs = queue.list_jobs(limit=RECENT_JOBS_SHOWN)
+    if recent_jobs:
+        st.dataframe([
+            {
+                "Submitted": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job["created_at"])),
+                "Candidate": job["name"],
+                "Role": job["role"] or "All roles",
+                "Status": job["status"],
+                "Stage": job["stage"],
+                "Batch": job["batch_id"][:8] if job["batch_id"] else None
+            }
+            for job in recent_jobs
+        ], use_container_width=True, hide_index=True)
+        # Reattach to a job after a browser drop; it shows under its mode
+        jobs_by_id = {job["id"]: job for job in recent_jobs}
+        reopen_id = st.selectbox(
+            "Open a job",
+            options=list(jobs_by_id),
+            format_func=lambda job_id: f"{jobs_by_id[job_id]['name']} - {jobs_by_id[job_id]['role'] or 'All roles'}"
+                                       + (f" (batch {jobs_by_id[job_id]['batch_id'][:8]})"
+                                          if jobs_by_id[job_id]["batch_id"] else "")
+        )
+        if st.button("Open"):
+            reopen = jobs_by_id[reopen_id]
+            if reopen["kind"] == "stored":
+                st.session_state.shortlist_batch_id = reopen["batch_id"]
+            elif reopen["batch_id"]:
+                st.session_state.batch_id = reopen["batch_id"]
+            elif reopen["kind"] == "all_roles":
+                st.session_state.role_fit_job_id = reopen["id"]
+            else:
+                st.session_state.single_job_id = reopen["id"]
+            st.rerun()
+    else:
+        st.caption("No jobs yet")
+with st.expander("Export metrics"):
+    st.caption(f"Every screening is appended to {DEFAULT_METRICS_JSONL}; "
+               f"{DEFAULT_METRICS_PROM} holds Prometheus text-format aggregates for this process.")
+    col1, col2 = st.columns(2)
+    try:
+        with open(DEFAULT_METRICS_JSONL, "rb") as f:
+            col1.download_button("Download metrics JSONL", f.read(), file_name="metrics.jsonl")
+    except FileNotFoundError:
+        col1.caption("No screenings recorded yet")
+    col2.download_button("Download Prometheus metrics", get_registry().render(), file_name="metrics.prom")
+cache_stats = cache.stats()
+prepared_stats = get_prepared_cache().stats()
+run_times = get_run_times()
+run_seconds = time.perf_counter() - SCRIPT_START
+if run_times["cold_start"] is None:
+    run_times["cold_start"] = run_seconds
+else:
+    run_times["reruns"] = (run_times["reruns"] + [run_seconds])[-RUN_TIMES_KEPT:]
+st.caption(
+    f"Resume screening powered by AI · Cache: {cache_stats['hits']} hit(s), "
+    f"{cache_stats['misses']} miss(es), {cache_stats['entries']} entries ({cache_stats['bytes'] / 1024 / 1024:.1f} MB)"
+    f" · Prepared resumes in memory: {prepared_stats['entries']} ({prepared_stats['hits']} reused)"
+    f" · Page ran in {run_seconds * 1000:.0f} ms (cold start {run_times['cold_start']:.2f}s"
+    + (f", rerun p50 {percentile(run_times['reruns'], 50) * 1000:.0f} ms, "
+       f"p95 {percentile(run_times['reruns'], 95) * 1000:.0f} ms)" if run_times["reruns"] else ")")
+)
+
+# Poll instead of blocking: the work happens in the job runner, this only re-reads its status
+if any(job["status"] in ACTIVE_STATES for job in watched_jobs):
+    time.sleep(JOB_STATUS_POLL_INTERVAL)
+    st.rerun()
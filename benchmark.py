@@ -0,0 +1,360 @@
+"""Offline throughput benchmark for the screening pipeline.
+
+Runs the full pipeline (``convert_pdf_to_images`` through ``analyze_resume``,
+via ``run_batch``) over a synthetic corpus of resumes against the local mock
+endpoint in mock_openai.py, so performance changes can be measured on a
+plain Linux box without spending API money. Example:
+
+    python benchmark.py --copies 4 --workers 8 --latency 0.5 --rate-limit-rate 0.05
+
+Reports resumes/minute, per-stage latency percentiles, peak RSS, bytes
+uploaded, request counts and calls and cost per model. ``--compare-routing``
+screens the corpus a second time with every stage on the escalation model
+(no per-stage routing) and reports the latency and cost difference.
+``--shortlist N`` instead times ranking a candidate store of N synthetic
+resumes for each role (``shortlist_stored_candidates``), with no model
+calls. ``--json`` writes the same report to a file so runs can be diffed.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+
+from metrics import cached_ratio, latency_summary, model_summary, percentile
+from mock_openai import MockOpenAIServer
+
+# (pages, scanned) for each resume in one copy of the corpus; "mixed" scans
+# every other page, so the document needs OCR for some pages only
+CORPUS_SHAPES = [(1, False), (3, False), (10, False), (1, True), (3, True), (10, True), (10, "mixed")]
+
+# Resolution scanned pages are rasterised at
+SCAN_DPI = 120
+
+RSS_SAMPLE_INTERVAL = 0.05
+
+# Times each role's shortlist is ranked; the first run also builds the role's query
+SHORTLIST_RUNS = 3
+
+FIRST_NAMES = ["Priya", "James", "Wei", "Amara", "Lukas", "Sofia", "Rahul", "Hannah", "Mateo", "Aisha"]
+LAST_NAMES = ["Sharma", "Okafor", "Chen", "Novak", "Garcia", "Schmidt", "Iyer", "Brennan", "Haddad", "Kim"]
+COMPANIES = ["Novacare Pharma", "Helix Analytics", "MedSight Consulting", "Apex Biologics", "Clarion Health",
+             "Vertex Digital", "Lumen Life Sciences", "Quantis Advisory"]
+TITLES = ["Product Manager", "Program Manager", "Business Analyst", "Implementation Lead",
+          "Salesforce Developer", "Delivery Lead", "Solutions Consultant"]
+BULLETS = [
+    "Led requirements workshops with medical affairs and translated them into PRDs and user stories",
+    "Delivered a RAG-based assistant for pharmacovigilance case intake with an evaluation rubric",
+    "Coordinated engineering, QA and compliance teams across three time zones",
+    "Built Apex triggers and Lightning Web Components for a Service Cloud rollout",
+    "Defined KPIs and adoption dashboards for a GenAI medical writing tool",
+    "Managed a backlog of 120+ stories and ran fortnightly sprint reviews",
+    "Documented validation evidence and traceability matrices for GxP audits",
+    "Configured Data Cloud ingestion and Marketing Cloud journeys for patient outreach"
+]
+
+
+def resume_page_text(rng, page_num, pages):
+    """Plausible CV text for one page."""
+    lines = []
+    if page_num == 1:
+        lines += [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", f"{rng.choice(TITLES)}",
+                  "candidate@example.com | +44 20 7946 0000", "", "SUMMARY",
+                  "Delivery-focused professional with experience shipping AI-enabled workflows in regulated domains.", ""]
+    lines.append("EXPERIENCE" if page_num < pages or pages == 1 else "EDUCATION & CERTIFICATIONS")
+    for _ in range(3):
+        start = rng.randint(2012, 2022)
+        lines += ["", f"{rng.choice(TITLES)} - {rng.choice(COMPANIES)} ({start} - {start + rng.randint(1, 3)})"]
+        lines += [f"- {rng.choice(BULLETS)}" for _ in range(rng.randint(3, 6))]
+    return "\n".join(lines)
+
+
+def make_resume_pdf(pages, scanned, seed):
+    """Synthetic resume PDF; scanned pages are page images with no text layer.
+
+    ``scanned`` is True (every page), False (none) or "mixed" (even pages).
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_num in range(1, pages + 1):
+        page = doc.new_page(width=595, height=842)  # A4 in points
+        page.insert_textbox(fitz.Rect(50, 50, 545, 792), resume_page_text(rng, page_num, pages), fontsize=10)
+
+    if scanned:
+        scan = fitz.open()
+        for page in doc:
+            if scanned == "mixed" and page.number % 2 == 0:
+                scan.insert_pdf(doc, from_page=page.number, to_page=page.number)
+                continue
+            pix = page.get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY)
+            scan.new_page(width=page.rect.width, height=page.rect.height).insert_image(page.rect, pixmap=pix)
+        doc.close()
+        doc = scan
+
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def build_corpus(copies, seed=0):
+    """``copies`` sets of CORPUS_SHAPES as ``(name, pdf_bytes)`` tuples."""
+    corpus = []
+    for copy in range(copies):
+        for pages, scanned in CORPUS_SHAPES:
+            kind = "mixed" if scanned == "mixed" else "scanned" if scanned else "digital"
+            name = f"{kind}-{pages}p-{copy}.pdf"
+            corpus.append((name, make_resume_pdf(pages, scanned, seed * 1000 + len(corpus))))
+    return corpus
+
+
+def current_rss_bytes():
+    """Resident set size of this process, from /proc where available."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is the lifetime peak in KiB on Linux - the best we can do elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    """Background thread recording the peak RSS seen while it runs."""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.baseline = current_rss_bytes()
+        self.peak = self.baseline
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+@contextmanager
+def single_model():
+    """Run every stage on the escalation model while in the block, as before per-stage routing."""
+    from screener import STAGE_MODELS
+
+    saved = dict(STAGE_MODELS)
+    STAGE_MODELS.update(dict.fromkeys(STAGE_MODELS, STAGE_MODELS["escalation"]))
+    try:
+        yield
+    finally:
+        STAGE_MODELS.update(saved)
+
+
+def run_benchmark(corpus, workers, fused, server, trace_memory=False):
+    """Screen ``corpus`` against ``server`` and return the report dict.
+
+    With ``trace_memory`` the peak of Python-level allocations (encoded
+    pages, base64 strings, request bodies) is measured with tracemalloc too;
+    it slows the run down, so throughput numbers aren't comparable.
+    """
+    from screener import ROLES, run_batch
+
+    role = next(iter(ROLES))
+    if trace_memory:
+        tracemalloc.start()
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        outcomes = run_batch(corpus, "mock-key", role, workers, cache=None, fused=fused)
+        elapsed = time.perf_counter() - start
+    python_peak = None
+    if trace_memory:
+        python_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    records = [outcome["metrics"] for outcome in outcomes if outcome.get("metrics")]
+    per_resume = [record["totals"]["seconds"] for record in records]
+    return {
+        "resumes": len(corpus),
+        "failed": sum(1 for outcome in outcomes if outcome.get("error")),
+        "degraded": sum(1 for outcome in outcomes if outcome.get("quality_warning")),
+        "seconds": elapsed,
+        "resumes_per_minute": len(corpus) / elapsed * 60 if elapsed else 0,
+        "stage_latency": latency_summary(records),
+        "p99_resume_seconds": percentile(per_resume, 99),
+        "peak_rss_mb": rss.peak / 1024 / 1024,
+        "rss_growth_mb": (rss.peak - rss.baseline) / 1024 / 1024,
+        "python_peak_mb": python_peak / 1024 / 1024 if python_peak is not None else None,
+        "image_bytes_uploaded": sum(record["totals"]["image_bytes"] for record in records),
+        "request_bytes_received": server.stats["bytes_received"],
+        "model_calls": sum(record["totals"]["calls"] for record in records),
+        "retries": sum(record["totals"]["retries"] for record in records),
+        "prompt_tokens": sum(record["totals"]["prompt_tokens"] for record in records),
+        "cached_tokens": sum(record["totals"]["cached_tokens"] for record in records),
+        "completion_tokens": sum(record["totals"]["completion_tokens"] for record in records),
+        "estimated_cost_usd": sum(record["totals"]["cost_usd"] for record in records),
+        "models": model_summary(records),
+        "escalated": sum(1 for outcome in outcomes if len(outcome.get("analysis_models") or []) > 1),
+        "analysis_cached_ratio": cached_ratio(
+            sum(call["prompt_tokens"] for record in records for call in record["calls"] if call["stage"] == "analysis"),
+            sum(call["cached_tokens"] for record in records for call in record["calls"] if call["stage"] == "analysis")
+        ),
+        "server": dict(server.stats)
+    }
+
+
+def run_shortlist_benchmark(size, seed=0):
+    """Seconds to shortlist a store of ``size`` synthetic resumes for each role, per run."""
+    from candidates import CandidateStore
+    from screener import ROLES, _role_queries, shortlist_stored_candidates
+
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CandidateStore(os.path.join(tmp, "candidates.sqlite3"))
+        started = time.perf_counter()
+        for i in range(size):
+            pages = rng.choice(CORPUS_SHAPES)[0]
+            text = "\n\n".join(resume_page_text(rng, page_num, pages) for page_num in range(1, pages + 1))
+            store.add_outcome(f"resume-{i}.pdf", {"resume_text": f"{text}\n#{i}", "verdict": "Reject"},
+                              next(iter(ROLES)))
+        build_seconds = time.perf_counter() - started
+
+        roles = {}
+        for role in ROLES:
+            _role_queries.pop(role, None)
+            runs = []
+            for _ in range(SHORTLIST_RUNS):
+                started = time.perf_counter()
+                shortlist_stored_candidates(store, role, unscreened_only=False)
+                runs.append(time.perf_counter() - started)
+            roles[role] = runs
+    return {"resumes": size, "build_seconds": build_seconds, "roles": roles}
+
+
+def print_shortlist_report(report, out=sys.stdout):
+    print(f"Shortlisted from {report['resumes']} stored resume(s) (store built in {report['build_seconds']:.1f}s)",
+          file=out)
+    print(f"{'role':<28}{'first s':>9}{'best s':>9}", file=out)
+    for role, runs in report["roles"].items():
+        print(f"{role:<28}{runs[0]:>9.3f}{min(runs):>9.3f}", file=out)
+
+
+def print_report(report, out=sys.stdout):
+    print(f"Screened {report['resumes']} resume(s) in {report['seconds']:.1f}s "
+          f"({report['resumes_per_minute']:.1f}/min), {report['failed']} failed, "
+          f"{report['degraded']} with a fallback quality review", file=out)
+    if report["server"]["rejected"]:
+        print(f"{report['server']['rejected']} request(s) rejected by the endpoint for unsupported parameters",
+              file=out)
+    print(f"Peak RSS {report['peak_rss_mb']:.0f} MB (+{report['rss_growth_mb']:.0f} MB during the run)"
+          + (f", Python allocations peaked at {report['python_peak_mb']:.0f} MB"
+             if report["python_peak_mb"] is not None else ""), file=out)
+    print(f"Uploaded {report['image_bytes_uploaded'] / 1024 / 1024:.1f} MB of page images "
+          f"({report['request_bytes_received'] / 1024 / 1024:.1f} MB of request bodies) "
+          f"in {report['model_calls']} call(s), {report['retries']} retried", file=out)
+    print(f"Tokens: {report['prompt_tokens']} prompt ({report['cached_tokens']} cached, "
+          f"{report['analysis_cached_ratio']:.0%} of analysis prompts), "
+          f"{report['completion_tokens']} completion - est. ${report['estimated_cost_usd']:.2f} at list price",
+          file=out)
+    print(f"{report['escalated']} borderline analysis(es) escalated; per model: " + ", ".join(
+        f"{model} {summary['calls']} call(s) ${summary['cost_usd']:.2f}" for model, summary in report["models"].items()
+    ), file=out)
+    print(f"{'stage':<16}{'count':>7}{'p50 s':>9}{'p95 s':>9}", file=out)
+    for stage, summary in report["stage_latency"].items():
+        print(f"{stage:<16}{summary['count']:>7}{summary['p50']:>9.2f}{summary['p95']:>9.2f}", file=out)
+
+
+def print_comparison(routed, single, out=sys.stdout):
+    """Latency and cost of per-stage routing against a single-model run."""
+    def change(new, old):
+        return f"{(new - old) / old:+.0%}" if old else "n/a"
+
+    print("Routed vs single model:", file=out)
+    print(f"  throughput {routed['resumes_per_minute']:.1f} vs {single['resumes_per_minute']:.1f}/min "
+          f"({change(routed['resumes_per_minute'], single['resumes_per_minute'])})", file=out)
+    print(f"  cost ${routed['estimated_cost_usd']:.2f} vs ${single['estimated_cost_usd']:.2f} "
+          f"({change(routed['estimated_cost_usd'], single['estimated_cost_usd'])})", file=out)
+    for stage, summary in routed["stage_latency"].items():
+        baseline = single["stage_latency"].get(stage)
+        if baseline:
+            print(f"  {stage} p50 {summary['p50']:.2f}s vs {baseline['p50']:.2f}s "
+                  f"({change(summary['p50'], baseline['p50'])}), p95 {summary['p95']:.2f}s vs "
+                  f"{baseline['p95']:.2f}s ({change(summary['p95'], baseline['p95'])})", file=out)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the screening pipeline against a local mock endpoint.")
+    parser.add_argument("--copies", type=int, default=2,
+                        help=f"Copies of the {len(CORPUS_SHAPES)}-resume corpus to screen (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=4, help="Resumes screened concurrently (default: %(default)s)")
+    parser.add_argument("--fused", action="store_true", help="Use the fused review + transcription call")
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Mock extra random latency (seconds)")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0005, help="Mock generation time per token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a mock 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probability of a mock 429")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the corpus and injected failures")
+    parser.add_argument("--compare-routing", action="store_true",
+                        help="Also screen the corpus with every stage on the escalation model and compare")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also measure peak Python allocations with tracemalloc (slower)")
+    parser.add_argument("--shortlist", type=int, metavar="N",
+                        help="Instead time shortlisting a store of N synthetic resumes for each role")
+    parser.add_argument("--json", help="Also write the report as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.shortlist:
+        report = run_shortlist_benchmark(args.shortlist, args.seed)
+        report["config"] = vars(args)
+        print_shortlist_report(report)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return 0
+
+    corpus = build_corpus(args.copies, args.seed)
+
+    with MockOpenAIServer(latency=args.latency, jitter=args.jitter, seconds_per_token=args.seconds_per_token,
+                          error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed) as server:
+        # Read by the OpenAI SDK when the pooled client is created
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        report = run_benchmark(corpus, args.workers, args.fused, server, args.trace_memory)
+        if args.compare_routing:
+            server.reset()
+            with single_model():
+                report["single_model"] = run_benchmark(corpus, args.workers, args.fused, server, args.trace_memory)
+    report["config"] = vars(args)
+
+    print_report(report)
+    if args.compare_routing:
+        print("\nSingle model:")
+        print_report(report["single_model"])
+        print()
+        print_comparison(report, report["single_model"])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    # Rejected requests mean the pipeline sends parameters a real model refuses
+    runs = [report] + ([report["single_model"]] if args.compare_routing else [])
+    return 1 if any(run["failed"] or run["degraded"] or run["server"]["rejected"] for run in runs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
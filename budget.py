@@ -0,0 +1,212 @@
+"""Token budgets and output caps for each model call in the pipeline.
+
+Before a call is sent, its input is estimated (prompt text plus each page
+image, costed with the provider's tile-based accounting) and checked
+against the stage's budget in STAGE_BUDGETS. Each stage also gets an output
+cap sized to what it is expected to produce, so a runaway response can't
+hold a worker for minutes. Reasoning models spend part of that cap
+thinking, so a vision response cut off at its cap is retried once with a
+larger one (see LENGTH_RETRY_FACTOR); cut off again, it counts as failed
+rather than passing on a transcript missing its last pages. When the input is over budget the stage's
+policy decides what happens:
+
+- ``truncate`` drops trailing pages (or the tail of the resume text),
+- ``downscale`` sends the page images at low detail, then truncates if
+  that still isn't enough,
+- ``split`` sends the pages over several calls, each within budget (only
+  for stages whose responses can simply be joined, i.e. transcription).
+
+Every call's budget record is kept with its metrics, so the budget usage of
+each screening is logged alongside its result.
+"""
+import math
+
+from ratelimit import CHARS_PER_TOKEN, TOKENS_PER_IMAGE
+
+# Vision input accounting: images are scaled to fit IMAGE_MAX_SIDE, then so
+# the short side is at most IMAGE_SHORT_SIDE, and billed per IMAGE_TILE_SIZE
+# tile on top of a base cost. Low detail is the base cost alone.
+IMAGE_BASE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+IMAGE_TILE_SIZE = 512
+IMAGE_MAX_SIDE = 2048
+IMAGE_SHORT_SIDE = 768
+
+# Output tokens left for the model's reasoning on top of the visible answer
+REASONING_HEADROOM_TOKENS = 2000
+
+# A response cut off at its output cap is retried once with the cap this many
+# times larger (up to the stage's ``output_tokens_limit``)
+LENGTH_RETRY_FACTOR = 2
+
+# Per-stage budgets. ``max_input_tokens`` bounds one call's input;
+# ``max_output_tokens`` caps its completion, growing by
+# ``output_tokens_per_page`` for stages that transcribe pages (up to
+# ``output_tokens_limit``). A ~150 DPI A4 page costs about 1,100 input tokens.
+# ``reasoning_effort`` is sent for stages that transcribe or tick boxes
+# rather than judge, so less of the cap goes on reasoning (to reasoning
+# models only - see ``screener.generation_params``).
+STAGE_BUDGETS = {
+    "quality_review": {
+        "max_input_tokens": 16000, "max_output_tokens": 4000, "over_budget": "downscale", "reasoning_effort": "low"
+    },
+    "extraction": {
+        "max_input_tokens": 12000, "max_output_tokens": REASONING_HEADROOM_TOKENS, "output_tokens_per_page": 1500,
+        "output_tokens_limit": 32000, "over_budget": "split", "reasoning_effort": "low"
+    },
+    # Over budget, the fused call is skipped for the separate review + extraction calls
+    "fused": {
+        "max_input_tokens": 12000, "max_output_tokens": 4000, "output_tokens_per_page": 1500,
+        "output_tokens_limit": 32000, "over_budget": "split", "reasoning_effort": "low"
+    },
+    "analysis": {
+        "max_input_tokens": 12000, "max_output_tokens": 6000, "over_budget": "truncate"
+    }
+}
+
+# Appended where over-budget text was cut, so the model knows the rest is missing
+TRUNCATION_NOTE = "\n\n[Truncated here to fit the token budget]"
+
+# Used for calls made outside the named stages (e.g. accuracy measurements)
+DEFAULT_BUDGET = {"max_input_tokens": 32000, "max_output_tokens": 32000, "over_budget": "truncate"}
+
+
+def stage_budget(stage):
+    return STAGE_BUDGETS.get(stage, DEFAULT_BUDGET)
+
+
+def estimate_text_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+
+def estimate_image_tokens(image, detail=None):
+    """Input tokens for one page image dict (from ``screener.encode_page``)."""
+    detail = detail or image.get('detail')
+    if detail == "low":
+        return IMAGE_BASE_TOKENS
+    width, height = image.get('width'), image.get('height')
+    if not width or not height:
+        return TOKENS_PER_IMAGE
+    scale = min(1.0, IMAGE_MAX_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, IMAGE_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / IMAGE_TILE_SIZE) * math.ceil(height / IMAGE_TILE_SIZE)
+    return IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * tiles
+
+
+def output_cap(stage, pages=0):
+    """Completion token cap for a ``stage`` call covering ``pages`` transcribed pages."""
+    budget = stage_budget(stage)
+    cap = budget["max_output_tokens"] + budget.get("output_tokens_per_page", 0) * pages
+    return min(cap, budget.get("output_tokens_limit", cap))
+
+
+def retry_output_cap(stage, cap):
+    """Larger cap to retry a ``stage`` response cut off at ``cap`` with, or None if it can't grow."""
+    retry_cap = cap * LENGTH_RETRY_FACTOR
+    retry_cap = min(retry_cap, stage_budget(stage).get("output_tokens_limit", retry_cap))
+    return retry_cap if retry_cap > cap else None
+
+
+def new_budget_record(stage, policy, estimated, max_input):
+    return {
+        "stage": stage,
+        "policy": policy,
+        "action": None,
+        "requested_input_tokens": estimated,
+        "estimated_input_tokens": estimated,
+        "max_input_tokens": max_input,
+        "max_output_tokens": 0,
+        "pages": 0,
+        "pages_dropped": [],
+        "calls": 1,
+        "length_retries": 0
+    }
+
+
+def plan_image_call(stage, prompt, images_data, policy=None, transcribed_pages=None):
+    """Fit a vision call for ``stage`` into its budget.
+
+    Returns ``(batches, budget)``: the lists of images to send, one call
+    each (more than one only under ``split``), and the budget record.
+    ``policy`` overrides the stage's over-budget policy. ``transcribed_pages``
+    is how many pages the response has to transcribe (default: none), which
+    sizes the output cap.
+    """
+    budget = stage_budget(stage)
+    policy = policy or budget["over_budget"]
+    max_input = budget["max_input_tokens"]
+    prompt_tokens = estimate_text_tokens(prompt)
+    image_tokens = [estimate_image_tokens(img) for img in images_data]
+    record = new_budget_record(stage, policy, prompt_tokens + sum(image_tokens), max_input)
+    record["pages"] = len(images_data)
+    batches = [list(images_data)]
+
+    if record["estimated_input_tokens"] > max_input and images_data:
+        record["action"] = policy
+        if policy == "split":
+            batches, current, current_tokens = [], [], prompt_tokens
+            for img, tokens in zip(images_data, image_tokens):
+                if current and current_tokens + tokens > max_input:
+                    batches.append(current)
+                    current, current_tokens = [], prompt_tokens
+                current.append(img)
+                current_tokens += tokens
+            batches.append(current)
+        else:
+            if policy == "downscale":
+                images_data = [dict(img, detail="low") for img in images_data]
+                image_tokens = [estimate_image_tokens(img) for img in images_data]
+            kept, total = [], prompt_tokens
+            for img, tokens in zip(images_data, image_tokens):
+                if kept and total + tokens > max_input:
+                    break
+                kept.append(img)
+                total += tokens
+            record["pages_dropped"] = [img['page_num'] for img in images_data[len(kept):]]
+            if policy == "downscale" and record["pages_dropped"]:
+                record["action"] = "downscale+truncate"
+            batches = [kept]
+        record["estimated_input_tokens"] = max(
+            prompt_tokens + sum(estimate_image_tokens(img) for img in batch) for batch in batches
+        )
+        record["calls"] = len(batches)
+
+    pages = transcribed_pages or 0
+    record["max_output_tokens"] = max(output_cap(stage, min(pages, len(batch))) for batch in batches)
+    return batches, record
+
+
+def fit_text(stage, text, fixed_tokens=0):
+    """Truncate ``text`` so it plus ``fixed_tokens`` of prompt fits ``stage``'s budget.
+
+    Returns ``(text, budget)``. Only the ``truncate`` policy applies to text;
+    the head of the text is kept and TRUNCATION_NOTE marks the cut.
+    """
+    budget = stage_budget(stage)
+    max_input = budget["max_input_tokens"]
+    record = new_budget_record(stage, "truncate", fixed_tokens + estimate_text_tokens(text), max_input)
+    record["max_output_tokens"] = output_cap(stage)
+    if record["estimated_input_tokens"] > max_input:
+        keep_chars = max(max_input - fixed_tokens - estimate_text_tokens(TRUNCATION_NOTE), 0) * CHARS_PER_TOKEN
+        record["action"] = "truncate"
+        record["chars_dropped"] = len(text) - keep_chars
+        text = text[:keep_chars] + TRUNCATION_NOTE
+        record["estimated_input_tokens"] = fixed_tokens + estimate_text_tokens(text)
+    return text, record
+
+
+def settle_budget(record, prompt_tokens, completion_tokens, finish_reason=None):
+    """Add a call's actual usage to its budget record (in place) and return it.
+
+    ``hit_output_cap`` is set while a response cut off at its cap hasn't
+    been made up for by a retry (counted in ``length_retries``).
+    """
+    record["prompt_tokens"] = record.get("prompt_tokens", 0) + prompt_tokens
+    record["completion_tokens"] = record.get("completion_tokens", 0) + completion_tokens
+    calls = record["calls"] + record["length_retries"]
+    record["input_used"] = record["prompt_tokens"] / record["max_input_tokens"] / calls
+    record["cut_off"] = record.get("cut_off", 0) + (finish_reason == "length")
+    record["hit_output_cap"] = record["cut_off"] > record["length_retries"]
+    return record
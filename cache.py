@@ -0,0 +1,196 @@
+"""Persistent, content-addressed cache for screening pipeline results.
+
+Entries live in a single SQLite file keyed by a hash of everything that
+determines a stage's output (PDF bytes, stage, role, model, prompt version),
+so a resubmitted CV or a role switch can reuse earlier model calls.
+``MemoryCache`` has the same interface for results that are cheap to keep
+in memory but not worth writing to disk (e.g. a prepared resume).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds between purges of expired entries; each also recounts the stored total size
+EXPIRY_INTERVAL = 3600
+
+
+def hash_bytes(data):
+    """SHA-256 hex digest of raw bytes (e.g. the uploaded PDF)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def prompt_version(prompt):
+    """Short fingerprint of a prompt so edits invalidate old entries."""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+
+
+def make_cache_key(*parts):
+    """Build a cache key from its parts (hashes, stage, role, model, ...)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """SQLite-backed key/value store with size- and age-based eviction.
+
+    Values must be JSON-serialisable. Safe to share between threads; hit and
+    miss counts are kept per stage for the lifetime of the process. The
+    total size of the entries is kept in a ``meta`` row, updated in the
+    same transaction as every write, so checking it doesn't scan the table.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, max_age_seconds=30 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        self._expired_at = 0.0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('total_size', 0)")
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key, stage):
+        """Return the cached value for ``key``, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.max_age_seconds:
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits[stage] = self.hits.get(stage, 0) + 1
+                return json.loads(row[0])
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+            return None
+
+    def set(self, key, stage, value):
+        """Store ``value`` under ``key`` and evict anything over budget."""
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, stage, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, payload, len(payload), now, now)
+            )
+            self._conn.execute(
+                "UPDATE meta SET value = value + ? WHERE key = 'total_size'",
+                (len(payload) - (replaced[0] if replaced else 0),)
+            )
+            self._conn.commit()
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until under max_bytes.
+
+        Expired entries are dropped too, at most every EXPIRY_INTERVAL
+        seconds; that pass also recounts the stored total size, so it can't
+        drift (e.g. after a crash mid-write).
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._expired_at >= EXPIRY_INTERVAL:
+                self._expired_at = now
+                self._conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.max_age_seconds,))
+                self._conn.execute(
+                    "UPDATE meta SET value = (SELECT COALESCE(SUM(size), 0) FROM entries) WHERE key = 'total_size'"
+                )
+            total = self._total_size()
+            if total > self.max_bytes:
+                stale = []
+                rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at")
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                rows.close()
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+                self._conn.execute("UPDATE meta SET value = ? WHERE key = 'total_size'", (total,))
+            self._conn.commit()
+
+    def _total_size(self):
+        return self._conn.execute("SELECT value FROM meta WHERE key = 'total_size'").fetchone()[0]
+
+    def stats(self):
+        """Hit/miss counts plus current entry count and size on disk."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._total_size()
+        return {
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "hits_by_stage": dict(self.hits),
+            "misses_by_stage": dict(self.misses),
+            "entries": entries,
+            "bytes": size
+        }
+
+
+class MemoryCache:
+    """In-process LRU cache holding at most ``max_entries`` values.
+
+    Same ``get``/``set``/``stats`` interface as ``ResultCache``; values are
+    kept as given (not serialised) and live as long as the process. Safe to
+    share between threads.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.hits = {}
+        self.misses = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, stage):
+        """Return the cached value for ``key``, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits[stage] = self.hits.get(stage, 0) + 1
+                return self._entries[key]
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+            return None
+
+    def set(self, key, stage, value):
+        """Store ``value`` under ``key``, dropping the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Hit/miss counts plus the current entry count."""
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "hits_by_stage": dict(self.hits),
+            "misses_by_stage": dict(self.misses),
+            "entries": entries
+        }
@@ -0,0 +1,281 @@
+"""Searchable store of screened candidates.
+
+Every finished screening is written to SQLite: the extracted resume text and
+quality review once per distinct resume, and the verdict and scores once per
+role (the latest screening wins). Role, verdict, final score, CV source /
+agency and screening date are indexed columns, and the resume text is
+indexed with FTS5, so a question like "PROCEED candidates for Agentforce
+Engineer mentioning MuleSoft" is a single indexed query over tens of
+thousands of candidates and never calls the model again.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Rows returned by a search unless asked for more
+DEFAULT_SEARCH_LIMIT = 100
+
+RESULT_COLUMNS = [
+    "screening_id", "resume_id", "name", "role", "verdict", "final_score", "role_fit_score",
+    "quality_verdict", "quality_score", "cv_source", "agency_name", "screened_at"
+]
+
+
+def fts_query(text):
+    """FTS5 query matching every word of ``text`` (in any order), or None if it has none.
+
+    Words are quoted so user input can't be parsed as FTS5 syntax; a word
+    ending in ``*`` is kept as a prefix match.
+    """
+    terms = re.findall(r"[\w.+#-]+\*?", text or "")
+    quoted = []
+    for term in terms:
+        prefix = term.endswith("*")
+        word = term.rstrip("*").strip(".-")
+        if word:
+            quoted.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(quoted) or None
+
+
+class CandidateStore:
+    """Persistent, full-text indexed store of screening results.
+
+    Safe to share between threads. ``add_outcome`` records a finished
+    ``screen_resume`` / ``screen_resume_all_roles`` outcome; ``search``
+    filters and ranks the stored screenings.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS resumes (
+                id INTEGER PRIMARY KEY,
+                text_hash TEXT NOT NULL UNIQUE,
+                name TEXT,
+                resume_text TEXT NOT NULL,
+                quality_data TEXT,
+                quality_verdict TEXT,
+                quality_score INTEGER,
+                cv_source TEXT,
+                agency_name TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_resumes_source ON resumes(cv_source, agency_name);
+            CREATE INDEX IF NOT EXISTS idx_resumes_agency ON resumes(agency_name COLLATE NOCASE);
+            CREATE VIRTUAL TABLE IF NOT EXISTS resumes_fts USING fts5(
+                resume_text, content='resumes', content_rowid='id', tokenize='unicode61'
+            );
+            CREATE TABLE IF NOT EXISTS screenings (
+                id INTEGER PRIMARY KEY,
+                resume_id INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                verdict TEXT,
+                final_score INTEGER,
+                role_fit_score INTEGER,
+                analysis TEXT,
+                analysis_data TEXT,
+                screened_at REAL NOT NULL,
+                UNIQUE (resume_id, role)
+            );
+            CREATE INDEX IF NOT EXISTS idx_screenings_role ON screenings(role, verdict, final_score);
+            CREATE INDEX IF NOT EXISTS idx_screenings_verdict ON screenings(verdict, final_score);
+            CREATE INDEX IF NOT EXISTS idx_screenings_score ON screenings(final_score);
+            CREATE INDEX IF NOT EXISTS idx_screenings_date ON screenings(screened_at);
+        """)
+        self._conn.commit()
+
+    def _add_resume(self, name, resume_text, quality_data, now):
+        text_hash = hashlib.sha256(resume_text.encode("utf-8")).hexdigest()
+        row = self._conn.execute("SELECT id FROM resumes WHERE text_hash = ?", (text_hash,)).fetchone()
+        if row:
+            return row[0]
+        quality_data = quality_data or {}
+        resume_id = self._conn.execute(
+            "INSERT INTO resumes (text_hash, name, resume_text, quality_data, quality_verdict, quality_score, "
+            "cv_source, agency_name, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (text_hash, name, resume_text, json.dumps(quality_data), quality_data.get("verdict"),
+             quality_data.get("total_score"), quality_data.get("cv_source"), quality_data.get("agency_name"), now)
+        ).lastrowid
+        self._conn.execute("INSERT INTO resumes_fts (rowid, resume_text) VALUES (?, ?)", (resume_id, resume_text))
+        return resume_id
+
+    def add_outcome(self, name, outcome, role=None):
+        """Store a finished outcome; returns the resume id, or None if there was nothing to store.
+
+        ``role`` is the role a ``screen_resume`` outcome was screened
+        against; an all-roles outcome carries its roles itself. Failed and
+        deferred screenings are skipped, as are roles whose analysis failed.
+        """
+        if outcome.get("error") or outcome.get("deferred") or not outcome.get("resume_text"):
+            return None
+        results = outcome["roles"] if "roles" in outcome else {role: outcome}
+        results = {role: result for role, result in results.items() if role and result.get("verdict")}
+        if not results:
+            return None
+
+        now = time.time()
+        with self._lock:
+            resume_id = self._add_resume(name, outcome["resume_text"], outcome.get("quality_data"), now)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO screenings (resume_id, role, verdict, final_score, role_fit_score, "
+                "analysis, analysis_data, screened_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (resume_id, role, result["verdict"], result.get("final_score"), result.get("role_fit_score"),
+                     result.get("analysis"), json.dumps(result.get("analysis_data")), now)
+                    for role, result in results.items()
+                ]
+            )
+            self._conn.commit()
+        return resume_id
+
+    def search(self, text=None, role=None, verdict=None, min_score=None, cv_source=None, agency=None,
+               since=None, until=None, limit=DEFAULT_SEARCH_LIMIT):
+        """Stored screenings matching every given filter, best final score first.
+
+        ``text`` is matched against the resume text (all words must occur);
+        ``agency`` matches the agency name case-insensitively; ``since`` /
+        ``until`` are epoch seconds bounding the screening date. Returns
+        dicts with RESULT_COLUMNS.
+        """
+        clauses, params = [], []
+        query = fts_query(text)
+        if query:
+            clauses.append("s.resume_id IN (SELECT rowid FROM resumes_fts WHERE resumes_fts MATCH ?)")
+            params.append(query)
+        for column, value in (("s.role", role), ("s.verdict", verdict), ("r.cv_source", cv_source)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if agency:
+            clauses.append("r.agency_name = ? COLLATE NOCASE")
+            params.append(agency)
+        if min_score is not None:
+            clauses.append("s.final_score >= ?")
+            params.append(min_score)
+        if since is not None:
+            clauses.append("s.screened_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("s.screened_at < ?")
+            params.append(until)
+
+        sql = (
+            "SELECT s.id, s.resume_id, r.name, s.role, s.verdict, s.final_score, s.role_fit_score, "
+            "r.quality_verdict, r.quality_score, r.cv_source, r.agency_name, s.screened_at "
+            "FROM screenings s JOIN resumes r ON r.id = s.resume_id"
+            + (" WHERE " + " AND ".join(clauses) if clauses else "")
+            + " ORDER BY s.final_score DESC, s.screened_at DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit]).fetchall()
+        return [dict(zip(RESULT_COLUMNS, row)) for row in rows]
+
+    def rank(self, match_query, limit, role=None, unscreened_only=False, with_text=False):
+        """Stored resumes ranked by BM25 against an FTS5 ``match_query``, best first.
+
+        Returns ``{"resume_id", "name", "score", "verdict", "final_score"}``
+        dicts, where verdict and final score are those of an earlier
+        screening for ``role`` (None if it wasn't screened for it). With
+        ``unscreened_only`` resumes already screened for ``role`` are skipped;
+        ``with_text`` adds each resume's ``resume_text``.
+        """
+        fields = ["resume_id", "name", "score", "verdict", "final_score"] + (["resume_text"] if with_text else [])
+        # Rank inside the FTS table first, so only the top ``limit`` rows are joined
+        sql = (
+            "SELECT r.id, r.name, -ranked.rank, s.verdict, s.final_score"
+            + (", r.resume_text" if with_text else "") + " FROM ("
+            "SELECT rowid, rank FROM resumes_fts WHERE resumes_fts MATCH ?"
+            + (" AND rowid NOT IN (SELECT resume_id FROM screenings WHERE role = ?)" if unscreened_only else "")
+            + " ORDER BY rank LIMIT ?) ranked "
+            "JOIN resumes r ON r.id = ranked.rowid "
+            "LEFT JOIN screenings s ON s.resume_id = r.id AND s.role = ? "
+            "ORDER BY ranked.rank"
+        )
+        params = [match_query] + ([role] if unscreened_only else []) + [limit, role]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(fields, row)) for row in rows]
+
+    def doc_counts(self, match_queries):
+        """Number of stored resumes matching each FTS5 ``match_query``, by query."""
+        with self._lock:
+            return {
+                query: self._conn.execute(
+                    "SELECT COUNT(*) FROM resumes_fts WHERE resumes_fts MATCH ?", (query,)
+                ).fetchone()[0]
+                for query in match_queries
+            }
+
+    def index_totals(self):
+        """``(resumes, tokens)`` in the FTS5 index, as its BM25 ranking counts them."""
+        with self._lock:
+            row = self._conn.execute("SELECT block FROM resumes_fts_data WHERE id = 1").fetchone()
+        if row is None:
+            return 0, 0
+        # The index's averages record: SQLite varints, the row count then the token count per column
+        totals = []
+        value = 0
+        for byte in row[0]:
+            value = (value << 7) | (byte & 0x7F)
+            if byte < 0x80:
+                totals.append(value)
+                value = 0
+                if len(totals) == 2:
+                    return tuple(totals)
+        return 0, 0
+
+    def get_resume(self, resume_id):
+        """A stored resume's ``{"name", "resume_text", "quality_data"}``, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, resume_text, quality_data FROM resumes WHERE id = ?", (resume_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"name": row[0], "resume_text": row[1], "quality_data": json.loads(row[2]) if row[2] else None}
+
+    def get_screening(self, screening_id):
+        """One stored screening with its report, resume text and quality data, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT s.role, s.verdict, s.final_score, s.analysis, s.analysis_data, s.screened_at, "
+                "r.name, r.resume_text, r.quality_data FROM screenings s JOIN resumes r ON r.id = s.resume_id "
+                "WHERE s.id = ?", (screening_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        role, verdict, final_score, analysis, analysis_data, screened_at, name, resume_text, quality_data = row
+        return {
+            "role": role,
+            "verdict": verdict,
+            "final_score": final_score,
+            "analysis": analysis,
+            "analysis_data": json.loads(analysis_data) if analysis_data else None,
+            "screened_at": screened_at,
+            "name": name,
+            "resume_text": resume_text,
+            "quality_data": json.loads(quality_data) if quality_data else None
+        }
+
+    def agencies(self):
+        """Distinct agency names, for filter choices."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT agency_name FROM resumes WHERE agency_name IS NOT NULL ORDER BY agency_name"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self):
+        with self._lock:
+            resumes = self._conn.execute("SELECT COUNT(*) FROM resumes").fetchone()[0]
+            screenings = self._conn.execute("SELECT COUNT(*) FROM screenings").fetchone()[0]
+        return {"resumes": resumes, "screenings": screenings}
@@ -0,0 +1,279 @@
+"""Headless bulk screening of a directory of PDF resumes.
+
+Example:
+
+    OPENAI_API_KEY=... python cli.py resumes/ --role "Agentforce Engineer" \
+        --output results.jsonl --csv results.csv --workers 8
+
+Results are appended to the JSONL file as each resume finishes, so an
+interrupted run can simply be started again: resumes already screened
+successfully for the same role (matched by content hash) are skipped. The
+CSV, if requested, is rebuilt from the JSONL at the end of every run.
+Per-stage metrics go to --metrics (JSONL) and --prometheus (text format),
+and a p50/p95 latency summary is printed when the run finishes.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import ResultCache, hash_bytes
+from candidates import CandidateStore
+from dedupe import DuplicateIndex
+from metrics import (
+    DEFAULT_METRICS_JSONL,
+    DEFAULT_METRICS_PROM,
+    budget_notes,
+    cached_ratio,
+    latency_summary,
+    record_screening
+)
+from screener import (
+    CACHE_MAX_AGE_DAYS,
+    CACHE_MAX_BYTES,
+    DEFAULT_BATCH_CONCURRENCY,
+    DEFAULT_CACHE_PATH,
+    DEFAULT_CANDIDATES_PATH,
+    DEFAULT_DEDUPE_PATH,
+    FUSED_REVIEW_AND_EXTRACTION,
+    ROLES,
+    TRIAGE_MODES,
+    run_batch
+)
+
+CSV_FIELDS = [
+    "file", "sha256", "role", "verdict", "final_score", "quality_verdict", "quality_score",
+    "cv_source", "agency_name", "pages", "truncated_pages", "triage_score", "deferred", "duplicate_of", "duplicate_similarity", "reused_duplicate", "over_budget",
+    "analysis_models", "escalated", "error", "screened_at"
+]
+
+
+def find_pdfs(directory, recursive):
+    """Sorted paths of the PDF files in ``directory``."""
+    if recursive:
+        paths = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(directory)
+            for name in names if name.lower().endswith(".pdf")
+        ]
+    else:
+        paths = [
+            os.path.join(directory, name)
+            for name in os.listdir(directory) if name.lower().endswith(".pdf")
+        ]
+    return sorted(paths)
+
+
+def load_results(path):
+    """Records already written to the JSONL output (empty if it doesn't exist)."""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run - it'll be redone
+                continue
+    return records
+
+
+def build_record(path, sha256, role, outcome):
+    """Flatten a ``screen_resume`` outcome into one output record."""
+    quality_data = outcome.get("quality_data") or {}
+    duplicate_of = outcome.get("duplicate_of") or {}
+    over_budget = budget_notes(outcome["metrics"]) if outcome.get("metrics") else []
+    return {
+        "file": path,
+        "sha256": sha256,
+        "role": role,
+        "verdict": outcome.get("verdict"),
+        "final_score": int(outcome["final_score"]) if outcome.get("final_score") is not None else None,
+        "quality_verdict": quality_data.get("verdict"),
+        "quality_score": quality_data.get("total_score"),
+        "cv_source": quality_data.get("cv_source"),
+        "agency_name": quality_data.get("agency_name"),
+        "pages": outcome.get("pages"),
+        "truncated_pages": outcome.get("truncated_pages", 0),
+        "triage_score": (outcome.get("triage") or {}).get("score"),
+        "deferred": outcome.get("deferred", False),
+        "duplicate_of": duplicate_of.get("name"),
+        "duplicate_similarity": duplicate_of.get("similarity"),
+        "reused_duplicate": outcome.get("reused_duplicate", False),
+        "over_budget": "; ".join(over_budget) or None,
+        "analysis_models": " > ".join(outcome.get("analysis_models") or []) or None,
+        "escalated": len(outcome.get("analysis_models") or []) > 1,
+        "error": outcome.get("error"),
+        "screened_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "models": outcome.get("models"),
+        "quality_data": outcome.get("quality_data"),
+        "analysis": outcome.get("analysis"),
+        "metrics": outcome.get("metrics")
+    }
+
+
+def write_csv(records, path):
+    """Write the latest record per (resume, role) as CSV."""
+    latest = {}
+    for record in records:
+        latest[(record["sha256"], record["role"])] = record
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(latest.values())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Screen a directory of PDF resumes against a role.")
+    parser.add_argument("directory", help="Directory containing PDF resumes")
+    parser.add_argument("--role", required=True, choices=list(ROLES), help="Role to screen against")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL results file (appended to; default: %(default)s)")
+    parser.add_argument("--csv", help="Also write a CSV summary to this path")
+    parser.add_argument("--recursive", action="store_true", help="Include PDFs in subdirectories")
+    parser.add_argument("--workers", type=int, default=DEFAULT_BATCH_CONCURRENCY,
+                        help="Resumes screened concurrently (default: %(default)s)")
+    parser.add_argument("--render-processes", type=int, default=os.cpu_count() or 1,
+                        help="Processes used for PDF rendering (default: CPU count)")
+    parser.add_argument("--fused", action="store_true", default=FUSED_REVIEW_AND_EXTRACTION,
+                        help="Combine quality review and OCR into one vision call")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Result cache path (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the result cache")
+    parser.add_argument("--triage", choices=TRIAGE_MODES,
+                        help="Keyword pre-triage: 'order' screens best matches first, 'defer' also skips resumes "
+                             "below the role's triage_min_score")
+    parser.add_argument("--dedupe-index", default=DEFAULT_DEDUPE_PATH,
+                        help="Near-duplicate index path (default: %(default)s)")
+    parser.add_argument("--no-dedupe", action="store_true", help="Don't check for or record near-duplicate candidates")
+    parser.add_argument("--reuse-duplicates", action="store_true",
+                        help="Reuse the stored result of a near-duplicate instead of analyzing it again")
+    parser.add_argument("--store", default=DEFAULT_CANDIDATES_PATH,
+                        help="Searchable store finished screenings are added to (default: %(default)s)")
+    parser.add_argument("--no-store", action="store_true", help="Don't add screenings to the searchable store")
+    parser.add_argument("--rescreen", action="store_true", help="Screen every file even if already in the output")
+    parser.add_argument("--metrics", default=DEFAULT_METRICS_JSONL,
+                        help="Append per-stage metrics to this JSONL file (default: %(default)s)")
+    parser.add_argument("--prometheus", default=DEFAULT_METRICS_PROM,
+                        help="Write Prometheus text-format metrics to this file (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        print("OPENAI_API_KEY is not set", file=sys.stderr)
+        return 2
+
+    paths = find_pdfs(args.directory, args.recursive)
+    existing = load_results(args.output)
+    done = set() if args.rescreen else {
+        record["sha256"] for record in existing
+        # Deferred resumes are triaged again, in case thresholds changed
+        if record.get("role") == args.role and not record.get("error") and not record.get("deferred")
+    }
+
+    # Hash up front so resumed runs skip finished files without rendering them
+    pending = []
+    for path in paths:
+        with open(path, "rb") as f:
+            sha256 = hash_bytes(f.read())
+        if sha256 not in done:
+            pending.append((path, sha256))
+            done.add(sha256)  # identical files in the directory are screened once
+
+    print(f"{len(paths)} PDF(s) found, {len(paths) - len(pending)} already screened, {len(pending)} to go",
+          file=sys.stderr)
+
+    cache = None if args.no_cache else ResultCache(
+        args.cache, max_bytes=CACHE_MAX_BYTES, max_age_seconds=CACHE_MAX_AGE_DAYS * 24 * 3600
+    )
+
+    dedupe = None if args.no_dedupe else DuplicateIndex(args.dedupe_index)
+    store = None if args.no_store else CandidateStore(args.store)
+
+    def reader(path):
+        def read():
+            with open(path, "rb") as f:
+                return f.read()
+        return read
+
+    files = [(path, reader(path)) for path, _ in pending]
+    written = set()
+    failed = []
+    metrics_records = []
+    start = time.perf_counter()
+
+    with open(args.output, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=args.render_processes) as render_pool:
+
+        def write_finished(stages, outcomes):
+            for index in sorted(set(outcomes) - written):
+                path, sha256 = pending[index]
+                record = build_record(path, sha256, args.role, outcomes[index])
+                if store is not None:
+                    store.add_outcome(path, outcomes[index], args.role)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                written.add(index)
+                if record["metrics"]:
+                    metrics_records.append(record["metrics"])
+                    record_screening(record["metrics"], args.metrics, args.prometheus)
+                if record["error"]:
+                    failed.append(path)
+                if record["deferred"]:
+                    status = f"deferred by keyword triage (score {record['triage_score']})"
+                else:
+                    status = record["error"] or f"{record['verdict']} ({record['final_score']}/4)"
+                if record["duplicate_of"]:
+                    status += f" - {record['duplicate_similarity']:.0%} match to {record['duplicate_of']}"
+                if record["escalated"]:
+                    status += f" [escalated: {record['analysis_models']}]"
+                if record["over_budget"]:
+                    status += f" [over budget: {record['over_budget']}]"
+                if record["truncated_pages"]:
+                    status += f" [{record['truncated_pages']} page(s) beyond the render limit not read]"
+                print(f"[{len(written)}/{len(pending)}] {path}: {status}", file=sys.stderr)
+
+        if pending:
+            run_batch(
+                files, api_key, args.role, args.workers, on_update=write_finished,
+                cache=cache, fused=args.fused, render_pool=render_pool,
+                dedupe=dedupe, reuse_duplicates=args.reuse_duplicates, triage=args.triage
+            )
+
+    elapsed = time.perf_counter() - start
+    if pending:
+        print(f"Screened {len(pending)} resume(s) in {elapsed:.1f}s "
+              f"({len(pending) / elapsed * 60:.1f}/min)", file=sys.stderr)
+        for stage, summary in latency_summary(metrics_records).items():
+            print(f"  {stage}: p50 {summary['p50']:.2f}s, p95 {summary['p95']:.2f}s over {summary['count']}",
+                  file=sys.stderr)
+        cost = sum(record["totals"]["cost_usd"] for record in metrics_records)
+        prompt_tokens = sum(record["totals"]["prompt_tokens"] for record in metrics_records)
+        cached_tokens = sum(record["totals"]["cached_tokens"] for record in metrics_records)
+        print(f"Estimated cost: ${cost:.2f} ({cached_ratio(prompt_tokens, cached_tokens):.0%} of prompt tokens cached)",
+              file=sys.stderr)
+
+    if cache:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} hit(s), {stats['misses']} miss(es)", file=sys.stderr)
+
+    if args.csv:
+        write_csv(load_results(args.output), args.csv)
+
+    if failed:
+        print(f"{len(failed)} resume(s) failed - rerun to retry them", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
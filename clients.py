@@ -0,0 +1,68 @@
+"""Long-lived, pooled OpenAI clients shared across reruns and sessions.
+
+Streamlit re-executes app.py on every interaction, but imported modules stay
+in ``sys.modules``, so clients kept here survive reruns and are shared by
+every session in the process. Each client keeps a keep-alive connection pool,
+so stages after the first skip TCP/TLS setup. The SDK's own retries are
+disabled - retrying is handled centrally by ``ratelimit.execute_request``.
+The SDK itself is only imported when the first client is created, so
+importing this module (and the pipeline) stays cheap.
+
+Pool limits and timeouts can be tuned with environment variables:
+OPENAI_POOL_MAX_CONNECTIONS, OPENAI_POOL_MAX_KEEPALIVE,
+OPENAI_POOL_KEEPALIVE_EXPIRY, OPENAI_CONNECT_TIMEOUT and OPENAI_READ_TIMEOUT.
+"""
+import atexit
+import os
+import threading
+
+MAX_CONNECTIONS = int(os.environ.get("OPENAI_POOL_MAX_CONNECTIONS", "64"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_POOL_MAX_KEEPALIVE", "32"))
+KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_POOL_KEEPALIVE_EXPIRY", "120"))
+CONNECT_TIMEOUT = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.environ.get("OPENAI_READ_TIMEOUT", "600"))
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def _limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+
+def _timeout():
+    import httpx
+
+    return httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def get_client(api_key):
+    """Return the shared client for ``api_key``, creating it once."""
+    from openai import DefaultHttpxClient, OpenAI
+
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                timeout=_timeout(),
+                max_retries=0,
+                http_client=DefaultHttpxClient(limits=_limits(), timeout=_timeout())
+            )
+            _clients[api_key] = client
+        return client
+
+
+@atexit.register
+def close_clients():
+    """Close pooled connections of every client."""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,203 @@
+"""Near-duplicate detection over extracted resume text.
+
+The same candidate often arrives from several agencies as PDFs that differ
+in branding and contact details, so byte hashes never match. Each screened
+resume's text is reduced to a MinHash signature over word shingles and
+indexed with locality-sensitive hashing (banded signatures), persisted in
+SQLite next to the result cache. Looking up a new resume only touches the
+few stored candidates that share a band, so it stays fast with tens of
+thousands of entries.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+
+# Words per shingle
+SHINGLE_SIZE = 5
+
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard almost always share a band
+NUM_PERMUTATIONS = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+# Estimated Jaccard similarity from which two resumes count as the same candidate
+DUPLICATE_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutations(count, seed=1):
+    """Fixed ``(a, b)`` pairs for the universal hashes - must never change once an index exists."""
+    params = []
+    counter = 0
+    while len(params) < count:
+        digest = hashlib.sha256(f"minhash:{seed}:{counter}".encode()).digest()
+        a, b = struct.unpack("<QQ", digest[:16])
+        params.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+        counter += 1
+    return params
+
+
+PERMUTATIONS = _permutations(NUM_PERMUTATIONS)
+
+EMAIL_PATTERN = re.compile(r"\S+@\S+")
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+
+
+def normalize_text(text):
+    """Lowercased words with contact details and punctuation stripped.
+
+    Agencies remove or replace emails and phone numbers, so those never count
+    towards similarity.
+    """
+    text = PHONE_PATTERN.sub(" ", EMAIL_PATTERN.sub(" ", text.lower()))
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Set of 32-bit hashes of the overlapping ``size``-word shingles of ``text``."""
+    words = normalize_text(text)
+    if len(words) < size:
+        words = words + [""] * (size - len(words))
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + size]).encode(), digest_size=4).digest(), "little")
+        for i in range(len(words) - size + 1)
+    }
+
+
+def minhash(text):
+    """MinHash signature (NUM_PERMUTATIONS ints) of the shingles of ``text``."""
+    hashes = shingles(text)
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in PERMUTATIONS
+    ]
+
+
+def estimate_similarity(signature, other):
+    """Estimated Jaccard similarity of two signatures (share of equal slots)."""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+
+def band_keys(signature):
+    """One LSH bucket key per band."""
+    return [
+        hashlib.blake2b(struct.pack(f"<{ROWS_PER_BAND}I", *signature[i:i + ROWS_PER_BAND]), digest_size=8).hexdigest()
+        for i in range(0, NUM_PERMUTATIONS, ROWS_PER_BAND)
+    ]
+
+
+class DuplicateIndex:
+    """Persistent MinHash/LSH index of screened resumes and their results.
+
+    Safe to share between threads. ``find`` returns the closest stored
+    candidate at or above ``threshold``; ``add`` stores a resume together
+    with its per-role screening result so a duplicate can reuse it.
+    """
+
+    def __init__(self, path, threshold=DUPLICATE_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS candidates (
+                id INTEGER PRIMARY KEY,
+                text_hash TEXT NOT NULL UNIQUE,
+                name TEXT,
+                signature BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                bucket TEXT NOT NULL,
+                candidate_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_bands_bucket ON bands(band, bucket);
+            CREATE TABLE IF NOT EXISTS results (
+                candidate_id INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                result TEXT NOT NULL,
+                screened_at REAL NOT NULL,
+                PRIMARY KEY (candidate_id, role)
+            );
+        """)
+        self._conn.commit()
+
+    def find(self, resume_text, role=None, signature=None):
+        """The most similar stored resume, or None if none reaches the threshold.
+
+        Returns ``{"candidate_id", "name", "similarity", "identical",
+        "screened_at", "result"}`` where ``result`` is the stored result for
+        ``role`` (None if that role wasn't screened).
+        """
+        signature = signature or minhash(resume_text)
+        text_hash = hashlib.sha256(resume_text.encode("utf-8")).hexdigest()
+        keys = band_keys(signature)
+        with self._lock:
+            candidate_ids = set()
+            for band, bucket in enumerate(keys):
+                candidate_ids.update(row[0] for row in self._conn.execute(
+                    "SELECT candidate_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket)
+                ))
+            best = None
+            for candidate_id in candidate_ids:
+                name, stored, stored_hash, created_at = self._conn.execute(
+                    "SELECT name, signature, text_hash, created_at FROM candidates WHERE id = ?", (candidate_id,)
+                ).fetchone()
+                similarity = estimate_similarity(signature, struct.unpack(f"<{NUM_PERMUTATIONS}I", stored))
+                if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                    best = {"candidate_id": candidate_id, "name": name, "similarity": similarity,
+                            "identical": stored_hash == text_hash, "screened_at": created_at, "result": None}
+            if best and role:
+                row = self._conn.execute(
+                    "SELECT result, screened_at FROM results WHERE candidate_id = ? AND role = ?",
+                    (best["candidate_id"], role)
+                ).fetchone()
+                if row:
+                    best["result"] = json.loads(row[0])
+                    best["screened_at"] = row[1]
+        return best
+
+    def add(self, resume_text, name=None, role=None, result=None, signature=None):
+        """Index ``resume_text`` (once per exact text) and store its ``result`` for ``role``.
+
+        Returns the candidate id.
+        """
+        signature = signature or minhash(resume_text)
+        text_hash = hashlib.sha256(resume_text.encode("utf-8")).hexdigest()
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM candidates WHERE text_hash = ?", (text_hash,)).fetchone()
+            if row:
+                candidate_id = row[0]
+            else:
+                candidate_id = self._conn.execute(
+                    "INSERT INTO candidates (text_hash, name, signature, created_at) VALUES (?, ?, ?, ?)",
+                    (text_hash, name, struct.pack(f"<{NUM_PERMUTATIONS}I", *signature), now)
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO bands (band, bucket, candidate_id) VALUES (?, ?, ?)",
+                    [(band, bucket, candidate_id) for band, bucket in enumerate(band_keys(signature))]
+                )
+            if role and result is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (candidate_id, role, result, screened_at) VALUES (?, ?, ?, ?)",
+                    (candidate_id, role, json.dumps(result), now)
+                )
+            self._conn.commit()
+        return candidate_id
+
+    def stats(self):
+        with self._lock:
+            candidates = self._conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+        return {"candidates": candidates}
@@ -0,0 +1,517 @@
+"""Durable background job queue for screenings.
+
+Streamlit reruns the whole script on every widget change, so work done
+inline under a button is lost (along with its API spend) as soon as the
+recruiter touches anything or their browser drops. Screenings are instead
+submitted to a SQLite-backed queue next to the result cache and worked by
+background threads that outlive any one script run. The UI only submits
+jobs and polls their status.
+
+A job moves through queued -> running -> done / failed. Each completed
+pipeline stage is checkpointed, so a job interrupted by a restart is picked
+up again from its last checkpoint rather than from scratch. Access keys
+are never written to the queue: the runner keeps each job's submitter's key
+in memory until the job finishes. Old PDFs and results are purged after the
+retention limits below.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# A job that keeps taking its worker process down is failed after this many starts
+MAX_JOB_ATTEMPTS = 3
+
+# Workers that only take single-resume and all-roles jobs, so an interactive
+# screening never waits behind other users' batches
+RESERVED_INTERACTIVE_WORKERS = 1
+
+# Seconds an idle worker waits before checking the queue again
+JOB_POLL_INTERVAL = 1.0
+
+# A runner renews the lease on its running jobs every JOB_HEARTBEAT_INTERVAL
+# seconds; a running job whose lease is older than JOB_LEASE_SECONDS belongs
+# to a dead (or hung) process and is requeued. Process ids are not used for
+# this - they get reused, and mean nothing to another host sharing the file.
+JOB_HEARTBEAT_INTERVAL = 10
+JOB_LEASE_SECONDS = 60
+
+# Retention: a failed job's PDF and checkpoints (needed to retry it) are dropped
+# after JOB_PDF_MAX_AGE_DAYS, and finished jobs with their results after
+# JOB_MAX_AGE_DAYS. The runner purges every JOB_PURGE_INTERVAL seconds.
+JOB_PDF_MAX_AGE_DAYS = 7
+JOB_MAX_AGE_DAYS = 30
+JOB_PURGE_INTERVAL = 3600
+
+# Minimum seconds between writes of a job's partial (streaming) report
+PARTIAL_WRITE_INTERVAL = 0.5
+
+# Columns returned by ``get`` and ``list_jobs`` (the PDF is only loaded by ``claim``)
+JOB_COLUMNS = ("id", "batch_id", "position", "kind", "name", "role", "status", "stage", "options", "result",
+               "partial", "error", "attempts", "owner", "max_running", "created_at", "started_at", "finished_at",
+               "updated_at")
+
+
+class JobQueue:
+    """SQLite-backed queue of screening jobs and their stage checkpoints.
+
+    Safe to share between threads; several processes may use the same file.
+    Jobs carry the PDF bytes, a ``kind`` ("single" or "all_roles"), the
+    role, JSON ``options`` and, once finished, the JSON ``result``. A batch's
+    jobs carry its ``max_running`` cap. ``purge`` applies the retention
+    limits ``pdf_max_age_days`` and ``job_max_age_days``. Each instance
+    claims jobs under its own ``owner`` token and holds them on a lease of
+    ``lease_seconds``, renewed by ``heartbeat``.
+    """
+
+    def __init__(self, path, pdf_max_age_days=JOB_PDF_MAX_AGE_DAYS, job_max_age_days=JOB_MAX_AGE_DAYS,
+                 lease_seconds=JOB_LEASE_SECONDS):
+        self.path = path
+        self.pdf_max_age_days = pdf_max_age_days
+        self.job_max_age_days = job_max_age_days
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                batch_id TEXT,
+                position INTEGER NOT NULL DEFAULT 0,
+                kind TEXT NOT NULL,
+                name TEXT,
+                role TEXT,
+                status TEXT NOT NULL,
+                stage TEXT,
+                pdf BLOB,
+                options TEXT NOT NULL,
+                result TEXT,
+                partial TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                max_running INTEGER,
+                heartbeat_at REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs(batch_id, position);
+            CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at);
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                job_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, stage)
+            );
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "max_running" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN max_running INTEGER")
+        if "heartbeat_at" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+        self._conn.commit()
+
+    def _row_to_job(self, row):
+        job = dict(zip(JOB_COLUMNS, row))
+        job["options"] = json.loads(job["options"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, kind, name, pdf_bytes, role=None, options=None, batch_id=None, position=0, result=None,
+               max_running=None):
+        """Queue a job and return its id.
+
+        With ``result`` the job is recorded as already done (e.g. a resume
+        deferred by keyword pre-triage) so it still shows up in its batch.
+        ``max_running`` caps how many of the batch's jobs run at once.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        status = DONE if result is not None else QUEUED
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, batch_id, position, kind, name, role, status, stage, pdf, options, result, "
+                "max_running, created_at, finished_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, batch_id, position, kind, name, role, status, "Queued" if result is None else "Done",
+                 None if result is not None else pdf_bytes, json.dumps(options or {}),
+                 json.dumps(result) if result is not None else None, max_running, now,
+                 now if result is not None else None, now)
+            )
+            self._conn.commit()
+        return job_id
+
+    def claim(self, job_ids=None, interactive_only=False):
+        """Mark the next queued job as running under this process and return it (with ``pdf``), or None.
+
+        Jobs outside a batch (single-resume and all-roles screenings) come
+        first, then batch jobs oldest first. A batch with ``max_running``
+        of its jobs already running is skipped. With ``job_ids`` only those
+        jobs are considered, and with ``interactive_only`` no batch jobs.
+        """
+        now = time.time()
+        if job_ids is not None and not job_ids:
+            return None
+        sql = (
+            "SELECT j.id FROM jobs j WHERE j.status = ? AND (j.max_running IS NULL OR "
+            "(SELECT COUNT(*) FROM jobs r WHERE r.batch_id = j.batch_id AND r.status = ?) < j.max_running)"
+        )
+        params = [QUEUED, RUNNING]
+        if interactive_only:
+            sql += " AND j.batch_id IS NULL"
+        if job_ids is not None:
+            job_ids = list(job_ids)
+            sql += f" AND j.id IN ({', '.join('?' * len(job_ids))})"
+            params += job_ids
+        sql += " ORDER BY j.batch_id IS NOT NULL, j.created_at, j.position LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+            if row is None:
+                return None
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, owner = ?, attempts = attempts + 1, "
+                "started_at = COALESCE(started_at, ?), heartbeat_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, "Starting", self.owner, now, now, now, row[0], QUEUED)
+            ).rowcount
+            self._conn.commit()
+            if not updated:
+                # Another process got there first
+                return None
+            job_row = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)}, pdf FROM jobs WHERE id = ?", (row[0],)
+            ).fetchone()
+        job = self._row_to_job(job_row[:-1])
+        job["pdf"] = job_row[-1]
+        return job
+
+    def heartbeat(self):
+        """Renew the lease on every job this instance is running; returns how many."""
+        with self._lock:
+            renewed = self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND owner = ?", (time.time(), RUNNING, self.owner)
+            ).rowcount
+            self._conn.commit()
+        return renewed
+
+    def set_stage(self, job_id, stage):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET stage = ?, updated_at = ? WHERE id = ?", (stage, time.time(), job_id))
+            self._conn.commit()
+
+    def set_partial(self, job_id, text):
+        """Store the report generated so far, for the UI to show while the job runs."""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET partial = ?, updated_at = ? WHERE id = ?", (text, time.time(), job_id))
+            self._conn.commit()
+
+    def finish(self, job_id, result, error=None):
+        """Store the job's result; it is failed if ``error`` is set, done otherwise.
+
+        Done jobs drop their PDF and checkpoints; failed ones keep them so
+        ``retry`` can resume where they stopped.
+        """
+        now = time.time()
+        status = FAILED if error else DONE
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, result = ?, error = ?, partial = NULL, finished_at = ?, "
+                "updated_at = ? WHERE id = ?",
+                (status, "Failed" if error else "Done", json.dumps(result) if result is not None else None, error,
+                 now, now, job_id)
+            )
+            if status == DONE:
+                self._conn.execute("UPDATE jobs SET pdf = NULL WHERE id = ?", (job_id,))
+                self._conn.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+
+    def retry(self, job_id):
+        """Queue a failed job again; returns False if it isn't failed or its PDF is gone."""
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = NULL, attempts = 0, finished_at = NULL, "
+                "updated_at = ? WHERE id = ? AND status = ? AND pdf IS NOT NULL",
+                (QUEUED, "Queued", time.time(), job_id, FAILED)
+            ).rowcount
+            self._conn.commit()
+        return bool(updated)
+
+    def recover(self):
+        """Requeue running jobs whose lease has expired; returns how many.
+
+        A job's lease runs ``lease_seconds`` from its last ``heartbeat`` (or
+        its last update, for jobs claimed before leases existed). This
+        instance's own jobs are never requeued. Jobs that already took down
+        MAX_JOB_ATTEMPTS workers are failed instead.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, attempts FROM jobs WHERE status = ? AND (owner IS NULL OR owner != ?) "
+                "AND COALESCE(heartbeat_at, updated_at) < ?",
+                (RUNNING, self.owner, now - self.lease_seconds)
+            ).fetchall()
+            requeued = 0
+            for job_id, attempts in rows:
+                if attempts >= MAX_JOB_ATTEMPTS:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, stage = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                        (FAILED, "Failed", f"Interrupted {attempts} times", now, now, job_id)
+                    )
+                else:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, stage = ?, owner = NULL, updated_at = ? WHERE id = ?",
+                        (QUEUED, "Queued (resuming)", now, job_id)
+                    )
+                    requeued += 1
+            self._conn.commit()
+        return requeued
+
+    def purge(self):
+        """Apply the retention limits; returns ``(pdfs_dropped, jobs_deleted)``.
+
+        Failed jobs older than ``pdf_max_age_days`` lose their PDF and
+        checkpoints (so they can no longer be retried); finished jobs older
+        than ``job_max_age_days`` are deleted with their results.
+        """
+        now = time.time()
+        finished = f"status IN ('{DONE}', '{FAILED}') AND finished_at < ?"
+        with self._lock:
+            pdf_cutoff = now - self.pdf_max_age_days * 24 * 3600
+            self._conn.execute(
+                f"DELETE FROM checkpoints WHERE job_id IN (SELECT id FROM jobs WHERE {finished})", (pdf_cutoff,)
+            )
+            pdfs_dropped = self._conn.execute(
+                f"UPDATE jobs SET pdf = NULL WHERE {finished} AND pdf IS NOT NULL", (pdf_cutoff,)
+            ).rowcount
+            jobs_deleted = self._conn.execute(
+                f"DELETE FROM jobs WHERE {finished}", (now - self.job_max_age_days * 24 * 3600,)
+            ).rowcount
+            self._conn.commit()
+        return pdfs_dropped, jobs_deleted
+
+    def get(self, job_id):
+        """The job (without its PDF), or None."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, batch_id=None, limit=None):
+        """A batch's jobs in submission order, or the most recent jobs across batches."""
+        with self._lock:
+            if batch_id is not None:
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE batch_id = ? ORDER BY position", (batch_id,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit or -1,)
+                ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def queued_ids(self):
+        """Ids of every queued job."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM jobs WHERE status = ?", (QUEUED,)).fetchall()
+        return [row[0] for row in rows]
+
+    def counts(self):
+        """Number of jobs in each state."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def get_checkpoint(self, job_id, stage):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM checkpoints WHERE job_id = ? AND stage = ?", (job_id, stage)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_checkpoint(self, job_id, stage, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (job_id, stage, value, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, stage, json.dumps(value), time.time())
+            )
+            self._conn.commit()
+
+    def checkpoints(self, job_id):
+        """The ``checkpoints`` object for one job, as taken by ``screener.screen_resume``."""
+        return JobCheckpoints(self, job_id)
+
+
+class JobCheckpoints:
+    """Per-stage checkpoint store of one job: ``get(stage)`` / ``set(stage, value)``."""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+
+    def get(self, stage):
+        return self.queue.get_checkpoint(self.job_id, stage)
+
+    def set(self, stage, value):
+        self.queue.set_checkpoint(self.job_id, stage, value)
+
+
+class JobRunner:
+    """Pool of daemon threads working a ``JobQueue``.
+
+    ``handler(job, api_key, checkpoints, on_stage, on_partial)`` screens one
+    job and returns its outcome dict; an outcome with ``error`` set fails
+    the job. Each job runs on the key it was submitted (or retried) with,
+    held in memory only until the job finishes. A queued job with no key in
+    this process - one left over from a restart - waits until someone
+    ``resume``s it with theirs. A heartbeat thread renews the lease on this
+    process's running jobs every ``heartbeat_interval`` seconds and requeues
+    other processes' jobs whose lease has expired (see ``JobQueue.recover``).
+
+    ``workers`` threads take any job (see ``JobQueue.claim`` for the order
+    and per-batch caps); ``reserved_workers`` more only take jobs outside a
+    batch.
+    """
+
+    def __init__(self, queue, handler, workers, reserved_workers=RESERVED_INTERACTIVE_WORKERS,
+                 poll_interval=JOB_POLL_INTERVAL, heartbeat_interval=JOB_HEARTBEAT_INTERVAL):
+        self.queue = queue
+        self.handler = handler
+        self.reserved_workers = reserved_workers
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._keys = {}
+        self.workers = 0
+        self._threads = {}
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+        self._recover()
+        self._purge()
+        threading.Thread(target=self._heartbeat, daemon=True, name="job-heartbeat").start()
+        self.set_workers(workers)
+
+    def set_workers(self, count):
+        """Grow or shrink the pool of general workers; surplus workers exit after their current job."""
+        with self._lock:
+            self.workers = count
+            for index in range(count + self.reserved_workers):
+                if index not in self._threads or not self._threads[index].is_alive():
+                    thread = threading.Thread(target=self._work, args=(index,), daemon=True, name=f"job-worker-{index}")
+                    thread.start()
+                    self._threads[index] = thread
+
+    def notify(self):
+        """Wake idle workers, e.g. right after submitting jobs."""
+        self._wakeup.set()
+
+    def submit(self, api_key, kind, name, pdf_bytes, role=None, options=None, batch_id=None, position=0,
+               result=None, max_running=None):
+        """``JobQueue.submit`` a job that will run on ``api_key``; returns its id.
+
+        Call ``notify`` once the jobs are in.
+        """
+        job_id = self.queue.submit(kind, name, pdf_bytes, role, options, batch_id, position, result, max_running)
+        if result is None:
+            with self._lock:
+                self._keys[job_id] = api_key
+        return job_id
+
+    def retry(self, job_id, api_key):
+        """``JobQueue.retry`` a failed job on ``api_key``; returns False if it can't be retried."""
+        with self._lock:
+            self._keys[job_id] = api_key
+        if self.queue.retry(job_id):
+            return True
+        with self._lock:
+            self._keys.pop(job_id, None)
+        return False
+
+    def waiting_for_key(self):
+        """Ids of queued jobs this process has no key for (e.g. submitted before a restart)."""
+        with self._lock:
+            return [job_id for job_id in self.queue.queued_ids() if job_id not in self._keys]
+
+    def resume(self, job_ids, api_key):
+        """Run queued jobs that are ``waiting_for_key`` on ``api_key``."""
+        with self._lock:
+            for job_id in job_ids:
+                self._keys.setdefault(job_id, api_key)
+        self.notify()
+
+    def _recover(self):
+        recovered = self.queue.recover()
+        if recovered:
+            logger.info("Resuming %d interrupted job(s)", recovered)
+            self.notify()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                self.queue.heartbeat()
+                self._recover()
+            except sqlite3.Error:
+                logger.exception("Job heartbeat failed")
+
+    def _purge(self):
+        self._last_purge = time.monotonic()
+        pdfs_dropped, jobs_deleted = self.queue.purge()
+        if pdfs_dropped or jobs_deleted:
+            logger.info("Job retention: dropped %d PDF(s), deleted %d old job(s)", pdfs_dropped, jobs_deleted)
+
+    def _work(self, index):
+        while index < self.workers + self.reserved_workers:
+            if index == 0 and time.monotonic() - self._last_purge >= JOB_PURGE_INTERVAL:
+                self._purge()
+            with self._lock:
+                job_ids = list(self._keys)
+            job = self.queue.claim(job_ids, interactive_only=index >= self.workers)
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        job_id = job["id"]
+        last_partial = 0.0
+
+        def on_stage(stage):
+            self.queue.set_stage(job_id, stage)
+
+        def on_partial(text):
+            nonlocal last_partial
+            if time.monotonic() - last_partial >= PARTIAL_WRITE_INTERVAL:
+                self.queue.set_partial(job_id, text)
+                last_partial = time.monotonic()
+
+        with self._lock:
+            api_key = self._keys.get(job_id)
+        try:
+            outcome = self.handler(job, api_key, self.queue.checkpoints(job_id), on_stage, on_partial)
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            self.queue.finish(job_id, None, str(e))
+            return
+        finally:
+            with self._lock:
+                self._keys.pop(job_id, None)
+        self.queue.finish(job_id, outcome, outcome.get("error"))
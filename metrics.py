@@ -0,0 +1,362 @@
+"""Per-stage latency, retry, payload, token and cost instrumentation.
+
+Each screening gets a ``ScreeningMetrics`` that the pipeline fills in as it
+runs: wall time per stage (render, quality_review, extraction, fused,
+analysis), retries and time spent in backoff sleeps, image bytes uploaded,
+prompt/completion/cached tokens and an estimated cost. Finished screenings
+can be appended to a JSONL log and folded into a process-wide registry that
+renders Prometheus text exposition format (e.g. for node_exporter's textfile
+collector), so p50/p95 can be tracked over time.
+"""
+import json
+import os
+import threading
+import time
+
+# USD per million tokens - update when pricing changes. Models missing here
+# are costed at zero.
+MODEL_PRICING = {
+    "gpt-5.2": {"input": 1.75, "cached_input": 0.175, "output": 14.00},
+    "gpt-5-mini": {"input": 0.25, "cached_input": 0.025, "output": 2.00}
+}
+
+# Stages reported, in pipeline order
+STAGES = ["render", "quality_review", "extraction", "fused", "analysis"]
+
+# Upper bounds (seconds) of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300]
+
+DEFAULT_METRICS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+DEFAULT_METRICS_JSONL = os.path.join(DEFAULT_METRICS_DIR, "metrics.jsonl")
+DEFAULT_METRICS_PROM = os.path.join(DEFAULT_METRICS_DIR, "metrics.prom")
+
+COUNTER_FIELDS = [
+    "seconds", "calls", "cache_hits", "retries", "backoff_seconds", "throttle_seconds",
+    "images", "image_bytes", "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd"
+]
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Estimated USD cost of one call; cached prompt tokens are billed at the cached rate."""
+    pricing = MODEL_PRICING.get(model)
+    if not pricing:
+        return 0.0
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return (
+        uncached * pricing["input"]
+        + cached_tokens * pricing["cached_input"]
+        + completion_tokens * pricing["output"]
+    ) / 1_000_000
+
+
+def usage_counts(usage):
+    """``(prompt, completion, cached)`` token counts from an OpenAI ``usage`` object."""
+    if usage is None:
+        return 0, 0, 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (
+        getattr(usage, "prompt_tokens", 0) or 0,
+        getattr(usage, "completion_tokens", 0) or 0,
+        (getattr(details, "cached_tokens", 0) or 0) if details else 0
+    )
+
+
+def cached_ratio(prompt_tokens, cached_tokens):
+    """Share of prompt tokens served from the provider's prompt cache (0-1)."""
+    return cached_tokens / prompt_tokens if prompt_tokens else 0.0
+
+
+def percentile(values, q):
+    """The ``q``-th percentile (0-100) of ``values`` by linear interpolation, or None if empty."""
+    values = sorted(values)
+    if not values:
+        return None
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class ScreeningMetrics:
+    """Counters for one resume's trip through the pipeline.
+
+    Safe to share between the threads of one screening (the quality review
+    and extraction run side by side). Stages only appear once something was
+    recorded for them.
+    """
+
+    def __init__(self, resume=None, role=None):
+        self.resume = resume
+        self.role = role
+        self.started_at = time.time()
+        self.stages = {}
+        self.calls = []
+        self.budgets = []
+        self._start = time.perf_counter()
+        self._end = None
+        self._lock = threading.Lock()
+
+    def _add(self, stage, **counts):
+        with self._lock:
+            entry = self.stages.setdefault(stage, dict.fromkeys(COUNTER_FIELDS, 0))
+            for field, value in counts.items():
+                entry[field] += value
+
+    def add_seconds(self, stage, seconds):
+        self._add(stage, seconds=seconds)
+
+    def record_cache_hit(self, stage):
+        self._add(stage, cache_hits=1)
+
+    def record_call(self, stage, model, usage, stats=None, images_data=None, seconds=0.0):
+        """Record one model call: its ``usage``, ``execute_request`` stats, uploaded images and latency."""
+        stats = stats or {}
+        images_data = images_data or []
+        prompt_tokens, completion_tokens, cached_tokens = usage_counts(usage)
+        cost_usd = estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        with self._lock:
+            self.calls.append({
+                "stage": stage,
+                "model": model,
+                "seconds": seconds,
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "cached_ratio": cached_ratio(prompt_tokens, cached_tokens),
+                "completion_tokens": completion_tokens,
+                "cost_usd": cost_usd
+            })
+        self._add(
+            stage,
+            seconds=seconds,
+            calls=1,
+            retries=stats.get("retries", 0),
+            backoff_seconds=stats.get("backoff_seconds", 0.0),
+            throttle_seconds=stats.get("throttle_seconds", 0.0),
+            images=len(images_data),
+            image_bytes=sum(img['bytes'] for img in images_data),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+            cost_usd=cost_usd
+        )
+
+    def record_budget(self, budget):
+        """Keep a call's token budget record (see budget.py) with the screening's metrics."""
+        with self._lock:
+            self.budgets.append(dict(budget))
+
+    def finish(self):
+        """Stop the end-to-end clock (later snapshots keep the same total)."""
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    def totals(self):
+        """Sum of every counter across stages, with ``seconds`` as end-to-end wall time."""
+        with self._lock:
+            totals = dict.fromkeys(COUNTER_FIELDS, 0)
+            for entry in self.stages.values():
+                for field in COUNTER_FIELDS:
+                    totals[field] += entry[field]
+        totals["seconds"] = (self._end or time.perf_counter()) - self._start
+        return totals
+
+    def to_dict(self):
+        """JSON-serialisable snapshot, one JSONL record."""
+        with self._lock:
+            stages = {stage: dict(entry) for stage, entry in self.stages.items()}
+            calls = [dict(call) for call in self.calls]
+            budgets = [dict(budget) for budget in self.budgets]
+        return {
+            "resume": self.resume,
+            "role": self.role,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "totals": self.totals(),
+            "stages": stages,
+            "calls": calls,
+            "budgets": budgets
+        }
+
+
+def stage_rows(record):
+    """Table rows (one per stage, plus a total) for a ``ScreeningMetrics.to_dict()`` record."""
+    stages = record.get("stages", {})
+    ordered = [s for s in STAGES if s in stages] + [s for s in stages if s not in STAGES]
+    rows = []
+    for stage, entry in [(s, stages[s]) for s in ordered] + [("total", record.get("totals", {}))]:
+        rows.append({
+            "Stage": stage,
+            "Seconds": round(entry.get("seconds", 0), 2),
+            "Calls": entry.get("calls", 0),
+            "Cache hits": entry.get("cache_hits", 0),
+            "Retries": entry.get("retries", 0),
+            "Backoff s": round(entry.get("backoff_seconds", 0), 2),
+            "Image KB": round(entry.get("image_bytes", 0) / 1024, 1),
+            "Prompt tok": entry.get("prompt_tokens", 0),
+            "Cached tok": entry.get("cached_tokens", 0),
+            "Cached %": f"{cached_ratio(entry.get('prompt_tokens', 0), entry.get('cached_tokens', 0)):.0%}",
+            "Output tok": entry.get("completion_tokens", 0),
+            "Cost $": round(entry.get("cost_usd", 0), 4)
+        })
+    return rows
+
+
+def budget_notes(record):
+    """Short notes on where a screening went over a token budget or hit an output cap."""
+    notes = []
+    for budget in record.get("budgets", []):
+        if budget.get("action"):
+            note = f"{budget['stage']}: {budget['action']}"
+            if budget.get("calls", 1) > 1:
+                note += f" over {budget['calls']} calls"
+            if budget.get("pages_dropped"):
+                note += f", dropped pages {', '.join(str(n) for n in budget['pages_dropped'])}"
+            if budget.get("chars_dropped"):
+                note += f", dropped {budget['chars_dropped']} chars"
+            notes.append(note)
+        if budget.get("length_retries"):
+            notes.append(f"{budget['stage']}: {budget['length_retries']} response(s) cut off, retried with a larger cap")
+        if budget.get("hit_output_cap"):
+            notes.append(f"{budget['stage']}: output cut off at {budget['max_output_tokens']} tokens")
+    return notes
+
+
+def latency_summary(records):
+    """Per-stage ``{"count", "p50", "p95"}`` seconds over many JSONL records.
+
+    A stage's seconds add up every piece of work in it, so stages that run
+    in parallel (e.g. rendering for the review and for extraction) can
+    exceed the end-to-end ``total``.
+    """
+    samples = {}
+    for record in records:
+        for stage, entry in record.get("stages", {}).items():
+            samples.setdefault(stage, []).append(entry["seconds"])
+        samples.setdefault("total", []).append(record.get("totals", {}).get("seconds", 0))
+    ordered = [s for s in STAGES if s in samples] + sorted(s for s in samples if s not in STAGES and s != "total")
+    return {
+        stage: {"count": len(samples[stage]), "p50": percentile(samples[stage], 50), "p95": percentile(samples[stage], 95)}
+        for stage in ordered + ["total"]
+    }
+
+
+def model_summary(records):
+    """Per-model ``{"calls", "seconds", "cost_usd"}`` over many JSONL records' calls."""
+    summary = {}
+    for record in records:
+        for call in record.get("calls", []):
+            entry = summary.setdefault(call["model"], {"calls": 0, "seconds": 0.0, "cost_usd": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += call["seconds"]
+            entry["cost_usd"] += call.get("cost_usd", 0.0)
+    return summary
+
+
+_jsonl_lock = threading.Lock()
+
+
+def append_jsonl(path, record):
+    """Append one metrics record to the JSONL log at ``path``."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with _jsonl_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+class MetricsRegistry:
+    """Process-wide aggregate of finished screenings in Prometheus form.
+
+    Counters are cumulative since the process started; stage latency is a
+    histogram, so quantiles can be taken with ``histogram_quantile``.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.screenings = 0
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, stage, seconds):
+        histogram = self.histograms.setdefault(stage, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+    def observe(self, record):
+        """Fold one ``ScreeningMetrics.to_dict()`` record into the aggregate."""
+        with self._lock:
+            self.screenings += 1
+            for stage, entry in record["stages"].items():
+                counters = self.counters.setdefault(stage, dict.fromkeys(COUNTER_FIELDS, 0))
+                for field in COUNTER_FIELDS:
+                    counters[field] += entry.get(field, 0)
+                self._observe(stage, entry["seconds"])
+            self._observe("total", record["totals"]["seconds"])
+
+    def render(self):
+        """The aggregate in Prometheus text exposition format."""
+        counter_help = {
+            "calls": "Model calls made",
+            "cache_hits": "Result cache hits",
+            "retries": "Retried model requests",
+            "backoff_seconds": "Seconds slept in retry backoff",
+            "throttle_seconds": "Seconds waited for rate-limit budget",
+            "images": "Page images uploaded",
+            "image_bytes": "Encoded image bytes uploaded",
+            "prompt_tokens": "Prompt tokens billed",
+            "completion_tokens": "Completion tokens billed",
+            "cached_tokens": "Prompt tokens served from the provider cache",
+            "cost_usd": "Estimated cost in US dollars"
+        }
+        lines = [
+            "# HELP resume_screener_screenings_total Screenings recorded",
+            "# TYPE resume_screener_screenings_total counter",
+            f"resume_screener_screenings_total {self.screenings}"
+        ]
+        with self._lock:
+            for field, help_text in counter_help.items():
+                name = f"resume_screener_stage_{field}_total"
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for stage, counters in sorted(self.counters.items()):
+                    lines.append(f'{name}{{stage="{stage}"}} {counters[field]:g}')
+
+            name = "resume_screener_stage_seconds"
+            lines.append(f"# HELP {name} Wall time per pipeline stage")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in sorted(self.histograms.items()):
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram["sum"]:g}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Atomically write ``render()`` to ``path`` (safe for textfile collectors)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    """The process-wide registry shared by all sessions."""
+    return _registry
+
+
+def record_screening(record, jsonl_path=DEFAULT_METRICS_JSONL, prom_path=DEFAULT_METRICS_PROM):
+    """Export one finished screening: append it to the JSONL log and refresh the Prometheus file.
+
+    Either path may be None to skip that export.
+    """
+    if jsonl_path:
+        append_jsonl(jsonl_path, record)
+    _registry.observe(record)
+    if prom_path:
+        _registry.write(prom_path)
@@ -0,0 +1,374 @@
+"""Local stand-in for the OpenAI chat-completions endpoint, for offline benchmarks.
+
+Serves ``POST /v1/chat/completions`` (plain and streamed) with canned
+responses shaped like the real ones for each pipeline stage - quality review
+JSON, verbatim transcription, the fused review + transcript JSON and the
+structured role-fit analysis JSON - so the whole pipeline runs unchanged against it.
+Latency, 5xx errors and 429s are configurable, smaller models answer
+faster (MODEL_SPEED), and a simple prefix cache reports ``cached_tokens``
+the way provider-side prompt caching does. Parameters the real model would
+reject (see ``unsupported_parameter``) get the same 400 the API returns.
+
+Run standalone with ``python mock_openai.py --port 8765`` and point the app
+at it with ``OPENAI_BASE_URL=http://127.0.0.1:8765/v1``, or start it from
+code with ``MockOpenAIServer(...).start()`` (see benchmark.py).
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Same rough sizing the rate limiter uses
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 765
+
+# Prompt caching: prefixes are matched in blocks, and only from this length on
+CACHE_BLOCK_CHARS = 128 * CHARS_PER_TOKEN
+CACHE_MIN_CHARS = 1024 * CHARS_PER_TOKEN
+
+# Fraction of the configured latency and per-token time a model takes; models
+# not listed take all of it
+MODEL_SPEED = {"gpt-5-mini": 0.4}
+
+# Reasoning models accept sampling parameters only at their defaults (unless
+# reasoning is off), and other models don't accept a reasoning effort
+REASONING_MODEL_PREFIXES = ("gpt-5", "o1", "o3", "o4")
+SAMPLING_PARAMETERS = ("temperature", "top_p")
+
+CANNED_QUALITY_REVIEW = {
+    "cv_source": "DIRECT",
+    "agency_name": None,
+    "spelling_grammar": {"score": 1, "issues": []},
+    "factual_consistency": {"score": 1, "issues": []},
+    "layout_structure": {"score": 1, "issues": []},
+    "attention_to_detail": {"score": 0, "issues": ["Inconsistent date formats"]},
+    "total_score": 3,
+    "verdict": "PASS",
+    "summary": "Well-structured resume with minor date formatting inconsistencies."
+}
+
+CANNED_PAGE_TEXT = (
+    "Senior Delivery Lead\n\nExperience\n- Led delivery of GenAI document workflows for a top-10 pharma client\n"
+    "- Wrote PRDs, evaluation plans and quality rubrics for RAG assistants\n"
+    "- Ran weekly stakeholder reviews with engineering, QA and compliance\n\n"
+    "Skills\nProgram management, prompt engineering, LLM evaluation, pharmacovigilance, traceability\n"
+)
+
+CANNED_ANALYSIS = {
+    "scorecard": [
+        {"criterion": "Criterion 1", "score": 1, "evidence": "Led GenAI workflow delivery for a pharma client"},
+        {"criterion": "Criterion 2", "score": 1, "evidence": "Wrote PRDs and evaluation plans"},
+        {"criterion": "Criterion 3", "score": 1, "evidence": "Ran stakeholder reviews"},
+        {"criterion": "Criterion 4", "score": 0, "evidence": "No direct regulated-domain delivery"}
+    ],
+    "role_fit_score": 3,
+    "quality_penalty": 0,
+    "final_score": 3,
+    "verdict": "PROCEED TO INTERVIEW",
+    "strengths": ["Hands-on GenAI delivery experience", "Strong requirements and evaluation background"],
+    "concerns": ["Limited evidence of regulated-domain work"],
+    "summary": "Solid delivery profile with applied GenAI experience. Recommend a first-round interview."
+}
+
+
+def mock_analysis(prompt_text):
+    """CANNED_ANALYSIS with criterion scores derived from the prompt, so candidates differ.
+
+    The same resume always gets the same scores, whichever model is asked.
+    """
+    bits = hashlib.sha256(prompt_text.encode("utf-8")).digest()[0]
+    scorecard = [dict(item, score=(bits >> i) & 1) for i, item in enumerate(CANNED_ANALYSIS["scorecard"])]
+    score = sum(item["score"] for item in scorecard)
+    return dict(CANNED_ANALYSIS, scorecard=scorecard, role_fit_score=score, final_score=score,
+                verdict="PROCEED TO INTERVIEW" if score >= 3 else "DO NOT PROCEED")
+
+
+def unsupported_parameter(body):
+    """``(param, message)`` for a request parameter the model would reject with a 400, or None."""
+    model = body.get("model") or ""
+    if not model.startswith(REASONING_MODEL_PREFIXES):
+        if "reasoning_effort" in body:
+            return "reasoning_effort", f"Unrecognized request argument supplied: reasoning_effort (model {model})"
+        return None
+    if body.get("reasoning_effort") == "none":
+        return None
+    for param in SAMPLING_PARAMETERS:
+        if body.get(param, 1) != 1:
+            return param, (f"Unsupported value: '{param}' does not support {body[param]} with this model. "
+                           "Only the default (1) value is supported.")
+    return None
+
+
+class MockOpenAIServer:
+    """Threaded HTTP server imitating the chat-completions API.
+
+    ``latency`` seconds (plus up to ``jitter``) pass before the first byte,
+    then ``seconds_per_token`` per completion token, both scaled by the
+    requested model's ``model_speed`` (default MODEL_SPEED). Each request fails with
+    a 500 with probability ``error_rate`` and a 429 (with ``retry-after-ms``)
+    with probability ``rate_limit_rate``. Counters in ``stats`` cover
+    requests per stage, injected errors and request bytes received.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, jitter=0.1, seconds_per_token=0.0005,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after_ms=200, seed=None, model_speed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.seconds_per_token = seconds_per_token
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_ms = retry_after_ms
+        self.model_speed = dict(MODEL_SPEED if model_speed is None else model_speed)
+        self._random = random.Random(seed)
+        self._seen_prefixes = set()
+        self._lock = threading.Lock()
+        self.reset()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Serve in a background thread; returns self."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset(self):
+        """Zero ``stats`` and forget cached prompt prefixes, so a second run starts cold."""
+        with self._lock:
+            self.stats = {"requests": 0, "errors_injected": 0, "rate_limits_injected": 0, "rejected": 0,
+                          "bytes_received": 0, "by_stage": {}, "by_model": {}}
+            self._seen_prefixes.clear()
+
+    def _count(self, field, amount=1):
+        with self._lock:
+            self.stats[field] += amount
+
+    def _roll(self):
+        """Which failure (if any) to inject for the next request."""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def _delay(self, completion_tokens=0, model=None):
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter)
+        return (self.latency + jitter + completion_tokens * self.seconds_per_token) * self.model_speed.get(model, 1.0)
+
+    def _cached_tokens(self, prompt_text):
+        """Length of the longest block-aligned prefix seen before, as tokens."""
+        digest = hashlib.sha256()
+        cached_chars = 0
+        prefixes = []
+        for end in range(CACHE_BLOCK_CHARS, len(prompt_text) + 1, CACHE_BLOCK_CHARS):
+            digest.update(prompt_text[end - CACHE_BLOCK_CHARS:end].encode("utf-8"))
+            prefixes.append((end, digest.copy().hexdigest()))
+        with self._lock:
+            for end, key in prefixes:
+                if key in self._seen_prefixes:
+                    cached_chars = end
+                self._seen_prefixes.add(key)
+        return cached_chars // CHARS_PER_TOKEN if cached_chars >= CACHE_MIN_CHARS else 0
+
+    def respond(self, body):
+        """Canned content and usage for a request body; returns ``(stage, content, usage, finish_reason)``.
+
+        Content longer than ``max_completion_tokens`` is cut off with finish reason "length".
+        """
+        text_parts = []
+        images = 0
+        for message in body.get("messages", []):
+            content = message.get("content")
+            if isinstance(content, str):
+                text_parts.append(content)
+                continue
+            for part in content or []:
+                if part.get("type") == "text":
+                    text_parts.append(part["text"])
+                else:
+                    images += 1
+        prompt_text = "\n".join(text_parts)
+
+        response_format = body.get("response_format") or {}
+        schema_name = response_format.get("json_schema", {}).get("name")
+        if schema_name == "role_fit_analysis":
+            stage = "analysis"
+            content = json.dumps(mock_analysis(prompt_text), indent=2)
+        elif response_format.get("type") == "json_schema":
+            stage = "fused"
+            match = re.search(r"Pages to transcribe:\s*([\d,\s]+)", prompt_text)
+            page_nums = [int(n) for n in re.findall(r"\d+", match.group(1))] if match else []
+            content = json.dumps({
+                "quality_review": CANNED_QUALITY_REVIEW,
+                "resume_pages": [{"page_number": n, "text": CANNED_PAGE_TEXT} for n in page_nums]
+            })
+        elif "resume quality reviewer" in prompt_text:
+            stage = "quality_review"
+            content = "```json\n" + json.dumps(CANNED_QUALITY_REVIEW, indent=2) + "\n```"
+        elif "Extract ALL text" in prompt_text:
+            stage = "extraction"
+            content = "\n\n".join([CANNED_PAGE_TEXT] * max(images, 1))
+        else:
+            stage = "analysis"
+            content = json.dumps(mock_analysis(prompt_text), indent=2)
+
+        finish_reason = "stop"
+        max_tokens = body.get("max_completion_tokens")
+        if max_tokens and len(content) // CHARS_PER_TOKEN > max_tokens:
+            content = content[:max_tokens * CHARS_PER_TOKEN]
+            finish_reason = "length"
+
+        prompt_tokens = len(prompt_text) // CHARS_PER_TOKEN + images * TOKENS_PER_IMAGE
+        completion_tokens = len(content) // CHARS_PER_TOKEN
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": min(self._cached_tokens(prompt_text), prompt_tokens)}
+        }
+        return stage, content, usage, finish_reason
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server._count("requests")
+                server._count("bytes_received", len(raw))
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+                    return
+
+                failure = server._roll()
+                if failure == 429:
+                    server._count("rate_limits_injected")
+                    time.sleep(server.latency / 4)
+                    self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests",
+                                                    "code": "rate_limit_exceeded"}},
+                                    {"retry-after-ms": str(server.retry_after_ms)})
+                    return
+                if failure == 500:
+                    server._count("errors_injected")
+                    time.sleep(server.latency / 4)
+                    self._send_json(500, {"error": {"message": "Internal error (mock)", "type": "server_error"}})
+                    return
+
+                body = json.loads(raw or b"{}")
+                unsupported = unsupported_parameter(body)
+                if unsupported:
+                    server._count("rejected")
+                    param, message = unsupported
+                    self._send_json(400, {"error": {"message": message, "type": "invalid_request_error",
+                                                    "param": param, "code": "unsupported_value"}})
+                    return
+                stage, content, usage, finish_reason = server.respond(body)
+                model = body.get("model")
+                with server._lock:
+                    by_stage = server.stats["by_stage"]
+                    by_stage[stage] = by_stage.get(stage, 0) + 1
+                    by_model = server.stats["by_model"]
+                    by_model[model] = by_model.get(model, 0) + 1
+
+                base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": body.get("model", "mock")}
+                if not body.get("stream"):
+                    time.sleep(server._delay(usage["completion_tokens"], model))
+                    self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": finish_reason
+                    }]))
+                    return
+
+                # Server-sent events, one chunk per line of the report
+                time.sleep(server._delay(model=model))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def send_chunk(payload):
+                    self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+                    self.wfile.flush()
+
+                for piece in content.splitlines(keepends=True):
+                    time.sleep(len(piece) // CHARS_PER_TOKEN * server.seconds_per_token
+                               * server.model_speed.get(model, 1.0))
+                    send_chunk(dict(base, object="chat.completion.chunk", choices=[
+                        {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+                    ]))
+                send_chunk(dict(base, object="chat.completion.chunk", choices=[
+                    {"index": 0, "delta": {}, "finish_reason": finish_reason}
+                ]))
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    send_chunk(dict(base, object="chat.completion.chunk", choices=[], usage=usage))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI chat-completions endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0005, help="Generation time per output token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 500 response")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probability of a 429 response")
+    args = parser.parse_args(argv)
+
+    server = MockOpenAIServer(
+        args.host, args.port, args.latency, args.jitter, args.seconds_per_token, args.error_rate, args.rate_limit_rate
+    )
+    print(f"Mock OpenAI endpoint at {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
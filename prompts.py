@@ -0,0 +1,536 @@
+"""Prompts and response schemas used by the screening pipeline."""
+
+# Resume Quality Review Prompt ("quality_review" stage)
+QUALITY_REVIEW_PROMPT = """You are a professional resume quality reviewer. Analyze the provided resume image(s) and evaluate the document quality.
+
+## IMPORTANT CONTEXT
+- Current date: February 2026. Dates up to 2026 are valid and acceptable.
+- First, check if this is an AGENCY CV (look for agency name/logo at the top like "ABC Staffing", "XYZ Recruiters", etc.) or a DIRECT CANDIDATE CV.
+
+## CV Source Detection
+- **Agency CV**: Has agency branding/name at top, often missing candidate contact details (this is intentional - agencies remove contact info to prevent direct outreach)
+- **Direct CV**: No agency branding, should have candidate's own contact information
+
+## Evaluation Criteria
+
+### 1. **Spelling & Grammar** (0 or 1)
+- Check for spelling mistakes, typos, grammatical errors
+- Minor capitalization inconsistencies (e.g., "Zero-shot" vs "zero-shot") should NOT fail this criterion
+- Focus on actual language errors, not stylistic choices
+
+### 2. **Factual/Technical Consistency** (0 or 1)
+- Check if dates are logical (no overlapping employment, dates should be <= 2026)
+- Unexplained employment gaps > 1 year should be noted
+- **IMPORTANT**: Check for technical inaccuracies in claims, e.g.:
+  - Claiming PostgreSQL as a vector database (it's not, unless using pgvector extension)
+  - Misrepresenting technologies or their capabilities
+  - Inconsistent tech stack claims (e.g., using a framework that didn't exist at the claimed time)
+- Verify education timeline makes sense relative to experience
+
+### 3. **Layout & Structure** (0 or 1)
+- Is the resume well-organized with clear sections?
+- Professional appearance, not cluttered or chaotic
+- **DO NOT penalize** for:
+  - Minor bullet point style variations (solid vs hollow)
+  - Slight spacing inconsistencies
+  - These may be artifacts from agency reformatting, not candidate's fault
+
+### 4. **Attention to Detail** (0 or 1)
+- **For Agency CVs**:
+  - Missing contact info is EXPECTED and should NOT be penalized
+  - Focus on content quality, not formatting issues that agency may have introduced
+- **For Direct Candidate CVs**:
+  - Missing contact information IS a valid concern
+  - Consistent date formats expected
+- For both: Focus on quality of work descriptions, clarity of achievements, and professional presentation of experience
+
+## Output Format
+
+Provide your analysis in EXACTLY this JSON format (no other text):
+```json
+{
+  "cv_source": "AGENCY" or "DIRECT",
+  "agency_name": "Name if agency CV, otherwise null",
+  "spelling_grammar": {"score": 0 or 1, "issues": ["list of significant issues only"]},
+  "factual_consistency": {"score": 0 or 1, "issues": ["list of factual/technical errors"]},
+  "layout_structure": {"score": 0 or 1, "issues": ["list of major structural issues only"]},
+  "attention_to_detail": {"score": 0 or 1, "issues": ["list of significant issues based on CV source"]},
+  "total_score": X,
+  "verdict": "PASS" or "FAIL",
+  "summary": "Brief 1-2 sentence summary"
+}
+```
+
+**SCORING RULES**:
+- Total score = sum of all four criteria (max 4)
+- PASS if total_score >= 3, otherwise FAIL
+- Be lenient on formatting/style issues - focus on SUBSTANCE
+- Technical inaccuracies and factual errors are more important than formatting
+- Agency CVs should be judged primarily on content quality, not presentation
+"""
+
+# Role Screening Prompt ("analysis" and "escalation" stages)
+SCREENING_PROMPT = """# Task
+
+Review the resume provided in the user message against the Guidance provided and basis that recommend if we should proceed with the first round of interview or not
+
+# Guidance
+
+The core problem to solve
+We are not hiring for an LLM engineer or ML researcher.
+We are hiring for a GenAI Product/Program Lead (Life Sciences) who can translate pharma use-cases into build-ready requirements, run delivery with engineering, and drive quality + adoption in regulated workflows.
+Think: "AI Transformation PM / AI Product Ops / GenAI Delivery Lead" — not "Software Engineer" or "Data Scientist".
+________________________________________
+Role archetype
+•    Senior Associate – GenAI Productization & Delivery (Life Sciences)
+•    GenAI Implementation Lead – Life Sciences Platforms
+•    AI Transformation Program Manager – Pharma
+Avoid: "GenAI Engineer", "ML Engineer", "Data Scientist" (these attract the wrong pipeline).
+________________________________________
+What success looks like:
+This person should be able to:
+1.    Take a client problem statement → convert it into workflow + prompt/eval requirements
+2.    Coordinate with Engineering to ship it → without writing core code themselves
+3.    Define "good" → quality rubric, evaluation plan, traceability, feedback loop
+4.    Drive adoption → training, governance, metrics, iterations
+________________________________________
+Must-have skills (non-negotiable)
+1) GenAI implementation literacy (not research)
+•    Prompting patterns, RAG basics, citations/traceability
+•    Eval concepts (LLM-as-judge basics, rubrics, test cases, regression mindset)
+•    Ability to reason about hallucinations, grounding, failure modes
+2) Program/product execution
+•    Can run cross-functional delivery with Eng + SMEs + stakeholders
+•    Writes crisp PRDs / user stories / acceptance criteria
+•    Strong on dependency management, risks, timelines, stakeholder updates
+3) Regulated-domain comfort (life sciences preferred)
+•    Has worked in pharma / healthcare / medtech OR adjacent regulated enterprise workflows
+•    Understands why "accuracy, traceability, and reviewability" matter
+4) Communication and structuring
+•    Can synthesize messy inputs into structured specs and decisions
+•    Can demo/communicate to business stakeholders confidently
+________________________________________
+Good-to-have skills (strong signals)
+•    Experience shipping workflow tools (authoring, review, compliance, PV, med info, regulatory)
+•    Exposure to document-heavy systems (PDF/Word extraction, templates, knowledge bases)
+•    Basic SQL / analytics for adoption metrics
+•    UX collaboration experience (wireframes, feedback loops)
+________________________________________
+What we do not need
+•    Not looking for LLM researchers, model trainers, or deep ML (PyTorch, Transformers training).
+•    Not looking for pure backend/frontend engineers as the primary fit.
+•    Not looking for Kaggle/academic ML profiles without enterprise delivery experience.
+(We already have engineering; we need the "glue" leader who makes GenAI real in production.)
+________________________________________
+Ideal background (what TAG can screen for)
+Education
+•    MBA + STEM, B.Pharm/Bio/Healthcare + MBA, Engineering + product/program experience — many combinations work.
+•    Degrees are less important than proof of shipping + stakeholder leadership.
+Experience
+•    4–8 years overall (for someone reporting to you; adjust as needed)
+•    Worked as one of:
+o    Product Manager (enterprise / workflow products)
+o    Program Manager (platform delivery)
+o    Solutions Consultant / Implementation Lead
+o    Digital transformation lead (healthcare/pharma)
+o    Analytics-to-product transition profiles who shipped tools
+Industries to source from:
+•    Life sciences services (Indegene-like)
+•    Health-tech (B2B)
+•    Enterprise SaaS implementation (especially regulated clients)
+•    Consulting (healthcare/tech transformation)
+________________________________________
+Sample JD snippet (TAG-ready, copy-paste)
+Role: GenAI Productization & Delivery Lead (Life Sciences)
+We're hiring someone to lead the translation of life sciences GenAI use-cases into production-ready workflows. This role partners with Engineering and domain SMEs to define requirements, run delivery, establish quality/evaluation standards, and drive adoption for GenAI capabilities in regulated, document-heavy environments.
+Must have: GenAI implementation literacy (prompting/RAG/evals), strong program/product execution, stakeholder management, and experience in healthcare/pharma or another regulated enterprise domain.
+Not required: Model training, deep ML research, advanced coding.
+________________________________________
+Screening keywords for TAG (send this list)
+Target keywords:
+GenAI implementation, AI transformation, productization, prompt engineering (applied), RAG, evaluation, LLM QA, workflow automation, enterprise SaaS, program management, product ops, solutions/implementation, regulated domain, life sciences, medtech, pharmacovigilance, medical writing, compliance, traceability.
+Reject / deprioritize keywords (unless paired with delivery experience):
+Pytorch, model training, fine-tuning LLMs, research publications, Kaggle grandmaster, computer vision research, "built transformer from scratch".
+________________________________________
+Quick scorecard TAG can use (simple)
+•    GenAI literacy (Applied) – 0/1
+•    Enterprise delivery (PRD / execution) – 0/1
+•    Stakeholder mgmt + communication – 0/1
+•    Regulated / healthcare familiarity – 0/1
+
+Hire pipeline: only shortlist candidates with 3/4+.
+
+# Output Format
+
+Return a single JSON object (the response schema is enforced) with:
+- "scorecard": one entry per criterion below, in this order, each with "criterion" (the name as written), "score" (0 or 1) and "evidence" (brief evidence from the resume)
+    1. GenAI literacy (Applied)
+    2. Enterprise delivery (PRD / execution)
+    3. Stakeholder mgmt + communication
+    4. Regulated / healthcare familiarity
+- "role_fit_score": the sum of the criterion scores (0-4)
+- "quality_penalty": the Quality Penalty provided with the candidate (0 or -1)
+- "final_score": role_fit_score plus quality_penalty
+- "verdict": "PROCEED TO INTERVIEW" or "DO NOT PROCEED" (candidates need a final score of 3/4+ to proceed; quality review FAIL results in -1 penalty)
+- "strengths": relevant strengths, one short point each
+- "concerns": concerns or missing qualifications, one short point each
+- "summary": 2-3 sentence summary of your recommendation
+"""
+
+# Business Analyst Screening Prompt ("analysis" and "escalation" stages)
+BA_SCREENING_PROMPT = """# Task
+
+Review the resume provided in the user message against the Guidance provided and basis that recommend if we should proceed with the first round of interview or not
+
+# Guidance
+
+The core problem to solve
+We are hiring for a Lead Business Analyst who can lead teams of analysts, drive client engagement, deliver data-driven consulting solutions, and bridge client business challenges with DT Consulting's solution suite in life sciences.
+Think: "Consulting BA Lead / Analytics Delivery Manager / Client Solutions Lead" — not "Data Engineer" or "Software Developer".
+________________________________________
+Role archetype
+•    Lead Business Analyst – DT Consulting
+•    Senior Consulting Analyst – Life Sciences
+•    Analytics & Insights Delivery Lead
+Avoid: "Data Engineer", "Software Developer", "ML Engineer" (these attract the wrong pipeline).
+________________________________________
+What success looks like:
+This person should be able to:
+1.    Lead and mentor teams of 5-10 analysts → define scopes, manage workflows, enforce quality
+2.    Lead client discussions → present insights, offer data-backed recommendations, strengthen relationships
+3.    Oversee complex data analysis → quantitative/qualitative research, dashboards, reporting frameworks
+4.    Drive strategic direction → digital transformation, CX initiatives, solution innovation
+________________________________________
+Must-have skills (non-negotiable)
+1) Team & Project Leadership
+•    Proven track record of leading analyst teams (5+ people)
+•    Experience defining project scopes, objectives, deliverables
+•    Workflow management, resource allocation, quality oversight
+•    Mentoring and developing junior analysts
+2) Client & Stakeholder Engagement
+•    Has led client-facing discussions and presentations
+•    Experience as liaison between offshore and onshore teams
+•    Can translate business problems into analytical approaches
+•    Strong executive communication skills
+3) Data Analysis & Analytics Expertise
+•    Advanced Excel modeling, SQL, and at least one BI tool (Power BI, Tableau)
+•    Experience with quantitative research and qualitative analysis
+•    Can design dashboards, reporting frameworks, and analytics solutions
+•    Python or equivalent scripting is a plus
+4) Consulting / Life Sciences Domain
+•    Experience in consulting, digital transformation, or professional services
+•    Life sciences / pharma / healthcare industry exposure preferred
+•    Understands regulated environments and compliance considerations
+________________________________________
+Good-to-have skills (strong signals)
+•    CX/UX strategy experience
+•    Process optimization and operational excellence
+•    Risk management frameworks
+•    Cross-border / global team collaboration
+•    Master's degree in Business, Data Science, or Analytics
+________________________________________
+What we do not need
+•    Not looking for pure software developers or data engineers as the primary fit.
+•    Not looking for junior analysts with no leadership experience.
+•    Not looking for academic researchers without client-facing delivery experience.
+•    Not looking for profiles with only operational/support roles and no analytical depth.
+(We already have engineering; we need analytical leaders who can drive consulting delivery.)
+________________________________________
+Ideal background
+Education
+•    MBA, M.S. in Analytics/Data Science, or Bachelor's in Business/STEM with strong consulting experience
+•    Degrees matter less than proof of leading teams + delivering client solutions
+Experience
+•    7+ years overall in business analysis, consulting, data analytics, or digital transformation
+•    Worked as one of:
+o    Lead/Senior Business Analyst
+o    Consulting Manager / Engagement Manager
+o    Analytics Lead / Insights Manager
+o    Digital transformation lead
+o    Solutions Consultant with analytics depth
+Industries to source from:
+•    Life sciences services (Indegene-like)
+•    Management consulting (Big 4, boutique)
+•    Health-tech / Pharma services
+•    Enterprise analytics / BI consulting
+________________________________________
+Screening keywords for TAG
+Target keywords:
+Business analysis, consulting, team leadership, client engagement, data analytics, Power BI, Tableau, SQL, Python, Excel modeling, digital transformation, CX/UX, life sciences, pharma, healthcare, project management, stakeholder management, dashboards, reporting, insights, quantitative research, qualitative analysis, offshore-onshore coordination.
+Reject / deprioritize keywords (unless paired with consulting/leadership experience):
+Pure coding, ML model training, DevOps, infrastructure, "built microservices", frontend development, Kaggle, academic research only.
+________________________________________
+Quick scorecard TAG can use (simple)
+•    Team & Project Leadership – 0/1
+•    Client/Stakeholder Engagement – 0/1
+•    Data Analysis & Analytics Expertise – 0/1
+•    Consulting / Life Sciences Domain – 0/1
+
+Hire pipeline: only shortlist candidates with 3/4+.
+
+# Output Format
+
+Return a single JSON object (the response schema is enforced) with:
+- "scorecard": one entry per criterion below, in this order, each with "criterion" (the name as written), "score" (0 or 1) and "evidence" (brief evidence from the resume)
+    1. Team & Project Leadership
+    2. Client/Stakeholder Engagement
+    3. Data Analysis & Analytics Expertise
+    4. Consulting / Life Sciences Domain
+- "role_fit_score": the sum of the criterion scores (0-4)
+- "quality_penalty": the Quality Penalty provided with the candidate (0 or -1)
+- "final_score": role_fit_score plus quality_penalty
+- "verdict": "PROCEED TO INTERVIEW" or "DO NOT PROCEED" (candidates need a final score of 3/4+ to proceed; quality review FAIL results in -1 penalty)
+- "strengths": relevant strengths, one short point each
+- "concerns": concerns or missing qualifications, one short point each
+- "summary": 2-3 sentence summary of your recommendation
+"""
+
+
+# Agentforce Engineer Screening Prompt ("analysis" and "escalation" stages)
+AGENTFORCE_SCREENING_PROMPT = """# Task
+
+Review the resume provided in the user message against the Guidance provided and basis that recommend if we should proceed with the first round of interview or not
+
+# Guidance
+
+The core problem to solve
+We are hiring for an Agentforce Engineer who can lead the technical delivery of Salesforce Agentforce AI solutions, design and build agentic implementations, integrate Data Cloud with diverse technologies, and manage technical teams across onshore and offshore.
+Think: "Salesforce AI Solutions Architect / Agentforce Technical Lead / Data Cloud Integration Engineer" — not "Generic Developer" or "Junior Salesforce Admin".
+________________________________________
+Role archetype
+•    Agentforce Engineer – Salesforce AI Solutions
+•    Salesforce AI & Data Cloud Technical Lead
+•    Agentforce Implementation Architect
+Avoid: "Junior Salesforce Admin", "Generic Full-Stack Developer", "Marketing Operations Analyst" (these attract the wrong pipeline).
+________________________________________
+What success looks like:
+This person should be able to:
+1.    Design and build AI agents in Agentforce → leveraging the full Salesforce technology stack
+2.    Lead Data Cloud integrations → data modeling, architecture, cross-product data mapping, connectors
+3.    Drive technical delivery → manage onshore/offshore teams, run PoCs, facilitate client workshops
+4.    Architect scalable solutions → across multiple Salesforce Clouds with security and performance best practices
+________________________________________
+Must-have skills (non-negotiable)
+1) Salesforce Ecosystem Expertise (3+ years)
+•    Deep hands-on experience with Salesforce Marketing Cloud (SFMC), Data Cloud (CDP), Agentforce, Experience Cloud
+•    Strong MarTech architecture knowledge: data modeling, profile unification, segmentation, audience management
+•    Automation & orchestration across SFMC and Data Cloud
+•    Configuring inbound and outbound data connectors
+2) Agentforce / AI Agent Development
+•    Hands-on experience developing AI agents in Agentforce or other agentic/AI platforms
+•    Understanding of agentic design patterns, prompt engineering, and AI solution architecture
+•    Ability to lead Agentic Proof of Concept (PoC) projects
+3) Salesforce Development & Integration
+•    Strong APEX and Lightning Web Components (LWC) development
+•    Integration patterns: REST/SOAP APIs, MuleSoft or equivalent middleware
+•    Salesforce security, identity, and access control best practices
+•    Designing scalable, high-performance solutions across multiple Salesforce Clouds
+4) Technical Leadership & Client Engagement
+•    Experience managing technical project teams (onshore and offshore)
+•    Facilitating workshops and engaging with clients on configuration vs. coding trade-offs
+•    Data profiling, data governance frameworks, and standardization protocols
+•    Proven ability to identify data gaps and propose implementation strategies
+________________________________________
+Good-to-have skills (strong signals)
+•    Prior experience in Pharma/Life Sciences sectors
+•    Custom API development for integrations between CDP and source systems
+•    Strong SQL and Python knowledge
+•    Exposure to cloud platforms (Snowflake, AWS) in marketing or data use cases
+•    Salesforce certifications (Administrator, Data Cloud Consultant, Agentforce Specialist)
+•    Experience integrating with AWS Pinpoint, Oracle Cloud, or similar platforms
+________________________________________
+What we do not need
+•    Not looking for junior Salesforce administrators with only point-and-click configuration experience.
+•    Not looking for generic full-stack developers with no Salesforce ecosystem expertise.
+•    Not looking for marketing operations analysts without technical depth.
+•    Not looking for pure data scientists or ML researchers without platform implementation experience.
+(We need someone who can architect and build Agentforce solutions end-to-end with deep Salesforce platform knowledge.)
+________________________________________
+Ideal background
+Education
+•    B.Tech/B.E. in Computer Science or related field, MCA, or equivalent technical degree
+•    Salesforce certifications are a strong signal (Administrator, Data Cloud Consultant, Agentforce Specialist)
+•    Degrees matter less than proof of building + delivering Salesforce AI solutions
+Experience
+•    6–8 years overall, with minimum 3+ years in the Salesforce ecosystem
+•    Worked as one of:
+o    Salesforce Technical Lead / Architect
+o    Agentforce / Data Cloud Implementation Lead
+o    Salesforce Solutions Engineer
+o    MarTech Platform Engineer (Salesforce-focused)
+o    CRM Technical Consultant with AI/Data Cloud focus
+Industries to source from:
+•    Salesforce consulting partners (Deloitte Digital, Accenture, Cognizant, etc.)
+•    Life sciences / pharma services with Salesforce implementations
+•    MarTech / CRM platform companies
+•    Enterprise SaaS with Salesforce integration depth
+________________________________________
+Screening keywords for TAG
+Target keywords:
+Agentforce, Data Cloud, CDP, Salesforce Marketing Cloud, SFMC, Experience Cloud, APEX, LWC, Lightning Web Components, MuleSoft, REST API, SOAP API, data modeling, profile unification, segmentation, audience management, AI agents, agentic, PoC, data connectors, data governance, Salesforce architecture, multi-cloud, integration patterns, onshore-offshore, technical delivery.
+Reject / deprioritize keywords (unless paired with Salesforce delivery experience):
+Junior admin, only Trailhead badges, no hands-on APEX, pure marketing ops, "configured reports only", no coding experience, academic AI research only.
+________________________________________
+Quick scorecard TAG can use (simple)
+•    Salesforce Ecosystem Expertise (SFMC/Data Cloud/Agentforce) – 0/1
+•    Agentforce / AI Agent Development – 0/1
+•    Salesforce Development & Integration (APEX/LWC/APIs) – 0/1
+•    Technical Leadership & Client Engagement – 0/1
+
+Hire pipeline: only shortlist candidates with 3/4+.
+
+# Output Format
+
+Return a single JSON object (the response schema is enforced) with:
+- "scorecard": one entry per criterion below, in this order, each with "criterion" (the name as written), "score" (0 or 1) and "evidence" (brief evidence from the resume)
+    1. Salesforce Ecosystem Expertise (SFMC/Data Cloud/Agentforce)
+    2. Agentforce / AI Agent Development
+    3. Salesforce Development & Integration (APEX/LWC/APIs)
+    4. Technical Leadership & Client Engagement
+- "role_fit_score": the sum of the criterion scores (0-4)
+- "quality_penalty": the Quality Penalty provided with the candidate (0 or -1)
+- "final_score": role_fit_score plus quality_penalty
+- "verdict": "PROCEED TO INTERVIEW" or "DO NOT PROCEED" (candidates need a final score of 3/4+ to proceed; quality review FAIL results in -1 penalty)
+- "strengths": relevant strengths, one short point each
+- "concerns": concerns or missing qualifications, one short point each
+- "summary": 2-3 sentence summary of your recommendation
+"""
+
+
+# Per-candidate part of a screening (user message). The role's screening
+# prompt above goes first as the system message and never varies between
+# candidates, so provider-side prompt caching covers it on every screening.
+CANDIDATE_PROMPT = """# Quality Review Result
+
+{quality_review}
+
+**Quality Penalty: {penalty}**
+
+# Resume
+
+{resume}
+"""
+
+
+# Resume Text Extraction Prompt ("extraction" stage) - used for pages without a usable text layer
+EXTRACTION_PROMPT = """Extract ALL text content from this resume image(s).
+
+IMPORTANT:
+- Extract text EXACTLY as written - preserve all details
+- Maintain the structure (sections, bullet points, etc.)
+- Include all dates, company names, job titles, skills, education details
+- Do not summarize or paraphrase - extract verbatim
+- If there are multiple pages, process them in order
+
+Output the complete resume text in a clean, readable format."""
+
+
+# Fused Quality Review + Transcription Prompt ("fused" stage) - one vision call instead of two
+FUSED_REVIEW_PROMPT = QUALITY_REVIEW_PROMPT + """
+## Transcription (in addition to the review)
+
+Each resume image is preceded by its page number. For every page listed under
+"Pages to transcribe" below, also extract ALL text on that page:
+- Extract text EXACTLY as written - preserve all details
+- Maintain the structure (sections, bullet points, etc.)
+- Include all dates, company names, job titles, skills, education details
+- Do not summarize or paraphrase - extract verbatim
+
+Return a single JSON object with two keys instead of the format above:
+- "quality_review": the quality review object described above
+- "resume_pages": one {"page_number", "text"} entry per page to transcribe
+"""
+
+QUALITY_CRITERION_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["score", "issues"],
+    "properties": {
+        "score": {"type": "integer", "enum": [0, 1]},
+        "issues": {"type": "array", "items": {"type": "string"}}
+    }
+}
+
+FUSED_RESPONSE_SCHEMA = {
+    "name": "resume_review_and_transcript",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["quality_review", "resume_pages"],
+        "properties": {
+            "quality_review": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": [
+                    "cv_source", "agency_name", "spelling_grammar", "factual_consistency",
+                    "layout_structure", "attention_to_detail", "total_score", "verdict", "summary"
+                ],
+                "properties": {
+                    "cv_source": {"type": "string", "enum": ["AGENCY", "DIRECT"]},
+                    "agency_name": {"type": ["string", "null"]},
+                    "spelling_grammar": QUALITY_CRITERION_SCHEMA,
+                    "factual_consistency": QUALITY_CRITERION_SCHEMA,
+                    "layout_structure": QUALITY_CRITERION_SCHEMA,
+                    "attention_to_detail": QUALITY_CRITERION_SCHEMA,
+                    "total_score": {"type": "integer"},
+                    "verdict": {"type": "string", "enum": ["PASS", "FAIL"]},
+                    "summary": {"type": "string"}
+                }
+            },
+            "resume_pages": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["page_number", "text"],
+                    "properties": {
+                        "page_number": {"type": "integer"},
+                        "text": {"type": "string"}
+                    }
+                }
+            }
+        }
+    }
+}
+
+# Criteria in every role's scorecard (the role fit score is out of this many)
+SCORECARD_SIZE = 4
+
+# Role-fit analysis (all roles) - the markdown report is rendered locally from it
+ANALYSIS_RESPONSE_SCHEMA = {
+    "name": "role_fit_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": [
+            "scorecard", "role_fit_score", "quality_penalty", "final_score", "verdict", "strengths", "concerns",
+            "summary"
+        ],
+        "properties": {
+            "scorecard": {
+                "type": "array",
+                "minItems": SCORECARD_SIZE,
+                "maxItems": SCORECARD_SIZE,
+                "items": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["criterion", "score", "evidence"],
+                    "properties": {
+                        "criterion": {"type": "string"},
+                        "score": {"type": "integer", "enum": [0, 1]},
+                        "evidence": {"type": "string"}
+                    }
+                }
+            },
+            "role_fit_score": {"type": "integer"},
+            "quality_penalty": {"type": "integer", "enum": [0, -1]},
+            "final_score": {"type": "integer"},
+            "verdict": {"type": "string", "enum": ["PROCEED TO INTERVIEW", "DO NOT PROCEED"]},
+            "strengths": {"type": "array", "items": {"type": "string"}},
+            "concerns": {"type": "array", "items": {"type": "string"}},
+            "summary": {"type": "string"}
+        }
+    }
+}
@@ -0,0 +1,196 @@
+"""Offline BM25 ranking of stored candidates against a role.
+
+When a role is added, the best past candidates for it are usually already
+in the candidate store (candidates.py), but analyzing every stored resume
+again would cost one model call each. Instead the role's screening prompt
+is turned into a weighted keyword query - its target keywords, plus the
+most frequent content words of its guidance - and the stored resume texts
+are ranked against it with BM25, entirely locally. Only the top of that
+shortlist is then screened by the model.
+
+Ranking takes two steps. First the store's FTS5 index retrieves a pool of
+the best matches for the unweighted query, each phrase listed once.
+Phrases too common to tell resumes apart are dropped from that query.
+Then the pool is re-scored in Python with weighted BM25, using the
+index's document counts. FTS5's own ``bm25()`` has no per-phrase weights.
+"""
+import math
+import re
+from collections import Counter
+
+from triage import REJECT_HEADER, keyword_variants, parse_keywords, tokenize
+
+# Candidates shortlisted unless asked for more
+DEFAULT_SHORTLIST_SIZE = 50
+
+# Sections of the guidance that describe who is *not* wanted, left out of the query
+SECTION_SEPARATOR = "________________________________________"
+EXCLUDED_SECTIONS = ("What we do not need",)
+
+# So are lines listing titles to avoid, and every "not ..." clause (to the end
+# of its line), e.g. the "Software Engineer" of "- not 'Software Engineer'"
+AVOID_LINE_PREFIX = "Avoid:"
+NOT_CLAUSE = re.compile(r"\bnot\b.*", re.IGNORECASE)
+
+# A target keyword counts this many times a guidance word does
+TARGET_KEYWORD_WEIGHT = 2
+
+# Most frequent guidance words added to the query; the rest add cost, not signal
+MAX_GUIDANCE_TERMS = 15
+
+# Phrases in more than this share of resumes are dropped from the query: BM25
+# floors their weight to (almost) zero, but FTS5 would still read their long
+# posting lists. These are mostly generic guidance words ("delivery", "data").
+MAX_PHRASE_DOC_RATIO = 0.5
+
+# Resumes retrieved by the unweighted FTS5 query per shortlisted candidate, re-scored with weights
+RERANK_POOL_FACTOR = 4
+
+# BM25 parameters, as FTS5's bm25() uses them
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words shorter than this are ignored (besides keywords such as "AI" or "QA")
+MIN_TERM_LENGTH = 3
+
+STOPWORDS = frozenset("""
+    a about above across after again against all also an and any are as at be because been before being below
+    between both but by can could did do does doing down during each either else etc even ever every few for from
+    further get had has have having he her here hers how however if in into is it its itself just least less like
+    made make many may me more most much must my no nor not now of off often on once one only or other our out over
+    own per rather same she should since so some such than that the their them then there these they this those
+    through to too under until up upon us use used very via was we well were what when where whether which while
+    who whom why will with within without would yet you your role roles work working strong good ability able
+    someone need needs want looking adjacent experience experienced years year including include includes
+    tag hiring keywords screening screen candidate candidates core problem solve sample snippet copy paste
+    required preferred ideal background skills signals lead run define drive
+""".split())
+
+
+def guidance_text(prompt):
+    """``(wanted, unwanted)`` text of a screening prompt's guidance.
+
+    Unwanted is what the guidance says isn't wanted: the "What we do not
+    need" section, the reject keywords, "Avoid:" lines and "not ..."
+    clauses. Wanted is the rest.
+    """
+    body = prompt.split("# Guidance", 1)[-1].split("# Output Format", 1)[0]
+    wanted, unwanted = [], []
+    for section in body.split(SECTION_SEPARATOR):
+        if section.strip().startswith(EXCLUDED_SECTIONS):
+            unwanted.append(section)
+            continue
+        section, _, reject = section.partition(REJECT_HEADER)
+        unwanted.append(reject)
+        for line in section.splitlines():
+            if line.strip().startswith(AVOID_LINE_PREFIX):
+                unwanted.append(line)
+                continue
+            clause = NOT_CLAUSE.search(line)
+            if clause:
+                unwanted.append(clause.group())
+                line = line[:clause.start()]
+            wanted.append(line)
+    return "\n".join(wanted), "\n".join(unwanted)
+
+
+def role_query(prompt):
+    """Weighted query terms for a role: ``{phrase (token tuple): weight}``.
+
+    Every variant of a target keyword gets TARGET_KEYWORD_WEIGHT; the
+    MAX_GUIDANCE_TERMS most frequent other content words of the wanted
+    guidance get 1. A word the unwanted guidance uses anywhere (see
+    ``guidance_text``) is left out, so e.g. "engineer" never ranks a
+    candidate up for a role that says to avoid engineers - unless it is
+    part of a target keyword.
+    """
+    target, _ = parse_keywords(prompt)
+    query = {}
+    for keyword in target:
+        for phrase in keyword_variants(keyword):
+            query[phrase] = TARGET_KEYWORD_WEIGHT
+
+    keyword_words = {word for phrase in query for word in phrase}
+    wanted, unwanted = guidance_text(prompt)
+    excluded = STOPWORDS | keyword_words | set(tokenize(unwanted))
+    words = Counter(
+        word for word in tokenize(wanted)
+        if len(word) >= MIN_TERM_LENGTH and word.isalpha() and word not in excluded
+    )
+    for word, _ in words.most_common(MAX_GUIDANCE_TERMS):
+        query[(word,)] = 1
+    return query
+
+
+def fts_phrase(phrase):
+    """FTS5 MATCH expression for one phrase (token tuple)."""
+    return '"' + " ".join(phrase).replace('"', '""') + '"'
+
+
+def fts_match_query(query):
+    """FTS5 MATCH expression for a ``role_query``: any phrase may match, each listed once."""
+    return " OR ".join(fts_phrase(phrase) for phrase in query)
+
+
+def prune_query(query, doc_counts, total_docs):
+    """``query`` without the phrases too common to rank by (see MAX_PHRASE_DOC_RATIO).
+
+    ``doc_counts`` maps each phrase to the number of resumes containing it.
+    """
+    return {
+        phrase: weight for phrase, weight in query.items()
+        if doc_counts.get(phrase, 0) <= total_docs * MAX_PHRASE_DOC_RATIO
+    }
+
+
+def phrase_count(tokens, phrase):
+    """Occurrences of ``phrase`` (token tuple) in ``tokens``."""
+    if len(phrase) == 1:
+        return tokens.count(phrase[0])
+    size = len(phrase)
+    return sum(
+        1 for i, token in enumerate(tokens)
+        if token == phrase[0] and tuple(tokens[i:i + size]) == phrase
+    )
+
+
+def bm25_score(query, tokens, doc_counts, total_docs, avg_length):
+    """Weighted BM25 score of one resume's ``tokens`` against a ``role_query``.
+
+    Each phrase's usual BM25 term is multiplied by its weight. IDF is
+    floored as in FTS5, so a phrase in over half the resumes scores near zero.
+    """
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / (avg_length or 1))
+    score = 0.0
+    for phrase, weight in query.items():
+        frequency = phrase_count(tokens, phrase)
+        if not frequency:
+            continue
+        docs = doc_counts.get(phrase, 0)
+        idf = max(math.log((total_docs - docs + 0.5) / (docs + 0.5)), 1e-6)
+        score += weight * idf * frequency * (BM25_K1 + 1) / (frequency + length_norm)
+    return score
+
+
+def shortlist(store, query, limit, role=None, unscreened_only=False):
+    """The ``limit`` resumes in a ``candidates.CandidateStore`` best matching a ``role_query``.
+
+    Returns ``CandidateStore.rank`` dicts, ``score`` replaced by the
+    weighted BM25 score, best first.
+    """
+    total_docs, total_tokens = store.index_totals()
+    if not total_docs:
+        return []
+    doc_counts = store.doc_counts(fts_phrase(phrase) for phrase in query)
+    doc_counts = {phrase: doc_counts[fts_phrase(phrase)] for phrase in query}
+    query = prune_query(query, doc_counts, total_docs)
+    if not query:
+        return []
+
+    candidates = store.rank(fts_match_query(query), limit * RERANK_POOL_FACTOR, role, unscreened_only,
+                            with_text=True)
+    for candidate in candidates:
+        candidate["score"] = bm25_score(query, tokenize(candidate.pop("resume_text")), doc_counts, total_docs,
+                                        total_tokens / total_docs)
+    candidates.sort(key=lambda candidate: candidate["score"], reverse=True)
+    return candidates[:limit]
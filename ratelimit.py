@@ -0,0 +1,224 @@
+"""Rate-limit-aware request execution shared by every model call.
+
+All chat-completion requests go through ``execute_request``, which
+
+- waits for room in a process-wide requests-per-minute and
+  tokens-per-minute budget, shared by every Streamlit session and worker
+  thread, so concurrent screenings don't stampede the API together;
+- retries transient failures (429, timeouts, connection errors, 5xx) with
+  exponential backoff and full jitter, honouring ``Retry-After`` headers;
+- fails fast on errors that retrying can't fix (bad request, auth,
+  exhausted quota).
+
+Budgets can be tuned with OPENAI_RPM_LIMIT and OPENAI_TPM_LIMIT.
+"""
+import email.utils
+import os
+import random
+import re
+import threading
+import time
+
+RPM_LIMIT = int(os.environ.get("OPENAI_RPM_LIMIT", "500"))
+TPM_LIMIT = int(os.environ.get("OPENAI_TPM_LIMIT", "800000"))
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+# Rough prompt-size estimate used to reserve TPM budget before a call
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 1000
+
+
+class FatalRequestError(Exception):
+    """A model request failed in a way retrying won't fix (or retries ran out)."""
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, plus a shared cooldown.
+
+    When any caller is told to back off by a 429, ``cooldown`` pauses every
+    caller until the server's retry-after has passed.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def reserve(self, tokens):
+        """Take budget for one request of ``tokens`` if available.
+
+        Returns 0 on success, otherwise the number of seconds to wait before
+        trying again. Requests larger than the whole TPM budget are let
+        through once the bucket is full rather than waiting forever.
+        """
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._cooldown_until:
+                return self._cooldown_until - now
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0
+            request_wait = max(0.0, (1 - self._requests) * 60 / self.requests_per_minute)
+            token_wait = max(0.0, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+            return max(request_wait, token_wait, 0.01)
+
+    def settle(self, reserved, actual):
+        """Correct the token bucket once the real usage of a request is known."""
+        with self._lock:
+            self._tokens = min(self.tokens_per_minute, self._tokens + reserved - actual)
+
+    def cooldown(self, seconds):
+        """Pause every caller for ``seconds`` (e.g. after a 429 with Retry-After)."""
+        with self._lock:
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + seconds)
+
+
+_limiter = RateLimiter(RPM_LIMIT, TPM_LIMIT)
+
+
+def estimate_request_tokens(messages, max_output_tokens=0):
+    """Rough token count for a chat request, used to reserve TPM budget."""
+    tokens = max_output_tokens
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            tokens += len(content) // CHARS_PER_TOKEN
+            continue
+        for part in content:
+            if part["type"] == "text":
+                tokens += len(part["text"]) // CHARS_PER_TOKEN
+            else:
+                tokens += TOKENS_PER_IMAGE
+    return tokens
+
+
+def retry_after_seconds(exc):
+    """Seconds the server asked us to wait, from the error's response headers."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            # Neither seconds nor an HTTP date: ignore it, the computed backoff applies
+            pass
+
+    # e.g. "6m0s", "1.5s", "250ms"
+    reset = headers.get("x-ratelimit-reset-requests") or headers.get("x-ratelimit-reset-tokens")
+    if reset:
+        match = re.fullmatch(r'(?:(\d+)m)?(?:([\d.]+)s)?(?:(\d+)ms)?', reset)
+        if match and any(match.groups()):
+            minutes, seconds, millis = match.groups()
+            return int(minutes or 0) * 60 + float(seconds or 0) + int(millis or 0) / 1000
+    return None
+
+
+def is_retryable(exc):
+    """Whether ``exc`` is a transient failure worth retrying."""
+    import openai
+
+    if isinstance(exc, openai.RateLimitError):
+        # An exhausted quota also comes back as a 429 but never recovers
+        return getattr(exc, "code", None) != "insufficient_quota"
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in (408, 409) or exc.status_code >= 500
+    return False
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Exponential backoff with full jitter, never shorter than ``retry_after``."""
+    delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage else None
+
+
+def _handle_failure(exc, attempt, limiter, stats):
+    """Decide what to do after a failed attempt; returns the backoff delay."""
+    import openai
+
+    if not is_retryable(exc):
+        raise FatalRequestError(str(exc)) from exc
+    if attempt == MAX_ATTEMPTS - 1:
+        raise FatalRequestError(f"Giving up after {MAX_ATTEMPTS} attempts: {exc}") from exc
+
+    retry_after = retry_after_seconds(exc)
+    if isinstance(exc, openai.RateLimitError):
+        # Everyone backs off, not just the caller that got the 429
+        limiter.cooldown(retry_after if retry_after is not None else backoff_delay(attempt))
+    delay = backoff_delay(attempt, retry_after)
+    if stats is not None:
+        stats["retries"] = stats.get("retries", 0) + 1
+        stats["backoff_seconds"] = stats.get("backoff_seconds", 0.0) + delay
+    return delay
+
+
+def execute_request(send, estimated_tokens, limiter=None, stats=None):
+    """Run ``send()`` under the shared budget, retrying transient failures.
+
+    ``send`` performs one API call and returns its response. ``stats``, if
+    given, is filled with ``attempts``, ``retries``, ``backoff_seconds`` and
+    ``throttle_seconds`` (time spent waiting for budget). Raises
+    FatalRequestError when the request can't succeed.
+    """
+    limiter = limiter or _limiter
+    for attempt in range(MAX_ATTEMPTS):
+        while True:
+            wait_seconds = limiter.reserve(estimated_tokens)
+            if not wait_seconds:
+                break
+            if stats is not None:
+                stats["throttle_seconds"] = stats.get("throttle_seconds", 0.0) + wait_seconds
+            time.sleep(wait_seconds)
+
+        if stats is not None:
+            stats["attempts"] = attempt + 1
+        try:
+            response = send()
+        except Exception as exc:
+            limiter.settle(estimated_tokens, 0)
+            time.sleep(_handle_failure(exc, attempt, limiter, stats))
+            continue
+
+        actual = _usage_tokens(response)
+        if actual is not None:
+            limiter.settle(estimated_tokens, actual)
+        return response
+
@@ -0,0 +1,1839 @@
+"""Resume screening pipeline, independent of any UI.
+
+Renders a PDF, reviews its quality, extracts its text and screens it
+against a role. Used by the Streamlit app (app.py) and the command-line
+batch screener (cli.py); nothing here imports Streamlit.
+"""
+import base64
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from budget import estimate_text_tokens, fit_text, plan_image_call, retry_output_cap, settle_budget, stage_budget
+from cache import hash_bytes, make_cache_key, prompt_version
+from clients import get_client
+from dedupe import minhash
+from prompts import (
+    AGENTFORCE_SCREENING_PROMPT,
+    ANALYSIS_RESPONSE_SCHEMA,
+    BA_SCREENING_PROMPT,
+    CANDIDATE_PROMPT,
+    EXTRACTION_PROMPT,
+    FUSED_RESPONSE_SCHEMA,
+    FUSED_REVIEW_PROMPT,
+    QUALITY_REVIEW_PROMPT,
+    SCORECARD_SIZE,
+    SCREENING_PROMPT
+)
+from metrics import ScreeningMetrics, usage_counts
+from ratelimit import FatalRequestError, estimate_request_tokens, execute_request
+from ranking import DEFAULT_SHORTLIST_SIZE, role_query, shortlist
+from triage import RoleTriage
+
+logger = logging.getLogger(__name__)
+
+# Model configuration
+OPENAI_MODEL = "gpt-5.2"
+FAST_MODEL = "gpt-5-mini"
+
+# Model for each stage. The transcription, the 0/1 quality checklist and a
+# first-pass screen run on the fast model; a borderline or unparseable
+# first-pass analysis is redone on the "escalation" model. A role can
+# override any of these (see ``models`` in ROLES).
+STAGE_MODELS = {
+    "quality_review": FAST_MODEL,
+    "extraction": FAST_MODEL,
+    "fused": FAST_MODEL,
+    "analysis": FAST_MODEL,
+    "escalation": OPENAI_MODEL
+}
+
+# Reasoning models (the GPT-5 family, o-series) reject a non-default
+# temperature and are steered with ``reasoning_effort`` instead; other models
+# take a temperature and reject a reasoning effort. Matched by name prefix.
+REASONING_MODEL_PREFIXES = ("gpt-5", "o1", "o3", "o4")
+
+# Sampling temperature for vision calls on models that take one
+VISION_TEMPERATURE = 0.1
+
+
+# Prepared resumes (rendered, reviewed and extracted) kept in memory for reuse
+PREPARED_CACHE_ENTRIES = 64
+
+# Final score (out of 4) a candidate needs to proceed to interview
+PROCEED_MIN_SCORE = 3
+
+# Prepended to a first-pass report while it streams, since escalation may still change it
+PROVISIONAL_REPORT_NOTE = (
+    "> ⏳ **Provisional first pass** - a borderline result is re-checked on a larger model "
+    "before the final decision.\n\n"
+)
+
+# Default number of resumes screened at once in a batch
+DEFAULT_BATCH_CONCURRENCY = 4
+
+# Text-layer detection: pages below this density (or mostly unmappable glyphs)
+# are treated as scanned and sent to vision OCR
+TEXT_LAYER_MIN_CHARS_PER_SQ_INCH = 1.5
+TEXT_LAYER_MAX_GARBLED_RATIO = 0.1
+
+# Page image encoding profiles. "original" is the historical full-colour
+# 150 DPI PNG. On typical text-heavy CV pages an optimised grayscale PNG is
+# several times smaller than JPEG/WebP at readable quality, while scans and
+# photos compress better as JPEG - "auto" keeps whichever is smaller.
+IMAGE_PROFILES = {
+    "original": {
+        "dpi": 150, "format": "png", "quality": None, "grayscale": False,
+        "trim_margins": False, "skip_blank": False, "detail": None
+    },
+    # Layout-focused review - structure and obvious errors read fine at lower DPI
+    "quality_review": {
+        "dpi": 110, "format": "auto", "quality": 75, "grayscale": True,
+        "trim_margins": True, "skip_blank": True, "detail": "auto"
+    },
+    # Verbatim transcription needs crisp glyphs but not colour
+    "extraction": {
+        "dpi": 150, "format": "auto", "quality": 80, "grayscale": True,
+        "trim_margins": True, "skip_blank": True, "detail": "high"
+    },
+    "jpeg": {
+        "dpi": 150, "format": "jpeg", "quality": 70, "grayscale": True,
+        "trim_margins": True, "skip_blank": True, "detail": "high"
+    },
+    "webp": {
+        "dpi": 150, "format": "webp", "quality": 70, "grayscale": True,
+        "trim_margins": True, "skip_blank": True, "detail": "high"
+    }
+}
+STAGE_IMAGE_PROFILES = {
+    "quality_review": "quality_review",
+    "extraction": "extraction"
+}
+
+# MuPDF isn't thread-safe, so concurrent resumes take turns rendering
+FITZ_LOCK = threading.Lock()
+BLANK_PIXEL_THRESHOLD = 16  # ink level (0-255) below which a pixel counts as background
+TRIM_PADDING_INCHES = 0.15
+
+# Rendering limits per document: pages beyond MAX_RENDER_PAGES are not sent
+# (the outcome counts them in "truncated_pages"), and pages are rendered at a lower DPI (never below MIN_RENDER_DPI) when
+# needed to keep the document within MAX_DOCUMENT_PIXELS - about twenty A4
+# pages at 150 DPI.
+MAX_RENDER_PAGES = 20
+MAX_DOCUMENT_PIXELS = 45_000_000
+MIN_RENDER_DPI = 72
+
+# Send page images once for a combined quality review + transcription call
+# (only used when some pages need OCR). Can be overridden per call.
+FUSED_REVIEW_AND_EXTRACTION = False
+
+# Transcribe a fully scanned document as concurrent calls of this many pages
+# each, rather than one long call, so latency follows the slowest group.
+# Each group's transcript is cached by its pages' pixels (mixed documents are
+# always transcribed a page at a time). Can be overridden per call.
+PER_PAGE_EXTRACTION = True
+EXTRACTION_PAGES_PER_CALL = 1
+MAX_EXTRACTION_CONCURRENCY = 8
+
+# Result cache configuration
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results.sqlite3")
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_MAX_AGE_DAYS = 30
+
+# Near-duplicate index of screened resumes (see dedupe.py)
+DEFAULT_DEDUPE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "duplicates.sqlite3")
+
+# Background job queue (see jobs.py)
+DEFAULT_JOBS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs.sqlite3")
+
+# Searchable store of finished screenings (see candidates.py)
+DEFAULT_CANDIDATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "candidates.sqlite3")
+
+# Outcome fields filled by the front half, checkpointed together (see prepare_resume)
+PREPARE_FIELDS = ("pages", "text_layer_pages", "truncated_pages", "quality_data", "quality_warning", "payload", "resume_text", "models")
+
+# Quality data used when the review call fails outright
+DEFAULT_QUALITY_DATA = {"verdict": "PASS", "total_score": 4, "summary": "Review unavailable"}
+
+# Quality data used when the review response can't be parsed
+UNPARSED_QUALITY_DATA = {
+    "cv_source": "UNKNOWN",
+    "agency_name": None,
+    "total_score": 4,
+    "verdict": "PASS",
+    "summary": "Quality review parsing failed - defaulting to PASS",
+    "spelling_grammar": {"score": 1, "issues": []},
+    "factual_consistency": {"score": 1, "issues": []},
+    "layout_structure": {"score": 1, "issues": []},
+    "attention_to_detail": {"score": 1, "issues": []}
+}
+
+# Role configurations. ``triage_min_score`` is the keyword pre-triage score
+# (see triage.py) below which a batch can defer a resume without screening it.
+# An optional ``models`` dict overrides STAGE_MODELS for the role's analysis
+# ("analysis" and "escalation"); the front half is shared by every role, so
+# it always uses STAGE_MODELS.
+ROLES = {
+    "GenAI Delivery Lead": {
+        "title": "GenAI Productization & Delivery Lead (Life Sciences)",
+        "subtitle": "GenAI Productization & Delivery Lead (Life Sciences)",
+        "triage_min_score": 2
+    },
+    "Lead Business Analyst": {
+        "title": "Lead Business Analyst - DT Consulting (Life Sciences)",
+        "subtitle": "Lead Business Analyst - DT Consulting (Life Sciences)",
+        "triage_min_score": 3
+    },
+    "Agentforce Engineer": {
+        "title": "Agentforce Engineer - Salesforce AI Solutions",
+        "subtitle": "Agentforce Engineer - Salesforce AI Solutions",
+        "triage_min_score": 2
+    }
+}
+
+# Batch pre-triage modes: screen best keyword matches first, or also skip
+# resumes scoring below the role's triage_min_score
+TRIAGE_MODES = ["order", "defer"]
+
+# Keyword matchers compiled per role on first use
+_role_triage = {}
+
+# BM25 ranking queries (see ranking.py) built per role on first use
+_role_queries = {}
+
+
+def convert_pdf_to_images(pdf_bytes, profile=None, page_nums=None, max_pages=MAX_RENDER_PAGES,
+                          max_pixels=MAX_DOCUMENT_PIXELS):
+    """Convert PDF bytes to list of images with base64 encoding.
+
+    ``profile`` is one of IMAGE_PROFILES (default: the original full-colour
+    150 DPI PNG). ``page_nums`` limits rendering to those 1-based pages.
+    Each entry records the encoded size in ``bytes``. See
+    ``iter_page_images`` for ``max_pages`` and ``max_pixels``.
+    """
+    return list(iter_page_images(pdf_bytes, profile, page_nums, max_pages, max_pixels))
+
+
+def iter_page_images(pdf_bytes, profile=None, page_nums=None, max_pages=MAX_RENDER_PAGES,
+                     max_pixels=MAX_DOCUMENT_PIXELS):
+    """Render and encode pages one at a time, yielding each as soon as it is ready.
+
+    Only one page's pixmap and encoding buffers exist at any moment; they
+    are released before the page is yielded, so callers can start sending
+    early pages while later ones render. The MuPDF lock is only held while a
+    page is rasterised and its pixels copied out (see ``copy_pixmap``);
+    encoding runs outside it, so concurrent screenings don't queue behind
+    each other's PNG/JPEG compression. With the "auto" format the first
+    non-blank page picks the format for the rest of the document (see
+    ``encode_page``). At most ``max_pages`` pages are rendered, and each
+    page's DPI is lowered as needed to fit an equal ``max_pixels /
+    max_pages`` share, so the document stays within ``max_pixels`` (None
+    disables either limit). A page's DPI, and so its ``pixel_hash``, depends
+    only on the page itself.
+    """
+    import fitz  # PyMuPDF
+
+    options = dict(IMAGE_PROFILES["original"])
+    options.update(profile or {})
+    colorspace = fitz.csGRAY if options["grayscale"] else fitz.csRGB
+
+    with FITZ_LOCK:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        selected = [
+            (page_num, doc[page_num].rect.width / 72 * doc[page_num].rect.height / 72)
+            for page_num in range(doc.page_count)
+            if page_nums is None or page_num + 1 in page_nums
+        ]
+
+    if max_pages is not None and len(selected) > max_pages:
+        logger.warning("Rendering only the first %d of %d pages", max_pages, len(selected))
+        selected = selected[:max_pages]
+
+    page_budget = None
+    if max_pixels is not None and selected:
+        # A fixed share per page rather than a share of what earlier pages
+        # left over, so one page's DPI never depends on the others
+        page_budget = max_pixels / (max_pages or len(selected))
+
+    try:
+        for page_num, area in selected:
+            page_options = options
+            if page_budget is not None and area:
+                dpi = max(MIN_RENDER_DPI, min(options["dpi"], int((page_budget / area) ** 0.5)))
+                if dpi != options["dpi"]:
+                    page_options = dict(options, dpi=dpi)
+
+            with FITZ_LOCK:
+                pix = doc[page_num].get_pixmap(dpi=page_options["dpi"], colorspace=colorspace)
+                page = copy_pixmap(pix, page_options)
+                pix = None
+
+            image = encode_page(page, page_options)
+            page = None
+            if image is None:
+                continue
+            if options["format"] == "auto":
+                # Pages of one document are alike (all born-digital or all scanned)
+                options = dict(options, format=image['mime_type'].split("/")[1])
+            image['page_num'] = page_num + 1
+            yield image
+    finally:
+        with FITZ_LOCK:
+            doc.close()
+
+
+def copy_pixmap(pix, options):
+    """What ``encode_page`` needs from a rendered page, copied so the pixmap can be freed.
+
+    Called under FITZ_LOCK. Profiles that send MuPDF's own PNG unchanged get
+    ``(png bytes, width, height)``; the rest a PIL image of the pixels.
+    """
+    if options["format"] == "png" and not options["trim_margins"] and not options["skip_blank"]:
+        return pix.tobytes("png"), pix.width, pix.height
+
+    from PIL import Image
+
+    return Image.frombytes("L" if options["grayscale"] else "RGB", (pix.width, pix.height), pix.samples)
+
+
+def encode_page(page, options):
+    """Encode a page from ``copy_pixmap`` per the profile ``options``; safe to run without FITZ_LOCK.
+
+    The "auto" format encodes both PNG and JPEG and keeps the smaller;
+    ``iter_page_images`` then uses that format for the document's other
+    pages. Returns the image dict (base64 data, mime type, encoded size,
+    pixel size, detail, and ``pixel_hash`` - a hash of the page's pixels
+    that doesn't depend on the format chosen), or None for a blank page
+    when the profile skips those.
+    """
+    if isinstance(page, tuple):
+        image_format = "png"
+        img_data, width, height = page
+        pixel_hash = hash_bytes(img_data)
+    else:
+        from PIL import ImageOps
+
+        img = page
+
+        # Bounding box of anything darker than near-white
+        ink = ImageOps.invert(img.convert("L")).point(lambda p: 255 if p > BLANK_PIXEL_THRESHOLD else 0)
+        content_box = ink.getbbox()
+        if content_box is None and options["skip_blank"]:
+            return None
+
+        if content_box and options["trim_margins"]:
+            pad = int(options["dpi"] * TRIM_PADDING_INCHES)
+            left, top, right, bottom = content_box
+            img = img.crop((
+                max(left - pad, 0), max(top - pad, 0),
+                min(right + pad, img.width), min(bottom + pad, img.height)
+            ))
+        pixel_hash = hash_bytes(f"{img.mode} {img.width}x{img.height} ".encode("ascii") + img.tobytes())
+
+        # "auto" keeps whichever of PNG / JPEG comes out smaller - PNG wins
+        # on clean born-digital pages, JPEG on noisy scans and photos
+        candidates = ["png", "jpeg"] if options["format"] == "auto" else [options["format"]]
+        encoded = []
+        for image_format in candidates:
+            buffer = io.BytesIO()
+            save_options = {"optimize": True}
+            if options["quality"] and image_format != "png":
+                save_options["quality"] = options["quality"]
+            img.save(buffer, format=image_format.upper(), **save_options)
+            encoded.append((buffer.tell(), image_format, buffer))
+        _, image_format, buffer = min(encoded, key=lambda entry: entry[0])
+        img_data = buffer.getvalue()
+        width, height = img.size
+        del encoded, img
+
+    # Encode to base64
+    return {
+        'data': base64.b64encode(img_data).decode('utf-8'),
+        'mime_type': f"image/{image_format}",
+        'bytes': len(img_data),
+        'width': width,
+        'height': height,
+        'detail': options["detail"],
+        'pixel_hash': pixel_hash
+    }
+
+
+def compare_image_profiles(pdf_bytes, profiles=None):
+    """Report the upload size of a PDF under each image profile.
+
+    Returns ``{profile_name: {"pages": n, "bytes": total, "bytes_per_page": [...]}}``.
+    """
+    report = {}
+    for name in profiles or IMAGE_PROFILES:
+        images_data = convert_pdf_to_images(pdf_bytes, IMAGE_PROFILES[name])
+        report[name] = {
+            "pages": len(images_data),
+            "bytes": sum(img['bytes'] for img in images_data),
+            "bytes_per_page": [img['bytes'] for img in images_data]
+        }
+    return report
+
+
+def measure_extraction_accuracy(pdf_bytes, api_key, profiles=None):
+    """Score vision transcription under each image profile against the text layer.
+
+    Only pages with a usable text layer are used, since that text is the
+    ground truth. Returns ``{profile_name: {"bytes": total, "similarity": 0-1}}``
+    where similarity is a word-level difflib ratio. Makes one API call per
+    profile.
+    """
+    import difflib
+
+    text_pages = extract_text_layer(pdf_bytes)
+    page_nums = {page['page_num'] for page in text_pages if page['has_text_layer']}
+    reference = " ".join(page['text'] for page in text_pages if page['page_num'] in page_nums).split()
+
+    report = {}
+    for name in profiles or IMAGE_PROFILES:
+        images_data = convert_pdf_to_images(pdf_bytes, IMAGE_PROFILES[name], page_nums)
+        try:
+            transcript = call_openai_with_images(images_data, EXTRACTION_PROMPT, api_key) or ""
+        except FatalRequestError as e:
+            logger.warning("Transcription with profile %s failed: %s", name, e)
+            transcript = ""
+        report[name] = {
+            "bytes": sum(img['bytes'] for img in images_data),
+            "similarity": difflib.SequenceMatcher(None, reference, transcript.split(), autojunk=False).ratio()
+        }
+    return report
+
+
+def model_for(stage, selected_role=None):
+    """Model a stage runs on: the role's override, else STAGE_MODELS, else OPENAI_MODEL."""
+    overrides = ROLES.get(selected_role, {}).get("models", {}) if selected_role else {}
+    return overrides.get(stage) or STAGE_MODELS.get(stage, OPENAI_MODEL)
+
+
+def generation_params(stage, model):
+    """Request parameters steering ``model``'s output for ``stage`` - never both of them.
+
+    A reasoning model (REASONING_MODEL_PREFIXES) gets the stage's
+    ``reasoning_effort`` from STAGE_BUDGETS and no temperature; any other
+    model gets VISION_TEMPERATURE.
+    """
+    if model.startswith(REASONING_MODEL_PREFIXES):
+        reasoning_effort = stage_budget(stage).get("reasoning_effort")
+        return {"reasoning_effort": reasoning_effort} if reasoning_effort else {}
+    return {"temperature": VISION_TEMPERATURE}
+
+
+def call_openai_with_images(images_data, prompt, api_key, response_format=None, label_pages=False,
+                            metrics=None, stage=None, transcribed_pages=0):
+    """Call OpenAI with images for text extraction or quality review, on ``stage``'s model.
+
+    ``response_format`` is passed through (e.g. a JSON schema). With
+    ``label_pages`` each image is preceded by a "Page N:" marker so the model
+    can refer to pages by number. The call's latency, retries, upload size
+    and token usage are recorded under ``stage`` in ``metrics``. Raises
+    FatalRequestError if the request can't succeed.
+
+    The call is fitted into ``stage``'s token budget first (see budget.py):
+    the output is capped for ``transcribed_pages`` pages of transcript, and
+    an over-budget input is downscaled, truncated or split over several
+    calls whose responses are joined. A response cut off at the cap is
+    retried once with a larger cap; cut off again it is dropped, so the
+    call returns None as for any failed response. The budget record goes
+    to ``metrics``.
+    """
+    client = get_client(api_key)
+    model = model_for(stage)
+    images_data = list(images_data)
+    batches, budget = plan_image_call(stage, prompt, images_data, transcribed_pages=transcribed_pages)
+    if budget["action"]:
+        logger.warning("%s input over budget (%d pages, ~%d tokens): %s%s", stage or "Vision call", budget["pages"],
+                       budget["requested_input_tokens"], budget["action"],
+                       f", dropped pages {budget['pages_dropped']}" if budget["pages_dropped"] else "")
+
+    def send(batch):
+        content = [{"type": "text", "text": prompt}]
+
+        for img in batch:
+            if label_pages:
+                content.append({"type": "text", "text": f"Page {img['page_num']}:"})
+            image_url = {"url": f"data:{img['mime_type']};base64,{img['data']}"}
+            if img.get('detail'):
+                image_url["detail"] = img['detail']
+            content.append({
+                "type": "image_url",
+                "image_url": image_url
+            })
+
+        messages = [{"role": "user", "content": content}]
+
+        max_output_tokens = budget["max_output_tokens"]
+        retried = False
+        while True:
+            stats = {}
+            start = time.perf_counter()
+            response = execute_request(
+                lambda: client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_completion_tokens=max_output_tokens,
+                    **({"response_format": response_format} if response_format else {}),
+                    **generation_params(stage, model)
+                ),
+                budget["estimated_input_tokens"] + max_output_tokens,
+                stats=stats
+            )
+            prompt_tokens, completion_tokens, _ = usage_counts(response.usage)
+            settle_budget(budget, prompt_tokens, completion_tokens, response.choices[0].finish_reason)
+            if metrics is not None:
+                metrics.record_call(stage, model, response.usage, stats, batch, time.perf_counter() - start)
+            if response.choices[0].finish_reason != "length":
+                return response.choices[0].message.content
+
+            retry_cap = retry_output_cap(stage, max_output_tokens)
+            if retry_cap is None or retried:
+                logger.warning("%s response was cut off at the %d token output cap, dropping it",
+                               stage or "Vision call", max_output_tokens)
+                return None
+            logger.info("%s response was cut off at the %d token output cap, retrying with %d",
+                        stage or "Vision call", max_output_tokens, retry_cap)
+            budget["length_retries"] += 1
+            budget["max_output_tokens"] = max(budget["max_output_tokens"], retry_cap)
+            max_output_tokens = retry_cap
+            retried = True
+
+    responses = [send(batch) for batch in batches]
+    if metrics is not None:
+        metrics.record_budget(budget)
+    if len(responses) == 1:
+        return responses[0]
+    # Split transcription: a missing part fails the whole transcript, as a failed page would
+    return None if not all(responses) else "\n\n".join(responses)
+
+
+def extract_text_layer(pdf_bytes):
+    """Pull the embedded text layer from each page of the PDF.
+
+    Text is taken block by block in the order the PDF stores it, which for
+    born-digital CVs is the reading order. A page counts as having a usable
+    text layer when its character density clears
+    TEXT_LAYER_MIN_CHARS_PER_SQ_INCH and the text isn't mostly unmappable
+    glyphs; anything else (scans, image-only pages) is left for vision OCR.
+    """
+    import fitz  # PyMuPDF
+
+    pages = []
+
+    with FITZ_LOCK:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        page_blocks = [(page.rect, page.get_text("blocks", sort=False)) for page in doc]
+        doc.close()
+
+    for page_num, (rect, blocks) in enumerate(page_blocks):
+        text = "\n\n".join(block[4].strip() for block in blocks if block[6] == 0 and block[4].strip())
+
+        # Page area in square inches (PDF units are 1/72 inch)
+        area = (rect.width / 72) * (rect.height / 72)
+        char_count = len("".join(text.split()))
+        density = char_count / area if area else 0
+        garbled = char_count and text.count("\ufffd") / char_count > TEXT_LAYER_MAX_GARBLED_RATIO
+
+        pages.append({
+            'page_num': page_num + 1,
+            'text': text,
+            'has_text_layer': density >= TEXT_LAYER_MIN_CHARS_PER_SQ_INCH and not garbled
+        })
+
+    return pages
+
+
+def extract_resume_text(images_data, api_key, text_pages=None, metrics=None, cache=None, per_page=None):
+    """Extract text from the resume, using vision OCR only where needed.
+
+    When ``text_pages`` (from ``extract_text_layer``) is given, pages with a
+    usable text layer are taken as-is and only the remaining pages are sent
+    to the extraction model (``images_data`` then only needs to hold those pages). Without
+    it, every page image is transcribed as before. ``images_data`` may be a
+    generator (see ``iter_page_images``): each page group is sent as soon as
+    its pages have been rendered.
+
+    Image-only pages are transcribed concurrently and joined in page order:
+    a page at a time in a mixed document, and in groups of
+    EXTRACTION_PAGES_PER_CALL in a fully scanned one with ``per_page``
+    (default PER_PAGE_EXTRACTION; otherwise it goes in a single call). With
+    a ``cache`` each page group's transcript is cached by the hash of its
+    page images, so a resubmitted CV with one page changed only has that
+    page transcribed again.
+    """
+    def transcribe(images):
+        return call_openai_with_images(images, EXTRACTION_PROMPT, api_key, metrics=metrics, stage="extraction",
+                                       transcribed_pages=len(images))
+
+    if text_pages is None:
+        return transcribe(list(images_data))
+
+    ocr_page_nums = {page['page_num'] for page in text_pages if not page['has_text_layer']}
+    if not ocr_page_nums:
+        return "\n\n".join(page['text'] for page in text_pages)
+
+    if per_page is None:
+        per_page = PER_PAGE_EXTRACTION
+    ocr_images = (img for img in images_data if img['page_num'] in ocr_page_nums)
+    fully_scanned = len(ocr_page_nums) == len(text_pages)
+    if fully_scanned and not per_page:
+        # A single call keeps the whole document in context
+        return transcribe(list(ocr_images))
+
+    def transcribe_group(images):
+        cache_key = make_cache_key(
+            [img['pixel_hash'] for img in images], "extraction_page", model_for("extraction"),
+            prompt_version(EXTRACTION_PROMPT)
+        )
+        text = cache.get(cache_key, "extraction") if cache else None
+        if text is not None:
+            if metrics is not None:
+                metrics.record_cache_hit("extraction")
+            return text
+        text = transcribe(images)
+        if text and cache:
+            cache.set(cache_key, "extraction", text)
+        return text
+
+    # Groups are consecutive image-only pages, so their texts slot back into page order
+    group_size = EXTRACTION_PAGES_PER_CALL if fully_scanned else 1
+    futures = []
+    with ThreadPoolExecutor(max_workers=min(len(ocr_page_nums), MAX_EXTRACTION_CONCURRENCY)) as executor:
+        group = []
+        for img in ocr_images:
+            group.append(img)
+            if len(group) == group_size:
+                futures.append((group[0]['page_num'], executor.submit(transcribe_group, group)))
+                group = []
+        if group:
+            futures.append((group[0]['page_num'], executor.submit(transcribe_group, group)))
+        group_texts = [(page_num, future.result()) for page_num, future in futures]
+
+    if fully_scanned:
+        texts = [text for _, text in sorted(group_texts)]
+        return None if not all(texts) else "\n\n".join(texts)
+    return assemble_page_texts(text_pages, dict(group_texts))
+
+
+def assemble_page_texts(text_pages, ocr_texts):
+    """Join text-layer pages and OCR'd pages (``{page_num: text}``) in page order.
+
+    Returns None if any OCR'd page came back empty.
+    """
+    page_texts = []
+    for page in text_pages:
+        if page['page_num'] in ocr_texts:
+            if not ocr_texts[page['page_num']]:
+                return None
+            page_texts.append(ocr_texts[page['page_num']])
+        else:
+            page_texts.append(page['text'])
+
+    return "\n\n".join(page_texts)
+
+
+def perform_fused_review(images_data, api_key, ocr_page_nums, metrics=None):
+    """Quality review and transcription of ``ocr_page_nums`` in one vision call.
+
+    The response is schema-constrained JSON. Returns ``(quality_data,
+    {page_num: text})``, or None if the call failed or the response doesn't
+    validate - callers then fall back to the separate calls.
+    """
+    prompt = FUSED_REVIEW_PROMPT + "\n\nPages to transcribe: " + ", ".join(str(n) for n in sorted(ocr_page_nums))
+    images_data = list(images_data)
+    _, budget = plan_image_call("fused", prompt, images_data, transcribed_pages=len(ocr_page_nums))
+    if budget["action"]:
+        # One JSON response can't be split across calls - the separate calls can
+        logger.info("Fused review over budget (~%d tokens), using separate calls", budget["requested_input_tokens"])
+        if metrics is not None:
+            metrics.record_budget(budget)
+        return None
+    try:
+        response = call_openai_with_images(
+            images_data, prompt, api_key,
+            response_format={"type": "json_schema", "json_schema": FUSED_RESPONSE_SCHEMA},
+            label_pages=True,
+            metrics=metrics,
+            stage="fused",
+            transcribed_pages=len(ocr_page_nums)
+        )
+    except FatalRequestError as e:
+        logger.warning("Fused review failed, falling back to separate calls: %s", e)
+        return None
+    if not response:
+        return None
+
+    try:
+        fused = json.loads(response)
+        quality_data = fused["quality_review"]
+        for criterion in ['spelling_grammar', 'factual_consistency', 'layout_structure', 'attention_to_detail']:
+            if quality_data[criterion]["score"] not in (0, 1):
+                return None
+        if quality_data["verdict"] not in ("PASS", "FAIL"):
+            return None
+        ocr_texts = {page["page_number"]: page["text"] for page in fused["resume_pages"]}
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    if not ocr_page_nums.issubset(ocr_texts):
+        return None
+    return quality_data, {num: ocr_texts[num] for num in ocr_page_nums}
+
+
+def perform_quality_review(images_data, api_key, metrics=None):
+    """Perform quality review on resume images on the quality review model."""
+    return call_openai_with_images(images_data, QUALITY_REVIEW_PROMPT, api_key, metrics=metrics, stage="quality_review")
+
+
+def render_pages(render_pool, pdf_bytes, profile=None, page_nums=None, metrics=None):
+    """``convert_pdf_to_images``, run on ``render_pool`` (a process pool) when given."""
+    start = time.perf_counter()
+    if render_pool is None:
+        images_data = convert_pdf_to_images(pdf_bytes, profile, page_nums)
+    else:
+        images_data = render_pool.submit(convert_pdf_to_images, pdf_bytes, profile, page_nums).result()
+    if metrics is not None:
+        metrics.add_seconds("render", time.perf_counter() - start)
+    return images_data
+
+
+def stream_pages(render_pool, pdf_bytes, profile=None, page_nums=None, metrics=None):
+    """Like ``render_pages`` but yields pages as they are rendered (in this process).
+
+    With a ``render_pool`` the pages come back from the pool all at once.
+    """
+    if render_pool is not None:
+        yield from render_pages(render_pool, pdf_bytes, profile, page_nums, metrics)
+        return
+
+    pages = iter_page_images(pdf_bytes, profile, page_nums)
+    while True:
+        start = time.perf_counter()
+        image = next(pages, None)
+        if metrics is not None:
+            metrics.add_seconds("render", time.perf_counter() - start)
+        if image is None:
+            return
+        yield image
+
+
+def read_text_layer(render_pool, pdf_bytes, metrics=None):
+    """``extract_text_layer``, run on ``render_pool`` (a process pool) when given."""
+    start = time.perf_counter()
+    if render_pool is None:
+        text_pages = extract_text_layer(pdf_bytes)
+    else:
+        text_pages = render_pool.submit(extract_text_layer, pdf_bytes).result()
+    if metrics is not None:
+        metrics.add_seconds("render", time.perf_counter() - start)
+    return text_pages
+
+
+def review_and_extract(pdf_bytes, api_key, text_pages=None, cache=None, payload_log=None, fused=None,
+                       render_pool=None, metrics=None, models=None):
+    """Run the quality review and text extraction concurrently, through the cache.
+
+    Neither call depends on the other, so both start straight away. Each
+    stage renders pages with its own image profile, and only when it
+    actually needs the model: extraction renders just the pages without a
+    usable text layer. Returns ``(quality_data, quality_warning, resume_text,
+    extraction_error)`` where ``quality_warning`` is set when the default PASS
+    had to be used. Page images sent are appended to ``payload_log`` as
+    ``{"stage", "page_num", "bytes"}`` dicts, and the model each result came
+    from is set in ``models`` (``{stage: model}``; no "extraction" entry when
+    every page had a text layer).
+
+    With ``fused`` (default FUSED_REVIEW_AND_EXTRACTION) and pages needing
+    OCR, the page images go up once in a combined review + transcription
+    call; if that fails validation the separate calls run instead. Their
+    results are cached under the separate calls' keys, which a fused
+    screening also looks up when its own keys miss.
+
+    ``render_pool`` moves PDF rendering off this process (see cli.py) so
+    CPU-bound rendering doesn't serialise on the GIL and MuPDF lock.
+    Rendering, model calls and cache hits are recorded in ``metrics`` (a
+    ``ScreeningMetrics``).
+    """
+    if text_pages is None:
+        text_pages = read_text_layer(render_pool, pdf_bytes, metrics)
+    if fused is None:
+        fused = FUSED_REVIEW_AND_EXTRACTION
+    ocr_page_nums = {page['page_num'] for page in text_pages if not page['has_text_layer']}
+    fused = fused and bool(ocr_page_nums)
+
+    quality_profile = IMAGE_PROFILES[STAGE_IMAGE_PROFILES["quality_review"]]
+    extraction_profile = IMAGE_PROFILES[STAGE_IMAGE_PROFILES["extraction"]]
+
+    pdf_hash = hash_bytes(pdf_bytes)
+
+    def cache_keys(fused):
+        # A fused result comes from the fused model, and is cached under it
+        quality_key = make_cache_key(
+            pdf_hash, "quality_review", model_for("fused" if fused else "quality_review"),
+            prompt_version(QUALITY_REVIEW_PROMPT), quality_profile, fused and prompt_version(FUSED_REVIEW_PROMPT)
+        )
+        extraction_key = make_cache_key(
+            pdf_hash, "extraction", model_for("fused" if fused else "extraction"), prompt_version(EXTRACTION_PROMPT),
+            TEXT_LAYER_MIN_CHARS_PER_SQ_INCH, extraction_profile, fused and prompt_version(FUSED_REVIEW_PROMPT)
+        )
+        return quality_key, extraction_key
+
+    if models is None:
+        models = {}
+    quality_key, extraction_key = cache_keys(fused)
+    separate_quality_key, separate_extraction_key = cache_keys(False)
+    quality_data = resume_text = None
+    if cache:
+        # A fused screening also finds what an earlier fallback to the separate calls cached
+        quality_data = cache.get(quality_key, "quality_review")
+        if quality_data is None and fused:
+            quality_data = cache.get(separate_quality_key, "quality_review")
+            if quality_data is not None:
+                quality_key = separate_quality_key
+        resume_text = cache.get(extraction_key, "extraction")
+        if resume_text is None and fused:
+            resume_text = cache.get(separate_extraction_key, "extraction")
+            if resume_text is not None:
+                extraction_key = separate_extraction_key
+    models["quality_review"] = model_for("fused" if quality_key != separate_quality_key else "quality_review")
+    if ocr_page_nums:
+        models["extraction"] = model_for("fused" if extraction_key != separate_extraction_key else "extraction")
+    quality_warning = None
+    extraction_error = None
+    if metrics is not None:
+        if quality_data is not None:
+            metrics.record_cache_hit("quality_review")
+        if resume_text is not None:
+            metrics.record_cache_hit("extraction")
+
+    if quality_data is not None and resume_text is not None:
+        return quality_data, quality_warning, resume_text, extraction_error
+
+    def log_payload(stage, images_data):
+        if payload_log is not None:
+            payload_log.extend({"stage": stage, "page_num": img['page_num'], "bytes": img['bytes']} for img in images_data)
+        return images_data
+
+    if fused and quality_data is None and resume_text is None:
+        images_data = log_payload("fused", render_pages(render_pool, pdf_bytes, extraction_profile, metrics=metrics))
+        fused_result = perform_fused_review(images_data, api_key, ocr_page_nums, metrics)
+        if fused_result:
+            quality_data, ocr_texts = fused_result
+            resume_text = assemble_page_texts(text_pages, ocr_texts)
+            if cache:
+                cache.set(quality_key, "quality_review", quality_data)
+                if resume_text:
+                    cache.set(extraction_key, "extraction", resume_text)
+            return quality_data, quality_warning, resume_text, extraction_error
+
+    # Whatever is still missing comes from the separate calls, and is cached under their keys
+    if quality_data is None:
+        quality_key = separate_quality_key
+        models["quality_review"] = model_for("quality_review")
+    if resume_text is None:
+        extraction_key = separate_extraction_key
+        if ocr_page_nums:
+            models["extraction"] = model_for("extraction")
+
+    def run_quality_review():
+        images_data = log_payload("quality_review", render_pages(render_pool, pdf_bytes, quality_profile, metrics=metrics))
+        return perform_quality_review(images_data, api_key, metrics)
+
+    def run_extraction():
+        images_data = []
+        if ocr_page_nums:
+            # Streamed, so page-by-page OCR of a mixed document starts with the first rendered page
+            images_data = (
+                log_payload("extraction", [img])[0]
+                for img in stream_pages(render_pool, pdf_bytes, extraction_profile, ocr_page_nums, metrics)
+            )
+        return extract_resume_text(images_data, api_key, text_pages, metrics, cache)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        quality_future = None
+        extraction_future = None
+        if quality_data is None:
+            quality_future = executor.submit(run_quality_review)
+        if resume_text is None:
+            extraction_future = executor.submit(run_extraction)
+
+        if quality_future:
+            try:
+                quality_response = quality_future.result()
+                if quality_response:
+                    try:
+                        quality_data = load_quality_json(quality_response)
+                        if cache:
+                            cache.set(quality_key, "quality_review", quality_data)
+                    except Exception as e:
+                        quality_warning = f"Could not parse quality review response: {e}"
+                        quality_data = dict(UNPARSED_QUALITY_DATA)
+                else:
+                    quality_warning = "Quality review failed - proceeding with default PASS"
+                    quality_data = dict(DEFAULT_QUALITY_DATA)
+            except Exception as e:
+                quality_warning = f"Quality review error: {str(e)} - proceeding with default PASS"
+                quality_data = dict(DEFAULT_QUALITY_DATA)
+
+        if extraction_future:
+            try:
+                resume_text = extraction_future.result()
+                if resume_text and cache:
+                    cache.set(extraction_key, "extraction", resume_text)
+            except Exception as e:
+                extraction_error = e
+
+    return quality_data, quality_warning, resume_text, extraction_error
+
+
+def compare_fused_and_split(pdf_bytes, api_key):
+    """Run the fused and the two-call front half on one resume and compare them.
+
+    Bypasses the cache. Returns ``{"split": {...}, "fused": {...},
+    "agreement": {...}}`` with latency, upload size and outputs of each path
+    plus how closely their quality scores and transcripts agree.
+    """
+    import difflib
+
+    text_pages = extract_text_layer(pdf_bytes)
+    report = {}
+    outputs = {}
+    for name, fused in (("split", False), ("fused", True)):
+        payload_log = []
+        start = time.perf_counter()
+        quality_data, quality_warning, resume_text, extraction_error = review_and_extract(
+            pdf_bytes, api_key, text_pages, None, payload_log, fused
+        )
+        report[name] = {
+            "seconds": time.perf_counter() - start,
+            "model_calls": len({entry["stage"] for entry in payload_log}),
+            "images": len(payload_log),
+            "bytes": sum(entry["bytes"] for entry in payload_log),
+            "quality_verdict": quality_data.get("verdict"),
+            "quality_score": quality_data.get("total_score"),
+            "text_chars": len(resume_text or ""),
+            "problem": str(extraction_error) if extraction_error else quality_warning
+        }
+        outputs[name] = (quality_data, resume_text or "")
+
+    (split_quality, split_text), (fused_quality, fused_text) = outputs["split"], outputs["fused"]
+    criteria = ['spelling_grammar', 'factual_consistency', 'layout_structure', 'attention_to_detail']
+    report["agreement"] = {
+        "same_verdict": split_quality.get("verdict") == fused_quality.get("verdict"),
+        "criteria_matching": sum(
+            1 for c in criteria
+            if split_quality.get(c, {}).get("score") == fused_quality.get(c, {}).get("score")
+        ),
+        "text_similarity": difflib.SequenceMatcher(
+            None, split_text.split(), fused_text.split(), autojunk=False
+        ).ratio(),
+        "ocr_pages": sum(1 for page in text_pages if not page['has_text_layer'])
+    }
+    return report
+
+
+def load_quality_json(quality_response):
+    """Pull the quality review JSON out of the model response (raises if invalid)."""
+    # Extract JSON from response (it might be wrapped in markdown code blocks)
+    json_match = re.search(r'```json\s*(.*?)\s*```', quality_response, re.DOTALL)
+    if json_match:
+        json_str = json_match.group(1)
+    else:
+        # Try to find JSON directly
+        json_str = quality_response
+
+    # Clean up the string and parse
+    return json.loads(json_str.strip())
+
+
+def parse_quality_review(quality_response):
+    """Parse the quality review JSON response, defaulting to PASS if it can't be parsed."""
+    try:
+        return load_quality_json(quality_response)
+    except Exception as e:
+        logger.warning("Could not parse quality review response: %s", e)
+        return dict(UNPARSED_QUALITY_DATA)
+
+
+def get_screening_prompt(selected_role):
+    """Return the screening prompt for the selected role."""
+    if selected_role == "Lead Business Analyst":
+        return BA_SCREENING_PROMPT
+    elif selected_role == "Agentforce Engineer":
+        return AGENTFORCE_SCREENING_PROMPT
+    return SCREENING_PROMPT
+
+
+def cv_source_text(quality_data):
+    """"Agency CV (name)", "DIRECT", ... for the quality review's CV source."""
+    cv_source = quality_data.get('cv_source', 'UNKNOWN')
+    agency_name = quality_data.get('agency_name')
+    return f"Agency CV ({agency_name})" if cv_source == "AGENCY" and agency_name else cv_source
+
+
+def format_quality_summary(quality_data):
+    """Markdown summary of the quality review, as shown at the top of the report."""
+    return f"""**CV Source: {cv_source_text(quality_data)}**
+**Quality Verdict: {quality_data.get('verdict', 'PASS')}**
+- Spelling & Grammar: {quality_data.get('spelling_grammar', {}).get('score', 'N/A')}/1
+- Factual/Technical Consistency: {quality_data.get('factual_consistency', {}).get('score', 'N/A')}/1
+- Layout & Structure: {quality_data.get('layout_structure', {}).get('score', 'N/A')}/1
+- Attention to Detail: {quality_data.get('attention_to_detail', {}).get('score', 'N/A')}/1
+- Quality Score: {quality_data.get('total_score', 'N/A')}/4
+- Summary: {quality_data.get('summary', 'N/A')}"""
+
+
+def quality_penalty(quality_data):
+    """-1 when the quality review failed, else 0."""
+    return -1 if quality_data.get('verdict', 'PASS') == "FAIL" else 0
+
+
+def build_analysis_messages(resume_text, quality_data, selected_role):
+    """Build the chat messages for the role-fit analysis."""
+    quality_verdict = quality_data.get('verdict', 'PASS')
+
+    # Build quality review context for GPT
+    quality_review_context = f"""
+The resume has undergone a quality review with the following results:
+- CV Source: {cv_source_text(quality_data)}
+- Verdict: {quality_verdict}
+- Quality Score: {quality_data.get('total_score', 'N/A')}/4
+- Issues Found: {quality_data.get('summary', 'None noted')}
+
+{'IMPORTANT: Since quality review FAILED, apply a -1 penalty to the final score.' if quality_verdict == 'FAIL' else 'Quality review passed - no penalty applied.'}
+"""
+
+    candidate = CANDIDATE_PROMPT.format(
+        resume=resume_text,
+        quality_review=quality_review_context,
+        penalty=quality_penalty(quality_data)
+    )
+
+    # Static role guidance first, byte-identical for every candidate, so the
+    # provider's prompt cache serves it; everything per-candidate comes after
+    return [
+        {"role": "system", "content": get_screening_prompt(selected_role)},
+        {"role": "user", "content": candidate}
+    ]
+
+
+def normalize_analysis(analysis, quality_data):
+    """Make the scores in a structured analysis consistent with its scorecard.
+
+    A scorecard with more than SCORECARD_SIZE criteria is cut to the first
+    SCORECARD_SIZE; one with fewer can't be scored and raises ValueError,
+    as an unparseable response would. The role fit score is recounted from
+    the criterion scores, the penalty taken from ``quality_data`` and the
+    final score derived from both (never below 0). A PROCEED verdict below
+    PROCEED_MIN_SCORE becomes DO NOT PROCEED, as the scorecard rules require.
+    """
+    analysis = dict(analysis)
+    if len(analysis["scorecard"]) < SCORECARD_SIZE:
+        raise ValueError(f"Scorecard has {len(analysis['scorecard'])} criteria, expected {SCORECARD_SIZE}")
+    analysis["scorecard"] = analysis["scorecard"][:SCORECARD_SIZE]
+    analysis["role_fit_score"] = sum(item["score"] for item in analysis["scorecard"])
+    analysis["quality_penalty"] = quality_penalty(quality_data)
+    analysis["final_score"] = max(analysis["role_fit_score"] + analysis["quality_penalty"], 0)
+    if analysis["final_score"] < PROCEED_MIN_SCORE:
+        analysis["verdict"] = "DO NOT PROCEED"
+    return analysis
+
+
+def normalize_partial_analysis(partial, quality_data):
+    """A partial analysis (streamed so far) with only scores ``normalize_analysis`` would keep.
+
+    Until the model's verdict is complete the scores and verdict are left
+    out; then they are recomputed from the scorecard and ``quality_data``
+    as for the full analysis, so a streamed PROCEED can't turn into DO NOT
+    PROCEED when the stream ends.
+    """
+    if partial.get("verdict") in ("PROCEED TO INTERVIEW", "DO NOT PROCEED"):
+        try:
+            return normalize_analysis(partial, quality_data)
+        except (ValueError, KeyError, TypeError):
+            pass
+    return {
+        field: value for field, value in partial.items()
+        if field not in ("role_fit_score", "quality_penalty", "final_score", "verdict")
+    }
+
+
+def render_analysis(analysis, quality_data):
+    """Markdown report for a structured analysis, laid out as the reports always were.
+
+    Missing fields are skipped, so a partial analysis (while it streams in)
+    renders as far as it has got.
+    """
+    lines = ["## Resume Quality Review", format_quality_summary(quality_data or {}), ""]
+    if analysis.get("scorecard"):
+        lines += ["## Role Fit Scorecard", "| Criteria | Score | Evidence |", "|----------|-------|----------|"]
+        lines += [
+            f"| {item.get('criterion', '')} | {item.get('score', '')} | {item.get('evidence', '')} |"
+            for item in analysis["scorecard"] if isinstance(item, dict)
+        ]
+        lines.append("")
+    if analysis.get("final_score") is not None:
+        lines += [
+            f"**Role Fit Score: {analysis.get('role_fit_score')}/4**",
+            f"**Quality Penalty: {analysis.get('quality_penalty')}**",
+            f"**Final Score: {analysis['final_score']}/4**",
+            ""
+        ]
+    if analysis.get("verdict") in ("PROCEED TO INTERVIEW", "DO NOT PROCEED"):
+        lines += [
+            "## Verdict", f"**{analysis['verdict']}**", "",
+            "(Note: Candidates need final score of 3/4+ to proceed. Quality review FAIL results in -1 penalty.)", ""
+        ]
+    if analysis.get("strengths"):
+        lines += ["## Key Strengths"] + [f"- {point}" for point in analysis["strengths"]] + [""]
+    if analysis.get("concerns"):
+        lines += ["## Concerns / Gaps"] + [f"- {point}" for point in analysis["concerns"]] + [""]
+    if analysis.get("summary"):
+        lines += ["## Summary", analysis["summary"]]
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def load_partial_json(text):
+    """Best-effort parse of a JSON object cut off mid-stream, or None.
+
+    Open strings, arrays and objects are closed; a dangling key or
+    separator is dropped.
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            stack.append("]" if char == "[" else "}")
+        elif char in "]}" and stack:
+            stack.pop()
+
+    candidate = text[:-1] if escaped else text
+    if in_string:
+        candidate += '"'
+    closers = "".join(reversed(stack))
+    for attempt in (candidate, candidate.rstrip().rstrip(",:")):
+        try:
+            return json.loads(attempt + closers)
+        except ValueError:
+            pass
+    # A key with no value yet: drop it
+    trimmed = re.sub(r',?\s*"[^"]*"\s*:?\s*$', "", candidate.rstrip().rstrip(","))
+    try:
+        return json.loads(trimmed + closers)
+    except ValueError:
+        return None
+
+
+def budget_analysis_messages(resume_text, quality_data, selected_role):
+    """``build_analysis_messages`` fitted into the analysis token budget.
+
+    Returns ``(messages, budget)``; an over-long resume is truncated (see
+    ``budget.fit_text``).
+    """
+    fixed_tokens = sum(
+        estimate_text_tokens(message["content"]) for message in build_analysis_messages("", quality_data, selected_role)
+    )
+    resume_text, budget = fit_text("analysis", resume_text, fixed_tokens)
+    if budget["action"]:
+        logger.warning("Resume over the analysis budget, dropped its last %d characters", budget["chars_dropped"])
+    return build_analysis_messages(resume_text, quality_data, selected_role), budget
+
+
+def prompt_cache_routing(selected_role):
+    """Request options that route every screening for a role to the same prompt cache."""
+    return {"extra_body": {"prompt_cache_key": f"screening:{selected_role}"}}
+
+
+def get_role_triage(selected_role):
+    """Keyword pre-triage for ``selected_role``, compiled from its screening prompt once per process."""
+    role_triage = _role_triage.get(selected_role)
+    if role_triage is None:
+        role_triage = RoleTriage(get_screening_prompt(selected_role), ROLES[selected_role].get("triage_min_score"))
+        _role_triage[selected_role] = role_triage
+    return role_triage
+
+
+def triage_resume(text_pages, selected_role):
+    """Keyword relevance of a resume's text layer for ``selected_role`` (see ``RoleTriage.score``)."""
+    text = "\n\n".join(page['text'] for page in text_pages if page['has_text_layer'])
+    return get_role_triage(selected_role).score(text)
+
+
+def shortlist_stored_candidates(store, selected_role, limit=DEFAULT_SHORTLIST_SIZE, unscreened_only=True):
+    """Top ``limit`` resumes in a ``candidates.CandidateStore`` for ``selected_role``, ranked locally.
+
+    The query is built from the role's screening prompt and the resumes
+    ranked by weighted BM25 without any model call (see ``ranking.shortlist``);
+    see ``CandidateStore.rank`` for the result and ``unscreened_only``.
+    """
+    query = _role_queries.get(selected_role)
+    if query is None:
+        query = role_query(get_screening_prompt(selected_role))
+        _role_queries[selected_role] = query
+    return shortlist(store, query, limit, selected_role, unscreened_only)
+
+
+def analysis_cache_key(resume_text, quality_data, selected_role, model):
+    """Cache key for an analysis: extracted text, quality data, role, model and prompt version."""
+    return make_cache_key(
+        hash_bytes(resume_text.encode('utf-8')), "analysis", selected_role, model,
+        prompt_version(get_screening_prompt(selected_role)), prompt_version(CANDIDATE_PROMPT), quality_data
+    )
+
+
+def needs_escalation(analysis):
+    """Whether a first-pass analysis should be redone on the escalation model.
+
+    True for an analysis that couldn't be parsed (None), and for one whose
+    final score misses PROCEED_MIN_SCORE by a single point, with or without
+    a quality penalty - one criterion judged differently would flip the
+    verdict. A candidate already at the threshold proceeds to a human
+    interview anyway, so it isn't re-checked.
+    """
+    if analysis is None:
+        return True
+    return analysis["final_score"] == PROCEED_MIN_SCORE - 1
+
+
+def route_analysis(run, selected_role, on_escalate=None):
+    """Run an analysis on the role's first-pass model, escalating it when borderline.
+
+    ``run(model)`` performs one analysis and returns its normalized dict.
+    The first pass runs on the "analysis" model; if it can't be parsed or
+    ``needs_escalation``, ``on_escalate`` is called and the analysis is
+    redone on the "escalation" model. The result records the models that
+    produced it, in order, under ``models``. If the escalated call fails,
+    the first-pass result is kept (not escalated) and the error recorded
+    under ``escalation_error``.
+    """
+    first_model = model_for("analysis", selected_role)
+    escalation_model = model_for("escalation", selected_role)
+    if first_model == escalation_model:
+        return dict(run(first_model), models=[first_model])
+
+    try:
+        result = run(first_model)
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning("First-pass analysis on %s could not be parsed, escalating: %s", first_model, e)
+        result = None
+    if not needs_escalation(result):
+        return dict(result, models=[first_model])
+
+    if on_escalate:
+        on_escalate()
+    try:
+        escalated = run(escalation_model)
+    except Exception as e:
+        if result is None:
+            raise
+        logger.warning("Escalated analysis on %s failed, keeping the first pass: %s", escalation_model, e)
+        return dict(result, models=[first_model], escalation_error=str(e))
+    return dict(escalated, models=[first_model, escalation_model])
+
+
+def analyze_resume(resume_text: str, quality_data: dict, api_key: str, selected_role: str, cache=None,
+                   metrics=None) -> dict:
+    """Analyze a resume's fit for the role, with quality review context.
+
+    The first pass runs on the role's "analysis" model and borderline
+    results are escalated (see ``route_analysis``); each pass is a
+    ``run_analysis`` call.
+    """
+    return route_analysis(
+        lambda model: run_analysis(resume_text, quality_data, api_key, selected_role, model, cache, metrics),
+        selected_role
+    )
+
+
+def run_analysis(resume_text, quality_data, api_key, selected_role, model, cache=None, metrics=None):
+    """Send resume to ``model`` for analysis with quality review context.
+
+    The response is constrained to ANALYSIS_RESPONSE_SCHEMA and returned as
+    a dict, scores made consistent by ``normalize_analysis``; render it
+    with ``render_analysis``. With a ``cache``, the result is keyed on the extracted text, quality
+    data, role, model and prompt version, so a repeat screening is free.
+    The output is capped and an over-long resume truncated per the analysis
+    token budget (see budget.py). The call and its budget are recorded
+    under "analysis" in ``metrics``.
+    """
+    cache_key = analysis_cache_key(resume_text, quality_data, selected_role, model)
+    if cache:
+        cached = cache.get(cache_key, "analysis")
+        if cached is not None:
+            if metrics is not None:
+                metrics.record_cache_hit("analysis")
+            return cached
+
+    client = get_client(api_key)
+    messages, budget = budget_analysis_messages(resume_text, quality_data, selected_role)
+    stats = {}
+    start = time.perf_counter()
+    response = execute_request(
+        lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_completion_tokens=budget["max_output_tokens"],
+            response_format={"type": "json_schema", "json_schema": ANALYSIS_RESPONSE_SCHEMA},
+            **prompt_cache_routing(selected_role)
+        ),
+        estimate_request_tokens(messages, budget["max_output_tokens"]),
+        stats=stats
+    )
+    prompt_tokens, completion_tokens, _ = usage_counts(response.usage)
+    settle_budget(budget, prompt_tokens, completion_tokens, response.choices[0].finish_reason)
+    if metrics is not None:
+        metrics.record_call("analysis", model, response.usage, stats, seconds=time.perf_counter() - start)
+        metrics.record_budget(budget)
+
+    result = normalize_analysis(json.loads(response.choices[0].message.content), quality_data)
+    if cache:
+        cache.set(cache_key, "analysis", result)
+    return result
+
+
+def stream_analysis(resume_text, quality_data, api_key, selected_role, model, cache=None, metrics=None):
+    """Streaming variant of ``run_analysis`` - yields the JSON text as it is generated.
+
+    Parse the text so far with ``load_partial_json`` to render a partial
+    report. Failures before the first token go through the usual retry
+    layer. A cached analysis is yielded in one piece; a freshly streamed
+    one is cached once complete. Usage is requested in the final chunk so ``metrics`` gets
+    token counts too.
+    """
+    cache_key = analysis_cache_key(resume_text, quality_data, selected_role, model)
+    if cache:
+        cached = cache.get(cache_key, "analysis")
+        if cached is not None:
+            if metrics is not None:
+                metrics.record_cache_hit("analysis")
+            yield json.dumps(cached)
+            return
+
+    client = get_client(api_key)
+    messages, budget = budget_analysis_messages(resume_text, quality_data, selected_role)
+    stats = {}
+    start = time.perf_counter()
+    stream = execute_request(
+        lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_completion_tokens=budget["max_output_tokens"],
+            response_format={"type": "json_schema", "json_schema": ANALYSIS_RESPONSE_SCHEMA},
+            stream=True,
+            stream_options={"include_usage": True},
+            **prompt_cache_routing(selected_role)
+        ),
+        estimate_request_tokens(messages, budget["max_output_tokens"]),
+        stats=stats
+    )
+
+    parts = []
+    usage = None
+    finish_reason = None
+    for chunk in stream:
+        if chunk.usage:
+            usage = chunk.usage
+        if chunk.choices and chunk.choices[0].finish_reason:
+            finish_reason = chunk.choices[0].finish_reason
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+
+    prompt_tokens, completion_tokens, _ = usage_counts(usage)
+    settle_budget(budget, prompt_tokens, completion_tokens, finish_reason)
+    if metrics is not None:
+        metrics.record_call("analysis", model, usage, stats, seconds=time.perf_counter() - start)
+        metrics.record_budget(budget)
+
+    result = "".join(parts)
+    if result and finish_reason != "length" and cache:
+        cache.set(cache_key, "analysis", normalize_analysis(json.loads(result), quality_data))
+
+
+def parse_verdict(result):
+    """Extract the PROCEED TO INTERVIEW / DO NOT PROCEED verdict from a markdown report.
+
+    The parse_* helpers read reports rendered by ``render_analysis`` as well
+    as the free-form markdown reports stored before the analysis was
+    structured.
+    """
+    verdict_match = re.search(r'\*\*(PROCEED TO INTERVIEW|DO NOT PROCEED)\*\*', result or "")
+    return verdict_match.group(1) if verdict_match else None
+
+
+def parse_role_fit_score(result):
+    """Extract the role fit score (out of 4, before the quality penalty) from the analysis."""
+    score_match = re.search(r'\*\*Role Fit Score:\s*(\d+)/4\*\*', result or "")
+    return score_match.group(1) if score_match else None
+
+
+def parse_final_score(result):
+    """Extract the final score (out of 4) from the analysis."""
+    score_match = re.search(r'\*\*Final Score:\s*(\d+)/4\*\*', result or "")
+    return score_match.group(1) if score_match else None
+
+
+def prepared_cache_key(pdf_bytes, fused=None):
+    """Key for a prepared front half: the PDF, and the models, prompts and image profiles of its stages."""
+    if fused is None:
+        fused = FUSED_REVIEW_AND_EXTRACTION
+    return make_cache_key(
+        hash_bytes(pdf_bytes), "prepare", fused,
+        {stage: model_for(stage) for stage in ("quality_review", "extraction", "fused")},
+        prompt_version(QUALITY_REVIEW_PROMPT), prompt_version(EXTRACTION_PROMPT), prompt_version(FUSED_REVIEW_PROMPT),
+        {stage: IMAGE_PROFILES[profile] for stage, profile in STAGE_IMAGE_PROFILES.items()},
+        TEXT_LAYER_MIN_CHARS_PER_SQ_INCH
+    )
+
+
+def prepare_resume(outcome, pdf_bytes, api_key, report, cache=None, fused=None, render_pool=None, metrics=None,
+                   checkpoints=None, prepared=None):
+    """Role-independent front half of a screening: text layer, quality review, extraction.
+
+    Fills PREPARE_FIELDS in ``outcome`` and returns ``(resume_text,
+    quality_data)``. Raises if no text could be extracted. With
+    ``checkpoints`` (see ``jobs.JobCheckpoints``) a successful front half is
+    saved under "prepare" and reused instead of being run again.
+
+    ``prepared`` (a ``cache.MemoryCache``) keeps successful front halves in
+    memory by ``prepared_cache_key``, so screening the same upload again -
+    for another role, or after a rerun - skips rendering and the cache
+    lookups too. A reused front half uploads nothing, so its ``payload`` is
+    empty.
+    """
+    saved = checkpoints.get("prepare") if checkpoints is not None else None
+    if saved is not None:
+        report("Resuming from checkpoint")
+        outcome.update(saved)
+        return saved["resume_text"], saved["quality_data"]
+
+    prepared_key = prepared_cache_key(pdf_bytes, fused) if prepared is not None else None
+    saved = prepared.get(prepared_key, "prepare") if prepared is not None else None
+    if saved is not None:
+        report("Reusing prepared resume")
+        if metrics is not None:
+            metrics.record_cache_hit("render")
+        saved = dict(saved, payload=[])
+        outcome.update(saved)
+        if checkpoints is not None:
+            checkpoints.set("prepare", saved)
+        return saved["resume_text"], saved["quality_data"]
+
+    report("Reading PDF")
+    text_pages = read_text_layer(render_pool, pdf_bytes, metrics)
+    outcome["pages"] = len(text_pages)
+    outcome["text_layer_pages"] = sum(1 for page in text_pages if page['has_text_layer'])
+    outcome["truncated_pages"] = max(0, len(text_pages) - MAX_RENDER_PAGES)
+
+    report("Quality review + extraction")
+    payload_log = []
+    quality_data, quality_warning, resume_text, extraction_error = review_and_extract(
+        pdf_bytes, api_key, text_pages, cache, payload_log, fused=fused, render_pool=render_pool, metrics=metrics,
+        models=outcome["models"]
+    )
+    outcome["quality_data"] = quality_data
+    outcome["quality_warning"] = quality_warning
+    outcome["payload"] = payload_log
+    if extraction_error is not None:
+        raise extraction_error
+
+    if not resume_text:
+        raise RuntimeError("Failed to extract text from resume")
+    outcome["resume_text"] = resume_text
+    saved = {field: outcome[field] for field in PREPARE_FIELDS}
+    if checkpoints is not None:
+        checkpoints.set("prepare", saved)
+    if prepared is not None:
+        prepared.set(prepared_key, "prepare", saved)
+    return resume_text, quality_data
+
+
+def find_duplicate(dedupe, resume_text, selected_role, signature=None):
+    """Look ``resume_text`` up in the near-duplicate index.
+
+    Returns ``(duplicate_of, earlier_result)``: a JSON-friendly summary of
+    the matching earlier submission (or None) and its stored result for
+    ``selected_role`` (or None).
+    """
+    match = dedupe.find(resume_text, selected_role, signature)
+    if match is None:
+        return None, None
+    duplicate_of = {
+        "name": match["name"],
+        "similarity": match["similarity"],
+        "identical": match["identical"],
+        "screened_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(match["screened_at"]))
+    }
+    return duplicate_of, match["result"]
+
+
+def analysis_fields(analysis, quality_data):
+    """Outcome fields for a structured analysis (``analyze_resume``'s result).
+
+    A markdown string - a checkpoint written before the analysis was
+    structured - is parsed the old way.
+    """
+    if isinstance(analysis, str):
+        role_fit_score, final_score = parse_role_fit_score(analysis), parse_final_score(analysis)
+        return {
+            "analysis": analysis,
+            "analysis_data": None,
+            "verdict": parse_verdict(analysis),
+            "role_fit_score": int(role_fit_score) if role_fit_score is not None else None,
+            "final_score": int(final_score) if final_score is not None else None,
+            "analysis_models": None
+        }
+    return {
+        "analysis": render_analysis(analysis, quality_data),
+        "analysis_data": analysis,
+        "verdict": analysis["verdict"],
+        "role_fit_score": analysis["role_fit_score"],
+        "final_score": analysis["final_score"],
+        "analysis_models": analysis.get("models")
+    }
+
+
+def new_outcome(**fields):
+    """A ``screen_resume`` outcome with every field at its empty default, updated with ``fields``."""
+    outcome = {
+        "pages": 0,
+        "text_layer_pages": 0,
+        "truncated_pages": 0,
+        "quality_data": None,
+        "quality_warning": None,
+        "payload": [],
+        "resume_text": None,
+        "models": {},
+        "analysis": None,
+        "analysis_data": None,
+        "verdict": None,
+        "role_fit_score": None,
+        "final_score": None,
+        "analysis_models": None,
+        "duplicate_of": None,
+        "reused_duplicate": False,
+        "triage": None,
+        "deferred": False,
+        "error": None,
+        "metrics": None
+    }
+    outcome.update(fields)
+    return outcome
+
+
+def screen_resume(pdf_bytes, api_key, selected_role, on_stage=None, cache=None, fused=None, render_pool=None,
+                  metrics=None, dedupe=None, reuse_duplicates=False, name=None, checkpoints=None, on_partial=None,
+                  prepared=None):
+    """Run the full screening pipeline for one resume.
+
+    Safe to call from a worker thread. Errors are captured in the returned
+    dict so one bad CV does not abort the rest of a batch. Per-stage
+    instrumentation (see metrics.py) is returned under ``metrics``.
+
+    With a ``dedupe`` index (a ``dedupe.DuplicateIndex``) the extracted text
+    is checked against earlier submissions before the analysis call; a match
+    is reported under ``duplicate_of``, and with ``reuse_duplicates`` its
+    stored result for this role is returned instead of screening again
+    (``reused_duplicate``). Screened resumes are added to the index under
+    ``name``.
+
+    ``checkpoints`` (see ``jobs.JobCheckpoints``) saves the front half and
+    the analysis as they complete, so a rerun of an interrupted job picks
+    up from the last completed stage. With ``on_partial`` the analysis is
+    streamed and ``on_partial`` is called with the report so far.
+    ``prepared`` is passed to ``prepare_resume``.
+
+    The structured analysis is returned under ``analysis_data`` and its
+    markdown rendering under ``analysis``. ``models`` records the model of
+    each front-half stage and ``analysis_models`` the model(s) of the
+    analysis - two when a borderline first pass was escalated.
+    """
+    if metrics is None:
+        metrics = ScreeningMetrics(role=selected_role)
+
+    def report(stage):
+        if on_stage:
+            on_stage(stage)
+
+    outcome = new_outcome()
+
+    try:
+        resume_text, quality_data = prepare_resume(
+            outcome, pdf_bytes, api_key, report, cache, fused, render_pool, metrics, checkpoints, prepared
+        )
+
+        signature = None
+        if dedupe is not None:
+            signature = minhash(resume_text)
+            outcome["duplicate_of"], earlier = find_duplicate(dedupe, resume_text, selected_role, signature)
+            if reuse_duplicates and earlier:
+                outcome.update(earlier)
+                outcome["reused_duplicate"] = True
+                report("Done (duplicate)")
+                metrics.finish()
+                outcome["metrics"] = metrics.to_dict()
+                return outcome
+
+        report("Analyzing")
+        checkpoint_stage = f"analysis:{selected_role}"
+        result = checkpoints.get(checkpoint_stage) if checkpoints is not None else None
+        if result is None:
+            if on_partial is None:
+                result = analyze_resume(resume_text, quality_data, api_key, selected_role, cache, metrics)
+            else:
+                first_model = model_for("analysis", selected_role)
+                may_escalate = first_model != model_for("escalation", selected_role)
+
+                def stream(model):
+                    note = PROVISIONAL_REPORT_NOTE if may_escalate and model == first_model else ""
+                    text = ""
+                    for chunk in stream_analysis(resume_text, quality_data, api_key, selected_role, model, cache,
+                                                 metrics):
+                        text += chunk
+                        partial = load_partial_json(text)
+                        if partial:
+                            on_partial(note + render_analysis(normalize_partial_analysis(partial, quality_data),
+                                                              quality_data))
+                    return normalize_analysis(json.loads(text), quality_data)
+
+                result = route_analysis(stream, selected_role, lambda: report("Escalating borderline result"))
+            if checkpoints is not None:
+                checkpoints.set(checkpoint_stage, result)
+        outcome.update(analysis_fields(result, quality_data))
+        if dedupe is not None:
+            dedupe.add(resume_text, name, selected_role, {
+                "analysis": outcome["analysis"], "analysis_data": result,
+                "verdict": outcome["verdict"], "final_score": outcome["final_score"],
+                "analysis_models": outcome["analysis_models"]
+            }, signature)
+        report("Done")
+    except Exception as e:
+        outcome["error"] = str(e)
+        report("Failed")
+
+    metrics.finish()
+    outcome["metrics"] = metrics.to_dict()
+    return outcome
+
+
+def screen_resume_all_roles(pdf_bytes, api_key, roles=None, on_stage=None, cache=None, fused=None, render_pool=None,
+                            metrics=None, checkpoints=None, prepared=None):
+    """Screen one resume against several roles, sharing the front half.
+
+    Rendering, the quality review and extraction run once; the text-only
+    analysis then runs for every role in ``roles`` (default: all ROLES)
+    concurrently. Returns a ``new_outcome`` - its per-role fields left
+    empty - plus ``roles``: ``{role: {"analysis", "analysis_data", "verdict",
+    "role_fit_score", "final_score", "analysis_models", "error"}}``, in ``roles`` order. A failed analysis only
+    affects its own role. ``checkpoints`` and ``prepared`` work as in
+    ``screen_resume``, with one analysis checkpoint per role.
+    """
+    roles = list(roles or ROLES)
+    if metrics is None:
+        metrics = ScreeningMetrics(role="All roles")
+
+    def report(stage):
+        if on_stage:
+            on_stage(stage)
+
+    outcome = new_outcome(roles={})
+
+    def analyze_role(role):
+        try:
+            result = checkpoints.get(f"analysis:{role}") if checkpoints is not None else None
+            if result is None:
+                result = analyze_resume(resume_text, quality_data, api_key, role, cache, metrics)
+                if checkpoints is not None:
+                    checkpoints.set(f"analysis:{role}", result)
+        except Exception as e:
+            return {"analysis": None, "analysis_data": None, "verdict": None, "role_fit_score": None,
+                    "final_score": None, "analysis_models": None, "error": str(e)}
+        return dict(analysis_fields(result, quality_data), error=None)
+
+    try:
+        resume_text, quality_data = prepare_resume(
+            outcome, pdf_bytes, api_key, report, cache, fused, render_pool, metrics, checkpoints, prepared
+        )
+
+        report(f"Analyzing against {len(roles)} role(s)")
+        with ThreadPoolExecutor(max_workers=len(roles)) as executor:
+            outcome["roles"] = dict(zip(roles, executor.map(analyze_role, roles)))
+        report("Done")
+    except Exception as e:
+        outcome["error"] = str(e)
+        report("Failed")
+
+    metrics.finish()
+    outcome["metrics"] = metrics.to_dict()
+    return outcome
+
+
+def screen_stored_resume(resume_text, quality_data, api_key, selected_role, on_stage=None, cache=None, metrics=None,
+                         checkpoints=None):
+    """Screen an already extracted resume (e.g. from the candidate store): the analysis call only.
+
+    Returns a ``screen_resume`` outcome; ``checkpoints`` works as there.
+    """
+    if metrics is None:
+        metrics = ScreeningMetrics(role=selected_role)
+
+    def report(stage):
+        if on_stage:
+            on_stage(stage)
+
+    outcome = new_outcome(resume_text=resume_text, quality_data=quality_data)
+    try:
+        report("Analyzing")
+        checkpoint_stage = f"analysis:{selected_role}"
+        result = checkpoints.get(checkpoint_stage) if checkpoints is not None else None
+        if result is None:
+            result = analyze_resume(resume_text, quality_data, api_key, selected_role, cache, metrics)
+            if checkpoints is not None:
+                checkpoints.set(checkpoint_stage, result)
+        outcome.update(analysis_fields(result, quality_data))
+        report("Done")
+    except Exception as e:
+        outcome["error"] = str(e)
+        report("Failed")
+
+    metrics.finish()
+    outcome["metrics"] = metrics.to_dict()
+    return outcome
+
+
+def triage_batch(files, selected_role, triage, render_pool=None):
+    """Keyword pre-triage of a batch (see ``run_batch``).
+
+    Returns ``(order, triage_results, deferred)``: indexes into ``files`` in
+    the order to screen them, ``{index: triage_resume result}`` and the set
+    of indexes to defer (only with ``triage`` "defer").
+    """
+    order = list(range(len(files)))
+    triage_results = {}
+    deferred = set()
+    if not triage:
+        return order, triage_results, deferred
+
+    for i, (name, pdf) in enumerate(files):
+        try:
+            pdf_bytes = pdf() if callable(pdf) else pdf
+            triage_results[i] = triage_resume(read_text_layer(render_pool, pdf_bytes), selected_role)
+        except Exception as e:
+            # Unreadable files fail properly when screened
+            logger.warning("Could not triage %s: %s", name, e)
+    min_score = ROLES[selected_role].get("triage_min_score") or 0
+    order.sort(key=lambda i: -(triage_results[i]["score"] if triage_results.get(i, {}).get("score") is not None
+                               else min_score))
+    if triage == "defer":
+        deferred = {i for i, result in triage_results.items() if result["deferred"]}
+    return order, triage_results, deferred
+
+
+def run_batch(files, api_key, selected_role, max_concurrency, on_update=None, cache=None, fused=None,
+              render_pool=None, dedupe=None, reuse_duplicates=False, triage=None):
+    """Screen several resumes concurrently with a bounded worker pool.
+
+    ``files`` is a list of ``(name, pdf)`` tuples, where ``pdf`` is the PDF
+    bytes or a zero-argument callable returning them (so large batches only
+    hold the files currently being screened). ``on_update`` is called from
+    the calling thread with the current stage of every candidate and the
+    outcomes finished so far, so callers can report progress as work
+    completes. ``dedupe`` and ``reuse_duplicates`` are passed to
+    ``screen_resume``.
+
+    ``triage`` (one of TRIAGE_MODES) first scores every resume's text layer
+    against the role's keywords (``triage_resume``, stored under ``triage``).
+    "order" screens the best matches first; "defer" also skips resumes below
+    the role's ``triage_min_score``, returning them with ``deferred`` set.
+    Resumes without a text layer can't be scored and are never deferred.
+    Outcomes are returned in ``files`` order either way.
+    """
+    stages = {i: "Queued" for i in range(len(files))}
+    outcomes = {}
+    order, triage_results, deferred = triage_batch(files, selected_role, triage, render_pool)
+    for i in deferred:
+        stages[i] = "Deferred"
+        outcomes[i] = new_outcome(triage=triage_results[i], deferred=True)
+
+    def screen_one(index, pdf):
+        # dict item assignment is atomic, so workers can report without a lock
+        def report(stage):
+            stages[index] = stage
+
+        try:
+            pdf_bytes = pdf() if callable(pdf) else pdf
+        except Exception as e:
+            report("Failed")
+            return new_outcome(error=str(e), triage=triage_results.get(index))
+        outcome = screen_resume(
+            pdf_bytes, api_key, selected_role, report, cache, fused, render_pool,
+            ScreeningMetrics(resume=files[index][0], role=selected_role), dedupe, reuse_duplicates, files[index][0]
+        )
+        outcome["triage"] = triage_results.get(index)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        # The pool starts work in submission order, so best matches go first
+        futures = {executor.submit(screen_one, i, files[i][1]): i for i in order if i not in outcomes}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                outcomes[futures[future]] = future.result()
+            if on_update:
+                on_update(dict(stages), dict(outcomes))
+
+    if on_update and not futures:
+        # Everything was deferred - still report it
+        on_update(dict(stages), dict(outcomes))
+
+    return [outcomes[i] for i in range(len(files))]
+
+
+def run_job(job, api_key, checkpoints=None, on_stage=None, on_partial=None, cache=None, render_pool=None,
+            dedupe=None, prepared=None):
+    """Screen one job from the background queue (see jobs.py) and return its outcome.
+
+    ``job["kind"]`` is "single" (``screen_resume`` against ``job["role"]``),
+    "all_roles" (``screen_resume_all_roles``) or "stored"
+    (``screen_stored_resume``, with no PDF). ``job["options"]`` holds
+    ``fused``, ``dedupe`` / ``reuse_duplicates`` (single only; ``dedupe`` is
+    the index to use when enabled), ``roles`` (all roles only),
+    ``resume_text`` / ``quality_data`` (stored only) and a ``triage`` result
+    computed at submission, copied onto the outcome.
+    """
+    options = job["options"]
+    if job["kind"] == "stored":
+        return screen_stored_resume(
+            options["resume_text"], options.get("quality_data") or DEFAULT_QUALITY_DATA, api_key, job["role"],
+            on_stage, cache, ScreeningMetrics(resume=job["name"], role=job["role"]), checkpoints
+        )
+    if job["kind"] == "all_roles":
+        return screen_resume_all_roles(
+            job["pdf"], api_key, options.get("roles"), on_stage, cache, options.get("fused"), render_pool,
+            ScreeningMetrics(resume=job["name"], role="All roles"), checkpoints, prepared
+        )
+    outcome = screen_resume(
+        job["pdf"], api_key, job["role"], on_stage, cache, options.get("fused"), render_pool,
+        ScreeningMetrics(resume=job["name"], role=job["role"]), dedupe if options.get("dedupe") else None,
+        options.get("reuse_duplicates", False), job["name"], checkpoints, on_partial, prepared
+    )
+    outcome["triage"] = options.get("triage")
+    return outcome
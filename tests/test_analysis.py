@@ -0,0 +1,102 @@
+import pytest
+
+from prompts import SCORECARD_SIZE
+from screener import (
+    PROCEED_MIN_SCORE,
+    needs_escalation,
+    normalize_analysis,
+    normalize_partial_analysis,
+    parse_final_score,
+    parse_verdict,
+    render_analysis
+)
+
+PASSED = {"verdict": "PASS", "total_score": 4}
+FAILED = {"verdict": "FAIL", "total_score": 1}
+
+
+def make_analysis(scores, verdict="PROCEED TO INTERVIEW", final_score=4):
+    """An analysis as the model returns it, with its own (possibly wrong) totals."""
+    return {
+        "scorecard": [{"criterion": f"Criterion {i}", "score": score, "evidence": ""} for i, score in enumerate(scores)],
+        "role_fit_score": 4,
+        "quality_penalty": 0,
+        "final_score": final_score,
+        "verdict": verdict,
+        "strengths": [],
+        "concerns": []
+    }
+
+
+def test_normalize_analysis_recounts_scores_from_the_scorecard():
+    analysis = normalize_analysis(make_analysis([1, 1, 1, 0]), PASSED)
+    assert analysis["role_fit_score"] == 3
+    assert analysis["quality_penalty"] == 0
+    assert analysis["final_score"] == 3
+    assert analysis["verdict"] == "PROCEED TO INTERVIEW"
+
+
+def test_normalize_analysis_applies_quality_penalty_and_demotes_verdict():
+    analysis = normalize_analysis(make_analysis([1, 1, 1, 0]), FAILED)
+    assert analysis["quality_penalty"] == -1
+    assert analysis["final_score"] == PROCEED_MIN_SCORE - 1
+    assert analysis["verdict"] == "DO NOT PROCEED"
+
+
+def test_normalize_analysis_never_goes_below_zero():
+    assert normalize_analysis(make_analysis([0, 0, 0, 0]), FAILED)["final_score"] == 0
+
+
+def test_normalize_analysis_cuts_extra_criteria():
+    analysis = normalize_analysis(make_analysis([1, 1, 1, 1, 1]), PASSED)
+    assert len(analysis["scorecard"]) == SCORECARD_SIZE
+    assert analysis["final_score"] == 4
+
+
+def test_normalize_analysis_rejects_short_scorecard():
+    with pytest.raises(ValueError):
+        normalize_analysis(make_analysis([1, 1]), PASSED)
+
+
+def test_normalize_analysis_leaves_input_unchanged():
+    original = make_analysis([0, 0, 0, 0])
+    normalize_analysis(original, PASSED)
+    assert original["final_score"] == 4
+    assert original["verdict"] == "PROCEED TO INTERVIEW"
+
+
+@pytest.mark.parametrize("scores, quality_data, expected", [
+    ([1, 1, 0, 0], PASSED, True),
+    ([1, 1, 1, 0], FAILED, True),
+    ([1, 1, 1, 0], PASSED, False),
+    ([1, 1, 1, 1], FAILED, False),
+    ([1, 0, 0, 0], PASSED, False),
+    ([1, 1, 0, 0], FAILED, False),
+])
+def test_needs_escalation_only_one_below_the_threshold(scores, quality_data, expected):
+    assert needs_escalation(normalize_analysis(make_analysis(scores), quality_data)) is expected
+
+
+def test_needs_escalation_for_unparseable_analysis():
+    assert needs_escalation(None)
+
+
+def test_partial_analysis_hides_scores_until_verdict_is_complete():
+    partial = make_analysis([1, 1, 1, 1], verdict="PROCEED TO")
+    shown = normalize_partial_analysis(partial, PASSED)
+    for field in ("role_fit_score", "quality_penalty", "final_score", "verdict"):
+        assert field not in shown
+    assert shown["scorecard"] == partial["scorecard"]
+
+
+def test_partial_analysis_hides_scores_for_incomplete_scorecard():
+    shown = normalize_partial_analysis(make_analysis([1, 1]), PASSED)
+    assert "verdict" not in shown
+    assert "final_score" not in shown
+
+
+def test_partial_analysis_is_normalized_once_complete():
+    partial = make_analysis([1, 1, 1, 0], final_score=3)
+    report = render_analysis(normalize_partial_analysis(partial, FAILED), FAILED)
+    assert parse_verdict(report) == "DO NOT PROCEED"
+    assert parse_final_score(report) == str(PROCEED_MIN_SCORE - 1)
@@ -0,0 +1,100 @@
+import pytest
+
+import cache
+from cache import EXPIRY_INTERVAL, MemoryCache, ResultCache
+
+# JSON-encodes to exactly 100 bytes
+VALUE = "x" * 98
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A fake ``time.time`` for the cache module, advanced by hand."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "results.sqlite3")
+
+
+def stored_size(result_cache):
+    return result_cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def test_evicts_least_recently_used_over_max_bytes(path, clock):
+    result_cache = ResultCache(path, max_bytes=250)
+    for key in ("a", "b"):
+        result_cache.set(key, "stage", VALUE)
+        clock[0] += 1
+    # Reading "a" makes "b" the least recently used
+    assert result_cache.get("a", "stage") == VALUE
+    clock[0] += 1
+    result_cache.set("c", "stage", VALUE)
+
+    assert result_cache.get("b", "stage") is None
+    assert result_cache.get("a", "stage") == VALUE
+    assert result_cache.get("c", "stage") == VALUE
+    assert result_cache.stats()["bytes"] == 200
+
+
+def test_total_size_tracks_replaced_entries(path, clock):
+    result_cache = ResultCache(path)
+    result_cache.set("a", "stage", VALUE)
+    result_cache.set("a", "stage", "y")
+    result_cache.set("b", "stage", VALUE)
+    assert result_cache.stats()["bytes"] == stored_size(result_cache) == 103
+    assert result_cache.stats()["entries"] == 2
+
+
+def test_total_size_persists_across_instances(path, clock):
+    ResultCache(path).set("a", "stage", VALUE)
+    assert ResultCache(path).stats()["bytes"] == 100
+
+
+def test_expired_entries_are_misses_and_purged(path, clock):
+    result_cache = ResultCache(path, max_age_seconds=60)
+    result_cache.set("a", "stage", VALUE)
+    clock[0] += 61
+    assert result_cache.get("a", "stage") is None
+
+    clock[0] += EXPIRY_INTERVAL
+    result_cache.evict()
+    assert result_cache.stats()["entries"] == 0
+    assert result_cache.stats()["bytes"] == 0
+
+
+def test_expiry_pass_recounts_drifted_total(path, clock):
+    result_cache = ResultCache(path)
+    result_cache.set("a", "stage", VALUE)
+    result_cache._conn.execute("UPDATE meta SET value = 12345 WHERE key = 'total_size'")
+    result_cache._conn.commit()
+
+    clock[0] += EXPIRY_INTERVAL
+    result_cache.evict()
+    assert result_cache.stats()["bytes"] == 100
+
+
+def test_hits_and_misses_are_counted_per_stage(path, clock):
+    result_cache = ResultCache(path)
+    result_cache.set("a", "analysis", VALUE)
+    result_cache.get("a", "analysis")
+    result_cache.get("b", "extraction")
+    stats = result_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hits_by_stage"] == {"analysis": 1}
+    assert stats["misses_by_stage"] == {"extraction": 1}
+
+
+def test_memory_cache_drops_least_recently_used():
+    memory_cache = MemoryCache(max_entries=2)
+    memory_cache.set("a", "prepare", 1)
+    memory_cache.set("b", "prepare", 2)
+    assert memory_cache.get("a", "prepare") == 1
+    memory_cache.set("c", "prepare", 3)
+
+    assert memory_cache.get("b", "prepare") is None
+    assert memory_cache.get("a", "prepare") == 1
+    assert memory_cache.stats()["entries"] == 2
@@ -0,0 +1,133 @@
+import time
+
+import pytest
+
+from jobs import DONE, FAILED, MAX_JOB_ATTEMPTS, QUEUED, RUNNING, JobQueue
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def expire_lease(queue, job_id):
+    """Age a running job's heartbeat past the lease."""
+    queue._conn.execute(
+        "UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - queue.lease_seconds - 1, job_id)
+    )
+    queue._conn.commit()
+
+
+def test_claim_takes_interactive_jobs_before_older_batch_jobs(path):
+    queue = JobQueue(path)
+    batch_job = queue.submit("single", "a.pdf", b"%PDF", batch_id="b1")
+    single_job = queue.submit("single", "b.pdf", b"%PDF")
+
+    job = queue.claim()
+    assert job["id"] == single_job
+    assert job["pdf"] == b"%PDF"
+    assert job["status"] == RUNNING
+    assert job["owner"] == queue.owner
+    assert queue.claim()["id"] == batch_job
+    assert queue.claim() is None
+
+
+def test_claim_interactive_only_skips_batch_jobs(path):
+    queue = JobQueue(path)
+    queue.submit("single", "a.pdf", b"%PDF", batch_id="b1")
+    assert queue.claim(interactive_only=True) is None
+    assert queue.claim() is not None
+
+
+def test_claim_respects_batch_max_running(path):
+    queue = JobQueue(path)
+    ids = [queue.submit("single", f"{i}.pdf", b"%PDF", batch_id="b1", position=i, max_running=2) for i in range(3)]
+
+    assert [queue.claim()["id"], queue.claim()["id"]] == ids[:2]
+    assert queue.claim() is None
+    queue.finish(ids[0], {"verdict": "PROCEED"})
+    assert queue.claim()["id"] == ids[2]
+
+
+def test_claim_only_considers_given_job_ids(path):
+    queue = JobQueue(path)
+    first = queue.submit("single", "a.pdf", b"%PDF")
+    second = queue.submit("single", "b.pdf", b"%PDF")
+    assert queue.claim(job_ids=[]) is None
+    assert queue.claim(job_ids=[second])["id"] == second
+    assert queue.get(first)["status"] == QUEUED
+
+
+def test_owner_is_unique_per_queue_in_one_process(path):
+    assert JobQueue(path).owner != JobQueue(path).owner
+
+
+def test_recover_leaves_jobs_with_a_live_lease(path):
+    worker = JobQueue(path)
+    job_id = worker.submit("single", "a.pdf", b"%PDF")
+    worker.claim()
+
+    assert JobQueue(path).recover() == 0
+    assert worker.get(job_id)["status"] == RUNNING
+
+
+def test_recover_requeues_jobs_with_an_expired_lease(path):
+    worker = JobQueue(path)
+    job_id = worker.submit("single", "a.pdf", b"%PDF")
+    worker.claim()
+    expire_lease(worker, job_id)
+
+    restarted = JobQueue(path)
+    assert restarted.recover() == 1
+    job = restarted.get(job_id)
+    assert job["status"] == QUEUED
+    assert job["owner"] is None
+    assert restarted.claim()["id"] == job_id
+
+
+def test_recover_never_requeues_own_jobs(path):
+    queue = JobQueue(path)
+    job_id = queue.submit("single", "a.pdf", b"%PDF")
+    queue.claim()
+    expire_lease(queue, job_id)
+    assert queue.recover() == 0
+
+
+def test_heartbeat_renews_the_lease(path):
+    worker = JobQueue(path)
+    job_id = worker.submit("single", "a.pdf", b"%PDF")
+    worker.claim()
+    expire_lease(worker, job_id)
+
+    assert worker.heartbeat() == 1
+    assert JobQueue(path).recover() == 0
+
+
+def test_recover_fails_jobs_after_max_attempts(path):
+    worker = JobQueue(path)
+    job_id = worker.submit("single", "a.pdf", b"%PDF")
+    worker.claim()
+    worker._conn.execute("UPDATE jobs SET attempts = ? WHERE id = ?", (MAX_JOB_ATTEMPTS, job_id))
+    worker._conn.commit()
+    expire_lease(worker, job_id)
+
+    restarted = JobQueue(path)
+    assert restarted.recover() == 0
+    job = restarted.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"] == f"Interrupted {MAX_JOB_ATTEMPTS} times"
+
+
+def test_finish_drops_pdf_only_when_done(path):
+    queue = JobQueue(path)
+    done_id = queue.submit("single", "a.pdf", b"%PDF")
+    failed_id = queue.submit("single", "b.pdf", b"%PDF")
+    queue.claim()
+    queue.claim()
+    queue.finish(done_id, {"verdict": "PROCEED"})
+    queue.finish(failed_id, None, "boom")
+
+    assert queue.get(done_id)["status"] == DONE
+    assert not queue.retry(done_id)
+    assert queue.retry(failed_id)
+    assert queue.get(failed_id)["status"] == QUEUED
@@ -0,0 +1,63 @@
+import re
+
+import pytest
+
+from ranking import TARGET_KEYWORD_WEIGHT, fts_match_query, guidance_text, prune_query, role_query
+from screener import ROLES, get_screening_prompt
+from triage import parse_keywords, tokenize
+
+
+def avoided_titles(prompt):
+    """Quoted titles on the prompt's "Avoid:" lines and in its "not ..." clauses."""
+    titles = []
+    for line in prompt.splitlines():
+        if line.startswith("Avoid:"):
+            titles += re.findall(r'"([^"]+)"', line)
+        elif re.search(r"\bnot\b", line):
+            titles += re.findall(r'"([^"]+)"', re.split(r"\bnot\b", line, 1)[1])
+    return titles
+
+
+@pytest.mark.parametrize("role", list(ROLES))
+def test_role_query_leaves_out_avoided_title_words(role):
+    prompt = get_screening_prompt(role)
+    titles = avoided_titles(prompt)
+    assert titles
+
+    query = role_query(prompt)
+    query_words = {word for phrase in query for word in phrase}
+    # A word the role explicitly targets (e.g. "salesforce") may still be searched for
+    target_words = {word for keyword in parse_keywords(prompt)[0] for word in tokenize(keyword)}
+    avoided = {word for title in titles for word in tokenize(title)} - target_words
+    assert not avoided & query_words
+
+
+@pytest.mark.parametrize("role", list(ROLES))
+def test_role_query_weights_target_keywords_above_guidance(role):
+    query = role_query(get_screening_prompt(role))
+    assert set(query.values()) == {1, TARGET_KEYWORD_WEIGHT}
+
+
+def test_guidance_text_splits_not_clauses_and_avoid_lines():
+    prompt = (
+        "# Guidance\n"
+        "Think: \"Delivery Lead\" — not \"Software Engineer\".\n"
+        "Avoid: \"Data Scientist\"\n"
+        "Reject / deprioritize keywords\nPyTorch\n"
+        "# Output Format\n"
+    )
+    wanted, unwanted = guidance_text(prompt)
+    assert "Delivery Lead" in wanted
+    for text in ("Software Engineer", "Data Scientist", "PyTorch"):
+        assert text not in wanted
+        assert text in unwanted
+
+
+def test_fts_match_query_lists_each_phrase_once():
+    query = {("prompt", "engineering"): 2, ("rag",): 1}
+    assert fts_match_query(query) == '"prompt engineering" OR "rag"'
+
+
+def test_prune_query_drops_phrases_in_most_resumes():
+    query = {("delivery",): 1, ("agentforce",): 2}
+    assert prune_query(query, {("delivery",): 90, ("agentforce",): 3}, 100) == {("agentforce",): 2}
@@ -0,0 +1,152 @@
+import email.utils
+import time
+
+import httpx
+import openai
+import pytest
+
+import ratelimit
+from ratelimit import (
+    MAX_ATTEMPTS,
+    FatalRequestError,
+    RateLimiter,
+    execute_request,
+    retry_after_seconds
+)
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def api_error(status, headers=None, code=None):
+    """The openai exception the client raises for a ``status`` response with ``headers``."""
+    response = httpx.Response(status, headers=headers or {}, request=REQUEST)
+    body = {"code": code} if code else None
+    if status == 429:
+        return openai.RateLimitError("rate limited", response=response, body=body)
+    if status >= 500:
+        return openai.InternalServerError("server error", response=response, body=body)
+    return openai.BadRequestError("bad request", response=response, body=body)
+
+
+class FakeResponse:
+    def __init__(self, total_tokens):
+        self.usage = type("Usage", (), {"total_tokens": total_tokens})()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record ``time.sleep`` calls made by ratelimit, advancing a fake clock instead of sleeping."""
+    recorded = []
+    clock = [time.monotonic()]
+
+    def sleep(seconds):
+        recorded.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(ratelimit.time, "sleep", sleep)
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: clock[0])
+    return recorded
+
+
+def failing_then(errors, response):
+    """A ``send`` raising each of ``errors`` in turn, then returning ``response``."""
+    errors = list(errors)
+    calls = []
+
+    def send():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return response
+    send.calls = calls
+    return send
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"retry-after": "7"}, 7.0),
+    ({"retry-after-ms": "250", "retry-after": "7"}, 0.25),
+    ({"x-ratelimit-reset-requests": "1m30s"}, 90.0),
+    ({"x-ratelimit-reset-tokens": "250ms"}, 0.25),
+    ({"retry-after": "soon"}, None),
+    ({}, None),
+])
+def test_retry_after_seconds_reads_headers(headers, expected):
+    assert retry_after_seconds(api_error(429, headers)) == expected
+
+
+def test_retry_after_seconds_reads_http_date():
+    when = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 < retry_after_seconds(api_error(429, {"retry-after": when})) <= 30
+
+
+def test_retry_after_seconds_without_response():
+    assert retry_after_seconds(ValueError("no response")) is None
+
+
+def test_execute_request_waits_at_least_retry_after(sleeps):
+    limiter = RateLimiter(1000, 1_000_000)
+    response = FakeResponse(10)
+    send = failing_then([api_error(429, {"retry-after": "5"})], response)
+    stats = {}
+    started = ratelimit.time.monotonic()
+
+    assert execute_request(send, 100, limiter=limiter, stats=stats) is response
+    assert len(send.calls) == 2
+    assert stats["attempts"] == 2
+    assert stats["retries"] == 1
+    assert sleeps[0] >= 5
+    # The 429 paused every caller sharing the limiter, not just this one
+    assert limiter._cooldown_until == pytest.approx(started + 5)
+
+
+def test_rate_limit_cooldown_pauses_other_callers():
+    limiter = RateLimiter(1000, 1_000_000)
+    limiter.cooldown(5)
+    assert 4 < limiter.reserve(10) <= 5
+
+
+def test_execute_request_retries_server_errors(sleeps):
+    response = FakeResponse(10)
+    send = failing_then([api_error(500), api_error(503)], response)
+    assert execute_request(send, 100, limiter=RateLimiter(1000, 1_000_000)) is response
+    assert len(send.calls) == 3
+
+
+def test_execute_request_fails_fast_on_bad_request(sleeps):
+    send = failing_then([api_error(400)], FakeResponse(10))
+    with pytest.raises(FatalRequestError):
+        execute_request(send, 100, limiter=RateLimiter(1000, 1_000_000))
+    assert len(send.calls) == 1
+
+
+def test_execute_request_fails_fast_on_exhausted_quota(sleeps):
+    send = failing_then([api_error(429, code="insufficient_quota")], FakeResponse(10))
+    with pytest.raises(FatalRequestError):
+        execute_request(send, 100, limiter=RateLimiter(1000, 1_000_000))
+    assert len(send.calls) == 1
+
+
+def test_execute_request_gives_up_after_max_attempts(sleeps):
+    send = failing_then([api_error(500)] * MAX_ATTEMPTS, FakeResponse(10))
+    with pytest.raises(FatalRequestError, match="Giving up"):
+        execute_request(send, 100, limiter=RateLimiter(1000, 1_000_000))
+    assert len(send.calls) == MAX_ATTEMPTS
+
+
+def test_reserve_waits_for_token_budget():
+    limiter = RateLimiter(1000, 600)
+    assert limiter.reserve(600) == 0
+    # 600 tokens per minute refill at 10 a second
+    assert 9 < limiter.reserve(100) <= 10
+
+
+def test_reserve_lets_oversized_request_through_on_full_bucket():
+    assert RateLimiter(1000, 600).reserve(10_000) == 0
+
+
+def test_settle_returns_unused_tokens():
+    limiter = RateLimiter(1000, 600)
+    assert limiter.reserve(600) == 0
+    limiter.settle(600, 100)
+    assert limiter.reserve(500) == 0
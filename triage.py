@@ -0,0 +1,123 @@
+"""Local keyword pre-triage, run on the PDF text layer before any model call.
+
+Every screening prompt ends its guidance with "Target keywords" and
+"Reject / deprioritize keywords" lists. Those lists are compiled once per
+role into a multi-pattern matcher over the resume's word tokens and turned
+into a cheap relevance score. Batch runs use it to screen the most promising
+resumes first or to defer obvious non-fits.
+"""
+import re
+import string
+
+# Score = distinct target keywords found - REJECT_WEIGHT * distinct reject keywords found
+REJECT_WEIGHT = 2
+
+TARGET_HEADER = "Target keywords:"
+REJECT_HEADER = "Reject / deprioritize keywords"
+
+# Punctuation (other than the "+" and "#" of C++ / C#) separates words
+_SEPARATORS = str.maketrans({char: " " for char in string.punctuation if char not in "+#"})
+
+
+def tokenize(text):
+    """Lowercased word tokens; punctuation and hyphens split words."""
+    return text.lower().translate(_SEPARATORS).split()
+
+
+def split_keyword_list(line):
+    """Split a comma-separated keyword line, ignoring commas inside parentheses."""
+    items = []
+    depth = 0
+    current = []
+    for char in line:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+        if char == "," and depth == 0:
+            items.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    items.append("".join(current))
+    return [item.strip().rstrip(".").strip().strip('"') for item in items if item.strip()]
+
+
+def keyword_variants(keyword):
+    """Phrases that count as ``keyword``: qualifiers in parentheses dropped, "a/b" split into both."""
+    keyword = re.sub(r"\([^)]*\)", "", keyword)
+    return [tuple(tokenize(part)) for part in keyword.split("/") if tokenize(part)]
+
+
+def parse_keywords(prompt):
+    """``(target, reject)`` keyword lists from a screening prompt's guidance."""
+    target, reject = [], []
+    lines = prompt.splitlines()
+    for i, line in enumerate(lines[:-1]):
+        if line.startswith(TARGET_HEADER):
+            target = split_keyword_list(lines[i + 1])
+        elif line.startswith(REJECT_HEADER):
+            reject = split_keyword_list(lines[i + 1])
+    return target, reject
+
+
+class KeywordMatcher:
+    """Finds which of a set of keyword phrases occur in a text.
+
+    ``keywords`` maps a label (the keyword as written) to its phrase variants
+    (token tuples). The text is tokenized once; single-word variants are then
+    set lookups and multi-word ones substring searches over the
+    space-joined tokens, so the per-resume work stays in C.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = keywords
+        self._words = {}
+        self._phrases = {}
+        for label, variants in keywords.items():
+            for phrase in variants:
+                if len(phrase) == 1:
+                    self._words.setdefault(phrase[0], set()).add(label)
+                else:
+                    self._phrases.setdefault(" " + " ".join(phrase) + " ", set()).add(label)
+
+    def find(self, tokens):
+        """Set of labels with at least one variant in ``tokens`` (from ``tokenize``)."""
+        found = set()
+        for word in self._words.keys() & set(tokens):
+            found |= self._words[word]
+        joined = " " + " ".join(tokens) + " "
+        for phrase, labels in self._phrases.items():
+            if phrase in joined:
+                found |= labels
+        return found
+
+
+class RoleTriage:
+    """Target and reject matchers for one role, compiled from its screening prompt."""
+
+    def __init__(self, prompt, min_score=None):
+        target, reject = parse_keywords(prompt)
+        self.min_score = min_score
+        self.target = KeywordMatcher({keyword: keyword_variants(keyword) for keyword in target})
+        self.reject = KeywordMatcher({keyword: keyword_variants(keyword) for keyword in reject})
+
+    def score(self, text):
+        """Relevance of ``text``: ``{"score", "target_hits", "reject_hits", "deferred"}``.
+
+        ``deferred`` is True when the score is below ``min_score``. With no
+        text (e.g. a scanned PDF with no text layer) there's nothing to go
+        on, so the score is None and nothing is deferred.
+        """
+        if not text or not text.strip():
+            return {"score": None, "target_hits": [], "reject_hits": [], "deferred": False}
+        tokens = tokenize(text)
+        target_hits = sorted(self.target.find(tokens))
+        reject_hits = sorted(self.reject.find(tokens))
+        score = len(target_hits) - REJECT_WEIGHT * len(reject_hits)
+        return {
+            "score": score,
+            "target_hits": target_hits,
+            "reject_hits": reject_hits,
+            "deferred": self.min_score is not None and score < self.min_score
+        }